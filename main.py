@@ -4,16 +4,87 @@ Bot de Trading - Avec heartbeat corrigé
 from src.data_fetcher import DataFetcher
 from src.indicators import TechnicalIndicators
 from src.notifier import DiscordNotifier
-from src.state_manager import StateManager
+from src.params import StrategyParams
+from src.state_manager import StateManager, StateStore
 from src.strategy import ImprovedStrategy
 from dotenv import load_dotenv
+import asyncio
 import os
+import sys
+import time
 from datetime import datetime
+import pandas as pd
 
 load_dotenv()
 
-def analyze_market():
-    """Analyse le marché et envoie des signaux (uniquement si changement)"""
+# Modes démon / flux / scanner et moteur en flux : modules importés dans leurs
+# fonctions (aiohttp, ccxt.async_support, pool de process), pour ne pas
+# ralentir le run unique lancé toutes les 5 minutes par le workflow
+
+# Colonnes affichées par analyze_market (la stratégie et le notifier déclarent les leurs)
+DISPLAY_COLUMNS = ('ema_20', 'ema_50', 'ema_200', 'rsi', 'chop', 'support', 'resistance', 'trend')
+ANALYSIS_COLUMNS = tuple(dict.fromkeys(
+    ImprovedStrategy.REQUIRED_COLUMNS + DISPLAY_COLUMNS + DiscordNotifier.INDICATOR_COLUMNS
+))
+
+def add_streaming_indicators(df, state_path, history=300, engine=None, timeframe=None, htf_seed=None):
+    """
+    Indicateurs via le moteur en flux : l'état est repris (mémoire ou disque)
+    et seules les bougies clôturées depuis le dernier passage sont calculées.
+    La bougie en cours (dernière ligne) est ajoutée sans indicateurs.
+    htf_seed : bougies natives 4h / 1j, utilisées seulement par un moteur neuf.
+
+    Retourne (df, engine).
+    """
+    from src.streaming_indicators import StreamingIndicators
+
+    closed = df.iloc[:-1]
+    if engine is None:
+        engine = StreamingIndicators.load(state_path)
+    if engine is None or engine.last_timestamp not in closed.index:
+        # Premier passage ou trou dans les données : reconstruction sur la fenêtre
+        engine = StreamingIndicators(history=history, timeframe=timeframe)
+        if htf_seed is not None:
+            engine.seed_htf(htf_seed)
+    added = engine.update_new(closed)
+    if added:
+        engine.save(state_path)
+    print(f"⚡ Indicateurs en flux : {added} nouvelle(s) bougie(s) calculée(s)")
+
+    frame = engine.frame()
+    current = df.iloc[[-1]].reindex(columns=frame.columns)
+    return pd.concat([frame, current]), engine
+
+def build_clients(exchange_name, symbol, timeframe):
+    """
+    Client exchange, état anti-doublon (clé exchange / symbole / timeframe)
+    et notifier d'un marché : mêmes clés d'état en run unique et en démon.
+    """
+    fetcher = DataFetcher(exchange_name=exchange_name, symbol=symbol)
+    state_manager = StateManager(exchange_name, symbol, timeframe)
+    return fetcher, state_manager, DiscordNotifier()
+
+class BotSession:
+    """
+    Objets conservés d'un cycle à l'autre en mode démon : client exchange
+    (marchés déjà chargés), fenêtre de bougies, état des indicateurs et
+    StateManager.
+    """
+
+    def __init__(self, exchange_name, symbol, timeframe):
+        self.fetcher, self.state_manager, self.notifier = build_clients(exchange_name, symbol, timeframe)
+        self.engine = None
+
+def analyze_market(params=None, session=None, df=None):
+    """
+    Analyse le marché et envoie des signaux (uniquement si changement)
+
+    params : StrategyParams (lu depuis l'environnement si absent).
+    session : BotSession réutilisée (mode démon) ; sinon tout est recréé.
+    df : bougies déjà récupérées (planificateur), sinon téléchargées ici.
+    """
+    if params is None:
+        params = StrategyParams.from_env()
 
     # Configuration
     symbol = os.getenv('SYMBOL', 'BTC/USDT')
@@ -31,12 +102,14 @@ def analyze_market():
     print(f"{'='*60}\n")
 
     # Initialisation
-    fetcher = DataFetcher(exchange_name=exchange_name, symbol=symbol)
-    state_manager = StateManager()
-    notifier = DiscordNotifier()
+    if session is None:
+        fetcher, state_manager, notifier = build_clients(exchange_name, symbol, timeframe)
+    else:
+        fetcher, state_manager, notifier = session.fetcher, session.state_manager, session.notifier
 
     # Récupération des données
-    df = fetcher.get_ohlcv(timeframe=timeframe, limit=max(260, data_limit))
+    if df is None:
+        df = fetcher.get_ohlcv(timeframe=timeframe, limit=max(260, data_limit))
 
     if df is None:
         print("❌ Impossible de récupérer les données")
@@ -48,8 +121,26 @@ def analyze_market():
             )
         return
 
+    print(f"📥 {fetcher.last_fetch_size} bougie(s) téléchargée(s), fenêtre de {len(df)} bougies")
+
+    # Préchauffage des filtres HTF par des bougies natives 4h / 1j (inutile si le moteur en flux tourne déjà)
+    htf_seed = None
+    if os.getenv('HTF_SEED', 'true').lower() == 'true' and (session is None or session.engine is None):
+        htf_seed = fetcher.get_htf_seed()
+
     # Calcul des indicateurs
-    df = TechnicalIndicators.add_all_indicators(df)
+    if session is not None or os.getenv('STREAMING_INDICATORS', 'false').lower() == 'true':
+        state_path = os.path.join(
+            os.getenv('OHLCV_CACHE_DIR', 'data/live'),
+            f"indicators_{exchange_name}_{symbol.replace('/', '-')}_{timeframe}.pkl"
+        )
+        engine = session.engine if session is not None else None
+        df, engine = add_streaming_indicators(df, state_path, history=max(260, data_limit), engine=engine,
+                                              timeframe=timeframe, htf_seed=htf_seed)
+        if session is not None:
+            session.engine = engine
+    else:
+        df = TechnicalIndicators.add_all_indicators(df, columns=ANALYSIS_COLUMNS, htf_seed=htf_seed)
 
     # Dernière bougie clôturée (évite la bougie en cours)
     last = df.iloc[-2]
@@ -72,7 +163,7 @@ def analyze_market():
     print(f"\n🔔 Dernier signal envoyé : {last_signal if last_signal else 'Aucun'}")
 
     # Détermination du signal actuel via la stratégie 1h
-    strategy_signal = ImprovedStrategy.generate_signal(df)
+    strategy_signal = ImprovedStrategy.generate_signal(df, params)
     current_signal = strategy_signal.signal
 
     print(f"🎯 Signal détecté : {current_signal}")
@@ -85,6 +176,9 @@ def analyze_market():
     status = "⚪ Marché neutre - En surveillance"
     heartbeat_color = 0x808080  # Gris par défaut
 
+    # Clé de déduplication : un signal donné n'est envoyé qu'une fois par bougie, même après un crash
+    dedup_key = f"signal:{exchange_name}:{symbol}:{timeframe}:{pd.Timestamp(last.name).isoformat()}:{current_signal}"
+
     # Vérification si on doit envoyer le signal
     if current_signal != 'NEUTRAL':
         if state_manager.should_send_signal(current_signal):
@@ -94,6 +188,7 @@ def analyze_market():
                 notifier.send_buy_signal(
                     symbol=symbol,
                     price=last['close'],
+                    dedup_key=dedup_key,
                     indicators={
                         'rsi': f"{last['rsi']:.2f}",
                         'trend': strategy_signal.context.get('trend', last['trend']),
@@ -113,6 +208,7 @@ def analyze_market():
                 notifier.send_sell_signal(
                     symbol=symbol,
                     price=last['close'],
+                    dedup_key=dedup_key,
                     indicators={
                         'rsi': f"{last['rsi']:.2f}",
                         'trend': strategy_signal.context.get('trend', last['trend']),
@@ -177,5 +273,195 @@ def analyze_market():
 
     print(f"\n{'='*60}\n")
 
+def run_daemon(params=None):
+    """
+    Mode démon : process résident qui se réveille à chaque clôture de bougie.
+    Juste après la clôture, l'exchange est interrogé (fenêtre courte et
+    bornée) jusqu'à ce que la bougie clôturée soit publiée, puis
+    analyze_market tourne une seule fois avec la même BotSession.
+    """
+    from src.scheduler import CandleScheduler
+
+    symbol = os.getenv('SYMBOL', 'BTC/USDT')
+    timeframe = os.getenv('TIMEFRAME', '1h')
+    exchange_name = os.getenv('EXCHANGE', 'kraken')
+    data_limit = int(os.getenv('DATA_LIMIT', '500'))
+
+    session = BotSession(exchange_name, symbol, timeframe)
+    scheduler = CandleScheduler(
+        [timeframe],
+        poll_interval=float(os.getenv('DAEMON_POLL_INTERVAL', '1')),
+        poll_window=float(os.getenv('DAEMON_POLL_WINDOW', '30')),
+        jitter=float(os.getenv('DAEMON_POLL_JITTER', '0.25'))
+    )
+    print(f"👹 Mode démon : {exchange_name} {symbol} {timeframe}, analyse à chaque clôture de bougie")
+
+    def probe(tf, close_ts):
+        # La bougie est clôturée quand l'exchange publie déjà la suivante
+        df = session.fetcher.get_ohlcv(timeframe=tf, limit=max(260, data_limit))
+        if df is not None and len(df) and df.index[-1].timestamp() >= close_ts:
+            return df
+        return None
+
+    def handler(tf, df, close_ts, polls):
+        latency = time.time() - close_ts
+        if df is None:
+            print(f"⚠️ Bougie {tf} de {datetime.fromtimestamp(close_ts).strftime('%H:%M')} non publiée "
+                  f"après {polls} requêtes - analyse sur les données disponibles")
+        started = time.time()
+        try:
+            analyze_market(params, session=session, df=df)
+        except Exception as e:
+            print(f"❌ Erreur lors de l'analyse: {e}")
+        print(f"⏱️  Clôture +{latency:.1f}s ({polls} requête(s)), analyse {(time.time() - started) * 1000:.0f} ms")
+        next_close, _ = scheduler.next_event()
+        print(f"😴 Prochaine clôture à {datetime.fromtimestamp(next_close).strftime('%H:%M:%S')}")
+
+    try:
+        analyze_market(params, session=session)
+        scheduler.run(probe, handler)
+    except KeyboardInterrupt:
+        print("\n🛑 Arrêt du démon")
+
+def build_ws_feed(exchange, session, params=None):
+    """
+    CandleFeed branché sur analyze_market : l'analyse tourne (dans un thread,
+    pour ne pas bloquer la connexion) dès qu'une bougie se clôture.
+    """
+    from src.candle_feed import CandleFeed
+
+    symbol = os.getenv('SYMBOL', 'BTC/USDT')
+    timeframe = os.getenv('TIMEFRAME', '1h')
+    data_limit = int(os.getenv('DATA_LIMIT', '500'))
+
+    async def on_close(df):
+        # Fenêtre tenue par le flux : aucune bougie téléchargée par REST
+        session.fetcher.last_fetch_size = 0
+        try:
+            await asyncio.to_thread(analyze_market, params, session, df)
+        except Exception as e:
+            print(f"❌ Erreur lors de l'analyse: {e}")
+
+    return CandleFeed(exchange, symbol, timeframe, limit=max(260, data_limit), on_close=on_close,
+                      reconnect_delay=float(os.getenv('WS_RECONNECT_DELAY', '1')))
+
+def run_ws_feed(params=None):
+    """
+    Mode flux : bougies poussées par WebSocket (ccxt.pro watch_ohlcv, ou
+    serveur de rejeu local si WS_REPLAY_URL est défini), analyse à chaque
+    clôture, rattrapage REST après une coupure.
+    """
+    symbol = os.getenv('SYMBOL', 'BTC/USDT')
+    timeframe = os.getenv('TIMEFRAME', '1h')
+    exchange_name = os.getenv('EXCHANGE', 'kraken')
+    replay_url = os.getenv('WS_REPLAY_URL')
+
+    if replay_url:
+        from src.candle_feed import ReplayExchange
+        exchange = ReplayExchange(replay_url)
+    else:
+        import ccxt.pro as ccxtpro
+        exchange = getattr(ccxtpro, exchange_name)({'enableRateLimit': True})
+
+    session = BotSession(exchange_name, symbol, timeframe)
+    feed = build_ws_feed(exchange, session, params)
+    print(f"📡 Mode flux : {replay_url or exchange_name} {symbol} {feed.timeframe}")
+
+    async def run():
+        try:
+            await feed.run()
+        finally:
+            await exchange.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n🛑 Arrêt du flux")
+
+    summary = feed.latency_summary()
+    if summary:
+        print(f"⏱️  {summary['count']} clôture(s), latence médiane {summary['p50_ms']:.0f} ms, "
+              f"p95 {summary['p95_ms']:.0f} ms, max {summary['max_ms']:.0f} ms")
+
+def run_scan(params=None):
+    """
+    Mode scanner : analyse en un seul passage concurrent les paires de
+    SCAN_SYMBOLS (ou toutes les paires SCAN_QUOTE des exchanges de
+    SCAN_EXCHANGES), avec un état anti-doublon par paire.
+    """
+    from src.compute_pool import ShardedEvaluator
+    from src.scanner import MarketScanner, parse_targets
+
+    if params is None:
+        params = StrategyParams.from_env()
+
+    timeframe = os.getenv('TIMEFRAME', '1h')
+    exchange_name = os.getenv('EXCHANGE', 'kraken')
+    data_limit = int(os.getenv('DATA_LIMIT', '500'))
+    symbols = os.getenv('SCAN_SYMBOLS', '').strip()
+    metrics_path = os.getenv('SCAN_METRICS_PATH', 'data/scan_metrics.csv')
+
+    # Calcul réparti sur les cœurs (SCAN_WORKERS=1, défaut : threads du process principal ;
+    # 0 : tous les cœurs). Un worker coûte ~2,5 s de démarrage (pandas/numba/ccxt
+    # réimportés) pour quelques ms d'analyse par paire (500 bougies) : le pool ne paie qu'au-delà
+    # de quelques milliers de paires ou de fenêtres longues
+    workers = int(os.getenv('SCAN_WORKERS', '1')) or (os.cpu_count() or 1)
+    evaluator = ShardedEvaluator(workers, params) if workers > 1 else None
+
+    scanner = MarketScanner(
+        [], timeframe=timeframe, limit=max(260, data_limit), params=params,
+        notifier=DiscordNotifier(),
+        concurrency=int(os.getenv('SCAN_CONCURRENCY', '20')),
+        state_dir=os.getenv('SCAN_STATE_DIR', 'data/scanner'),
+        state_store=StateStore(os.getenv('STATE_DB_PATH', 'data/state.db')),
+        evaluator=evaluator,
+        shard_size=int(os.getenv('SCAN_SHARD_SIZE', '0')) or None
+    )
+
+    async def run():
+        if symbols:
+            scanner.targets = parse_targets(symbols, exchange_name)
+        else:
+            quote = os.getenv('SCAN_QUOTE', 'USDT')
+            max_symbols = int(os.getenv('SCAN_MAX_SYMBOLS', '200'))
+            for name in os.getenv('SCAN_EXCHANGES', exchange_name).split(','):
+                found = await MarketScanner.discover(scanner.get_exchange(name.strip()), quote, max_symbols)
+                scanner.targets += [(name.strip(), symbol) for symbol in found]
+        print(f"🔭 Scan de {len(scanner.targets)} paire(s) en {timeframe}, calcul sur {workers} cœur(s)...")
+        return await scanner.scan()
+
+    try:
+        metrics = asyncio.run(run())
+    finally:
+        if evaluator is not None:
+            evaluator.close()
+    summary = scanner.summary(metrics)
+
+    signals = metrics[metrics['signal'].isin(['BUY', 'SELL'])]
+    if not signals.empty:
+        print("\n🎯 Signaux :")
+        print(signals[['exchange', 'symbol', 'signal', 'sent', 'reason']].to_string(index=False))
+    errors = metrics[metrics['error'].notna()]
+    for row in errors.itertuples():
+        print(f"❌ {row.exchange} {row.symbol} : {row.error}")
+
+    print(f"\n⏱️  {summary['symbols']} paire(s) en {summary['wall_ms'] / 1000:.2f}s "
+          f"(requêtes cumulées {summary['sequential_fetch_ms'] / 1000:.2f}s, "
+          f"p50 {summary['fetch_p50_ms']:.0f} ms, p95 {summary['fetch_p95_ms']:.0f} ms, "
+          f"analyse cumulée {summary['analyze_total_ms'] / 1000:.2f}s)")
+    print(f"📨 {summary['signals']} signal(aux), {summary['sent']} envoyé(s), {summary['errors']} erreur(s)")
+
+    if metrics_path:
+        os.makedirs(os.path.dirname(metrics_path) or '.', exist_ok=True)
+        metrics.to_csv(metrics_path, index=False)
+        print(f"💾 Métriques par paire : {metrics_path}")
+
 if __name__ == "__main__":
-    analyze_market()
\ No newline at end of file
+    if '--daemon' in sys.argv[1:]:
+        run_daemon(StrategyParams.from_cli(sys.argv[1:]))
+    elif '--scan' in sys.argv[1:]:
+        run_scan(StrategyParams.from_cli(sys.argv[1:]))
+    elif '--ws' in sys.argv[1:]:
+        run_ws_feed(StrategyParams.from_cli(sys.argv[1:]))
+    else:
+        analyze_market(StrategyParams.from_cli(sys.argv[1:]))
\ No newline at end of file
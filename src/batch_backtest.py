@@ -0,0 +1,260 @@
+"""
+Backtest multi-paramètres : évalue N jeux de paramètres en une passe
+sur les mêmes tableaux d'indicateurs
+"""
+import os
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from src.params import StrategyParams
+from src.simulator import ChunkedSimulation, resolve_levels, simulate_trades
+from src.strategy import MIN_BARS, ImprovedStrategy
+
+
+# Paramètres de filtre/niveaux (champs StrategyParams en majuscules)
+SIGNAL_PARAMS = (
+    'VOLUME_RATIO_MIN',
+    'VOLUME_SPIKE_MIN',
+    'CHOP_NO_TRADE_MAX',
+    'ATR_PCT_MIN',
+    'ATR_EXTREME_MULT',
+    'RSI_MIN',
+    'RSI_MAX',
+    'ATR_STOP_MULT',
+    'TP1_MULT',
+    'TP2_MULT',
+)
+
+# Paramètres de gestion de position (simulate_trades)
+SIMULATION_PARAMS = ('COOLDOWN_BARS', 'COOLDOWN_BARS_SL', 'TIME_STOP_BARS')
+
+PARAM_COLUMNS = SIGNAL_PARAMS + SIMULATION_PARAMS
+
+STATS_COLUMNS = ['trades', 'total_return', 'win_rate', 'accuracy', 'avg_return',
+                 'median_return', 'max_drawdown', 'final_capital']
+
+
+def returns_stats(returns, initial_capital):
+    """Mêmes statistiques que test_backtest.compute_stats, sur un tableau de rendements."""
+    if len(returns) == 0:
+        return {
+            "trades": 0,
+            "total_return": 0.0,
+            "win_rate": 0.0,
+            "accuracy": 0.0,
+            "avg_return": 0.0,
+            "median_return": 0.0,
+            "max_drawdown": 0.0,
+            "final_capital": initial_capital
+        }
+
+    equity = np.cumprod(1 + returns)
+    peak = np.maximum.accumulate(equity)
+    drawdown = (equity - peak) / peak
+    win_rate = float((returns > 0).mean())
+
+    return {
+        "trades": int(len(returns)),
+        "total_return": float(equity[-1] - 1),
+        "win_rate": win_rate,
+        "accuracy": win_rate,  # prediction_correct == (return > 0)
+        "avg_return": float(returns.mean()),
+        "median_return": float(np.median(returns)),
+        "max_drawdown": float(drawdown.min()),
+        "final_capital": float(initial_capital * equity[-1])
+    }
+
+
+def _as_param_frame(params, base_params):
+    """
+    Accepte un DataFrame, une liste de dicts ou une matrice (colonnes PARAM_COLUMNS).
+    Les cellules manquantes (clés absentes d'un dict, NaN) prennent la valeur
+    de base_params ; COOLDOWN_BARS_SL non fixé suit COOLDOWN_BARS comme dans
+    StrategyParams.with_overrides. ValueError si une valeur reste invalide.
+    """
+    if isinstance(params, pd.DataFrame):
+        frame = params.reset_index(drop=True)
+    elif isinstance(params, np.ndarray):
+        matrix = np.atleast_2d(params)
+        frame = pd.DataFrame(matrix, columns=list(PARAM_COLUMNS[:matrix.shape[1]]))
+    else:
+        frame = pd.DataFrame(list(params))
+
+    unknown = set(frame.columns) - set(PARAM_COLUMNS)
+    if unknown:
+        raise ValueError(f"Paramètres non supportés: {sorted(unknown)}")
+
+    try:
+        frame = frame.apply(pd.to_numeric).astype(np.float64)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Jeu de paramètres non numérique: {e}") from None
+
+    if 'COOLDOWN_BARS' in frame.columns:
+        if 'COOLDOWN_BARS_SL' not in frame.columns:
+            frame['COOLDOWN_BARS_SL'] = np.nan
+        missing = frame['COOLDOWN_BARS_SL'].isna() & frame['COOLDOWN_BARS'].notna()
+        frame.loc[missing, 'COOLDOWN_BARS_SL'] = [
+            base_params.with_overrides({'COOLDOWN_BARS': value}).cooldown_bars_sl
+            for value in frame.loc[missing, 'COOLDOWN_BARS']
+        ]
+    for name in frame.columns:
+        frame[name] = frame[name].fillna(float(getattr(base_params, name.lower())))
+
+    invalid = [name for name in frame.columns if not np.isfinite(frame[name]).all()]
+    invalid += [name for name in SIMULATION_PARAMS
+                if name in frame.columns and name not in invalid and (frame[name] % 1 != 0).any()]
+    if invalid:
+        raise ValueError(f"Valeurs invalides (NaN, infinies ou non entières) pour: {sorted(invalid)}")
+    return frame
+
+
+def batch_backtest(df, param_sets, warmup_bars=220, initial_capital=None, base_params=None,
+                   chunk_size=None, use_jit=None):
+    """
+    Évalue plusieurs jeux de paramètres sur le même DataFrame d'indicateurs.
+
+    param_sets : DataFrame / liste de dicts / matrice dont les colonnes sont des
+    noms de PARAM_COLUMNS (mêmes noms que les variables d'environnement).
+    Les colonnes et cellules absentes (et les frais, slippage...) viennent de
+    base_params (StrategyParams, lu depuis l'environnement si absent).
+
+    Les filtres de la stratégie sont évalués par broadcasting sur un bloc de
+    jeux de paramètres (matrice jeux x bougies), puis chaque ligne passe dans
+    le simulateur. Retourne un DataFrame : paramètres + STATS_COLUMNS.
+    """
+    if base_params is None:
+        base_params = StrategyParams.from_env()
+    frame = _as_param_frame(param_sets, base_params)
+    n_sets = len(frame)
+    n_bars = len(df)
+
+    if initial_capital is None:
+        initial_capital = float(os.getenv('INITIAL_CAPITAL', '100'))
+
+    # Tableaux partagés par tous les jeux de paramètres
+    arrays = ImprovedStrategy._closed_bar_arrays(df)
+    open_ = df['open'].to_numpy(dtype=np.float64)
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    close = df['close'].to_numpy(dtype=np.float64)
+    atr = df['atr'].to_numpy(dtype=np.float64) if 'atr' in df.columns else None
+    warmup = min(MIN_BARS - 1, n_bars)
+
+    if chunk_size is None:
+        # ~2M cellules par bloc pour borner la mémoire des matrices de filtres
+        chunk_size = max(1, 2_000_000 // max(n_bars, 1))
+
+    rows = []
+    for start in range(0, n_sets, chunk_size):
+        block = frame.iloc[start:start + chunk_size]
+
+        # Seuils en colonnes (jeux, 1) : broadcasting contre les bougies
+        p = replace(base_params, **{
+            name.lower(): block[name].to_numpy(dtype=np.float64)[:, None]
+            for name in SIGNAL_PARAMS if name in block.columns
+        })
+
+        direction, _, stop_loss, tp1, tp2 = ImprovedStrategy._evaluate_signals(arrays, p, with_reasons=False)
+        direction = np.broadcast_to(direction, (len(block), n_bars)).copy()
+        direction[:, :warmup] = 0
+        stop_loss, tp1, tp2 = (
+            np.broadcast_to(levels, (len(block), n_bars)).copy() for levels in (stop_loss, tp1, tp2)
+        )
+        for levels in (stop_loss, tp1, tp2):
+            levels[:, :warmup] = np.nan
+
+        stop_loss, tp1, tp2 = resolve_levels(
+            direction, open_, atr, stop_loss, tp1, tp2, base_params.slippage_bps,
+            use_atr=base_params.use_atr_stops, atr_mult_sl=base_params.atr_mult_sl,
+            atr_mult_tp=base_params.atr_mult_tp, sl_pct=base_params.sl_pct, tp_pct=base_params.tp_pct
+        )
+
+        sim_values = {
+            name: block[name].to_numpy(dtype=np.int64) if name in block.columns
+            else np.full(len(block), getattr(base_params, name.lower()), dtype=np.int64)
+            for name in SIMULATION_PARAMS
+        }
+        for k in range(len(block)):
+            sim = {name: int(values[k]) for name, values in sim_values.items()}
+            trades = simulate_trades(
+                open_, high, low, close, direction[k], stop_loss[k], tp1[k], tp2[k],
+                warmup=warmup_bars, fee_rate=base_params.fee_rate, slippage_bps=base_params.slippage_bps,
+                cooldown_bars=sim['COOLDOWN_BARS'], cooldown_bars_sl=sim['COOLDOWN_BARS_SL'],
+                time_stop_bars=sim['TIME_STOP_BARS'], long_only=base_params.long_only, use_jit=use_jit
+            )
+            rows.append(returns_stats(trades['return'], initial_capital))
+
+    stats = pd.DataFrame(rows, columns=STATS_COLUMNS)
+    return pd.concat([frame, stats], axis=1)
+
+
+def backtest_chunks(df, params=None, n_chunks=10, warmup_bars=220, initial_capital=None,
+                    arrays=None, use_jit=None):
+    """
+    Backtest d'un jeu de paramètres en tranches chronologiques.
+
+    Après chaque tranche, produit un dict d'avancement : step, bar,
+    progress (0-1), trades, equity (capital courant), max_drawdown et
+    returns (rendements cumulés). Les signaux ne sont évalués que sur la
+    tranche en cours : l'appelant peut arrêter l'itération (pruning Optuna)
+    sans payer le reste de l'historique. La dernière tranche donne les
+    mêmes trades que compute_trades.
+
+    arrays : _closed_bar_arrays(df) déjà calculés (réutilisables entre essais).
+    """
+    if params is None:
+        params = StrategyParams.from_env()
+    if initial_capital is None:
+        initial_capital = float(os.getenv('INITIAL_CAPITAL', '100'))
+    if arrays is None:
+        arrays = ImprovedStrategy._closed_bar_arrays(df)
+
+    n_bars = len(df)
+    open_ = df['open'].to_numpy(dtype=np.float64)
+    atr = df['atr'].to_numpy(dtype=np.float64) if 'atr' in df.columns else None
+    warmup = min(MIN_BARS - 1, n_bars)
+
+    simulation = ChunkedSimulation(
+        open_, df['high'], df['low'], df['close'],
+        np.zeros(n_bars, dtype=np.int8), *(np.full(n_bars, np.nan) for _ in range(3)),
+        warmup=warmup_bars, fee_rate=params.fee_rate, slippage_bps=params.slippage_bps,
+        cooldown_bars=params.cooldown_bars, cooldown_bars_sl=params.cooldown_bars_sl,
+        time_stop_bars=params.time_stop_bars, long_only=params.long_only, use_jit=use_jit
+    )
+
+    start = max(warmup_bars, 0)
+    bounds = np.linspace(start, simulation.last_bar, max(int(n_chunks), 1) + 1).astype(np.int64)[1:]
+    returns = []
+    for step, stop in enumerate(bounds):
+        # Signaux de [bar, stop) ; une bougie de plus pour le prix d'entrée suivant
+        lo, hi = max(simulation.bar, start), min(int(stop) + 1, n_bars)
+        if stop > lo:
+            window = {name: values[lo:hi] for name, values in arrays.items()}
+            direction, _, stop_loss, tp1, tp2 = ImprovedStrategy._evaluate_signals(window, params, with_reasons=False)
+            head = max(min(warmup - lo, hi - lo), 0)
+            direction[:head] = 0
+            stop_loss, tp1, tp2 = resolve_levels(
+                direction, open_[lo:hi], None if atr is None else atr[lo:hi], stop_loss, tp1, tp2,
+                params.slippage_bps, use_atr=params.use_atr_stops, atr_mult_sl=params.atr_mult_sl,
+                atr_mult_tp=params.atr_mult_tp, sl_pct=params.sl_pct, tp_pct=params.tp_pct
+            )
+            keep = slice(0, int(stop) - lo)
+            simulation.direction[lo:stop] = direction[keep]
+            simulation.stop_loss[lo:stop] = stop_loss[keep]
+            simulation.take_profit_1[lo:stop] = tp1[keep]
+            simulation.take_profit_2[lo:stop] = tp2[keep]
+
+        returns.append(simulation.advance(stop)['return'])
+        all_returns = np.concatenate(returns)
+        stats = returns_stats(all_returns, initial_capital)
+        yield {
+            'step': step,
+            'bar': int(stop),
+            'progress': (int(stop) - start) / max(simulation.last_bar - start, 1),
+            'trades': stats['trades'],
+            'equity': stats['final_capital'],
+            'max_drawdown': stats['max_drawdown'],
+            'returns': all_returns,
+        }
@@ -0,0 +1,214 @@
+"""
+Flux de bougies poussé (WebSocket, style ccxt.pro watch_ohlcv) avec
+fenêtre en mémoire, détection des clôtures et rattrapage REST
+"""
+import asyncio
+import inspect
+import json
+import time
+
+import aiohttp
+import ccxt
+
+from src.data_fetcher import DataFetcher
+
+
+# Coupures traitées par reconnexion + rattrapage REST
+NETWORK_ERRORS = (aiohttp.ClientError, ccxt.NetworkError, ConnectionError, asyncio.TimeoutError, OSError)
+
+
+class FeedClosed(Exception):
+    """La source a terminé son flux (fin de rejeu) : pas de reconnexion."""
+
+
+class CandleWindow:
+    """
+    Fenêtre glissante des `limit` dernières bougies (bougie en cours incluse).
+
+    apply() fusionne des lignes [ts, o, h, l, c, v] : une bougie connue est
+    remplacée (mise à jour de la bougie en cours, correction tardive), une
+    bougie plus récente que la bougie en cours clôture cette dernière.
+    """
+
+    def __init__(self, limit=500):
+        self.limit = limit
+        self.rows = []
+
+    @property
+    def live_timestamp(self):
+        return self.rows[-1][0] if self.rows else None
+
+    @property
+    def last_closed_timestamp(self):
+        return self.rows[-2][0] if len(self.rows) > 1 else None
+
+    def apply(self, ohlcv):
+        """Fusionne les lignes reçues ; retourne le nombre de bougies nouvellement clôturées."""
+        closed = 0
+        for row in ohlcv:
+            row = list(row)
+            ts = row[0]
+            if not self.rows or ts > self.rows[-1][0]:
+                if self.rows:
+                    closed += 1
+                self.rows.append(row)
+                continue
+            if ts == self.rows[-1][0]:
+                self.rows[-1] = row
+                continue
+            # Bougie passée (rattrapage ou valeurs finales) : insertion triée
+            lo, hi = 0, len(self.rows)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.rows[mid][0] < ts:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if self.rows[lo][0] == ts:
+                self.rows[lo] = row
+            else:
+                self.rows.insert(lo, row)
+        del self.rows[:-self.limit]
+        return closed
+
+    def frame(self):
+        """DataFrame au format DataFetcher.get_ohlcv (dernière ligne = bougie en cours)."""
+        return DataFetcher._to_frame(self.rows)
+
+
+class CandleFeed:
+    """
+    Abonnement à watch_ohlcv(symbol, timeframe) d'un exchange ccxt.pro (ou
+    de ReplayExchange) : la fenêtre est tenue en mémoire et on_close(df) est
+    appelée dès qu'une bougie se clôture, avec la nouvelle bougie en cours
+    en dernière ligne (même convention que get_ohlcv).
+
+    À la connexion et après chaque coupure, les bougies manquées sont
+    rattrapées via fetch_ohlcv (REST) avant de reprendre le flux.
+    """
+
+    def __init__(self, exchange, symbol, timeframe='1h', limit=500, on_close=None,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.window = CandleWindow(limit)
+        self.on_close = on_close
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.closes = 0
+        self.reconnects = 0
+        self.latencies = []
+
+    async def _call(self, method, *args, **kwargs):
+        # Exchange ccxt.pro (coroutines) ou ccxt synchrone (exécuté dans un thread)
+        if inspect.iscoroutinefunction(method):
+            return await method(*args, **kwargs)
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def backfill(self):
+        """Rattrape par REST les bougies manquées depuis la dernière bougie clôturée."""
+        since = self.window.last_closed_timestamp
+        if since is None:
+            ohlcv = await self._call(self.exchange.fetch_ohlcv, self.symbol, self.timeframe,
+                                     limit=self.window.limit)
+        else:
+            ohlcv = await self._call(self.exchange.fetch_ohlcv, self.symbol, self.timeframe,
+                                     since=since, limit=self.window.limit)
+        return self.window.apply(ohlcv)
+
+    async def _closed(self, event_at):
+        self.closes += 1
+        if self.on_close is not None:
+            result = self.on_close(self.window.frame())
+            if inspect.isawaitable(result):
+                await result
+        # Latence de bout en bout : émission du message (si la source la fournit) -> fin de l'analyse
+        self.latencies.append(time.time() - event_at)
+
+    async def run(self, max_closes=None):
+        """Boucle principale : s'arrête après max_closes clôtures ou à la fin du flux."""
+        delay = self.reconnect_delay
+        first = True
+        while max_closes is None or self.closes < max_closes:
+            try:
+                closed = await self.backfill()
+                if closed and not first:
+                    print(f"🔁 {closed} bougie(s) rattrapée(s) par REST")
+                    await self._closed(time.time())
+                first = False
+
+                while max_closes is None or self.closes < max_closes:
+                    ohlcv = await self.exchange.watch_ohlcv(self.symbol, self.timeframe)
+                    event_at = getattr(self.exchange, 'last_sent_at', None) or time.time()
+                    if self.window.apply(ohlcv):
+                        await self._closed(event_at)
+                    delay = self.reconnect_delay
+            except FeedClosed:
+                break
+            except NETWORK_ERRORS as e:
+                self.reconnects += 1
+                print(f"⚠️ Flux interrompu ({e}) - reconnexion dans {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def latency_summary(self):
+        """Latences (ms) clôture -> fin de l'analyse : médiane, p95, max."""
+        if not self.latencies:
+            return None
+        values = sorted(v * 1000 for v in self.latencies)
+        return {
+            'count': len(values),
+            'p50_ms': values[len(values) // 2],
+            'p95_ms': values[min(int(len(values) * 0.95), len(values) - 1)],
+            'max_ms': values[-1],
+        }
+
+
+class ReplayExchange:
+    """
+    Client du serveur de rejeu local (src/replay_server.py) exposant la même
+    interface que ccxt.pro : watch_ohlcv / fetch_ohlcv / close.
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self._session = None
+        self._ws = None
+        self.last_sent_at = None
+
+    async def _ensure_session(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=500):
+        session = await self._ensure_session()
+        params = {'limit': limit}
+        if since is not None:
+            params['since'] = int(since)
+        async with session.get(f'{self.url}/ohlcv', params=params) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def watch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None):
+        session = await self._ensure_session()
+        if self._ws is None or self._ws.closed:
+            self._ws = await session.ws_connect(f'{self.url}/ws')
+            await self._ws.send_str(json.dumps({'method': 'watch_ohlcv', 'symbol': symbol,
+                                                'timeframe': timeframe}))
+        msg = await self._ws.receive()
+        if msg.type != aiohttp.WSMsgType.TEXT:
+            self._ws = None
+            raise ConnectionError("connexion WebSocket fermée")
+        data = json.loads(msg.data)
+        if data.get('event') == 'end':
+            raise FeedClosed("fin du rejeu")
+        self.last_sent_at = data.get('sent_at')
+        return data['ohlcv']
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._session is not None:
+            await self._session.close()
@@ -0,0 +1,304 @@
+"""
+Stockage local des bougies OHLCV : format binaire en colonnes (.npz),
+partitionné par exchange / symbole / timeframe / mois, mis à jour de façon incrémentale
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    unit = timeframe[-1]
+    value = int(timeframe[:-1])
+    if unit == 'm':
+        return value * 60 * 1000
+    if unit == 'h':
+        return value * 60 * 60 * 1000
+    if unit == 'd':
+        return value * 24 * 60 * 60 * 1000
+    raise ValueError(f"Timeframe non supporté: {timeframe}")
+
+
+def fetch_all_ohlcv(exchange, symbol: str, timeframe: str = '1h', since_ms: int | None = None, limit: int = 720,
+                    until_ms: int | None = None):
+    """
+    Récupère toutes les bougies disponibles (pagination via since) ;
+    until_ms : s'arrête avant cette date (bougies antérieures uniquement).
+    """
+    all_ohlcv = []
+    timeframe_ms = timeframe_to_ms(timeframe)
+
+    last_seen_ts = None
+
+    while True:
+        ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since_ms, limit=limit)
+        if not ohlcv:
+            break
+
+        all_ohlcv.extend(ohlcv)
+        last_ts = ohlcv[-1][0]
+        if last_seen_ts is not None and last_ts == last_seen_ts:
+            break
+        last_seen_ts = last_ts
+        next_since = last_ts + timeframe_ms
+
+        if since_ms is not None and next_since <= since_ms:
+            break
+
+        if until_ms is not None and next_since >= until_ms:
+            break
+
+        since_ms = next_since
+        time.sleep(exchange.rateLimit / 1000)
+
+        if len(ohlcv) < limit:
+            break
+
+    # Déduplication par timestamp
+    unique = {}
+    for row in all_ohlcv:
+        if until_ms is None or row[0] < until_ms:
+            unique[row[0]] = row
+
+    return [unique[k] for k in sorted(unique.keys())]
+
+
+def closed_candles(ohlcv, timeframe_ms: int, now_ms: int):
+    """
+    Bougies définitivement clôturées d'une réponse fetch_ohlcv triée.
+
+    Juste après l'heure de clôture, l'exchange peut encore renvoyer la
+    bougie non finalisée : la dernière bougie n'est retenue que si une
+    bougie plus récente est publiée, ou une période complète plus tard.
+    """
+    if not ohlcv:
+        return []
+    latest_ts = ohlcv[-1][0]
+    return [row for row in ohlcv if row[0] + timeframe_ms <= now_ms
+            and (row[0] < latest_ts or row[0] + 2 * timeframe_ms <= now_ms)]
+
+
+def _month_keys(timestamps_ms):
+    """Clé de partition 'AAAA-MM' de chaque timestamp (ms UTC)."""
+    months = np.asarray(timestamps_ms, dtype='datetime64[ms]').astype('datetime64[M]')
+    return np.datetime_as_string(months, unit='M')
+
+
+def _utc(value):
+    if value is None:
+        return None
+    ts = pd.Timestamp(value)
+    return ts.tz_localize('UTC') if ts.tz is None else ts.tz_convert('UTC')
+
+
+class CandleStore:
+    """
+    Bougies clôturées stockées dans <root>/<exchange>/<SYMBOLE>/<timeframe>/AAAA-MM.npz.
+
+    Chaque partition contient une colonne par champ (timestamp en ms, prix et
+    volume en float64). Les lectures par période ne chargent que les mois
+    concernés ; update() ne télécharge que les bougies postérieures à la
+    dernière bougie stockée.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root or os.getenv('CANDLE_STORE_DIR', 'data/candles'))
+
+    def _dir(self, exchange_name: str, symbol: str, timeframe: str) -> Path:
+        return self.root / exchange_name / symbol.replace('/', '-') / timeframe
+
+    def partitions(self, exchange_name: str, symbol: str, timeframe: str):
+        """Fichiers de partition triés par mois."""
+        directory = self._dir(exchange_name, symbol, timeframe)
+        if not directory.exists():
+            return []
+        return sorted(directory.glob('*.npz'))
+
+    @staticmethod
+    def _load(path):
+        with np.load(path) as data:
+            return {name: data[name] for name in COLUMNS}
+
+    def _meta_path(self, exchange_name, symbol, timeframe):
+        return self._dir(exchange_name, symbol, timeframe) / 'meta.json'
+
+    def _read_meta(self, exchange_name, symbol, timeframe):
+        path = self._meta_path(exchange_name, symbol, timeframe)
+        if not path.exists():
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_meta(self, exchange_name, symbol, timeframe, meta):
+        path = self._meta_path(exchange_name, symbol, timeframe)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(meta, f)
+
+    def last_timestamp(self, exchange_name: str, symbol: str, timeframe: str):
+        """Timestamp (ms) de la dernière bougie stockée, None si vide."""
+        parts = self.partitions(exchange_name, symbol, timeframe)
+        if not parts:
+            return None
+        timestamps = self._load(parts[-1])['timestamp']
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def write(self, exchange_name: str, symbol: str, timeframe: str, ohlcv) -> int:
+        """
+        Ajoute des bougies (liste ccxt [ts, o, h, l, c, v] ou DataFrame
+        build_dataframe). Seules les partitions des mois touchés sont
+        réécrites ; en cas de doublon, la nouvelle valeur l'emporte.
+        Retourne le nombre de nouvelles bougies.
+        """
+        if isinstance(ohlcv, pd.DataFrame):
+            frame = ohlcv.reset_index()
+            timestamps = pd.DatetimeIndex(frame['timestamp']).as_unit('ms').asi8
+            incoming = {'timestamp': timestamps}
+            for name in COLUMNS[1:]:
+                incoming[name] = frame[name].to_numpy(dtype=np.float64)
+        else:
+            rows = np.asarray(ohlcv, dtype=np.float64).reshape(-1, len(COLUMNS))
+            incoming = {'timestamp': rows[:, 0].astype(np.int64)}
+            for k, name in enumerate(COLUMNS[1:], start=1):
+                incoming[name] = rows[:, k]
+
+        if len(incoming['timestamp']) == 0:
+            return 0
+
+        directory = self._dir(exchange_name, symbol, timeframe)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        added = 0
+        keys = _month_keys(incoming['timestamp'])
+        for month in np.unique(keys):
+            mask = keys == month
+            new = {name: values[mask] for name, values in incoming.items()}
+            path = directory / f'{month}.npz'
+            if path.exists():
+                old = self._load(path)
+                before = len(old['timestamp'])
+                merged = {name: np.concatenate([old[name], new[name]]) for name in COLUMNS}
+            else:
+                before = 0
+                merged = new
+
+            # Tri stable + déduplication (la dernière occurrence, donc la nouvelle, est conservée)
+            order = np.argsort(merged['timestamp'], kind='stable')
+            ts_sorted = merged['timestamp'][order]
+            keep = np.append(ts_sorted[1:] != ts_sorted[:-1], True)
+            merged = {name: values[order[keep]] for name, values in merged.items()}
+
+            tmp = path.with_name(path.name + '.tmp')
+            with open(tmp, 'wb') as f:
+                np.savez(f, **merged)
+            os.replace(tmp, path)
+            added += len(merged['timestamp']) - before
+        return added
+
+    def _parts(self, exchange_name, symbol, timeframe, start_ts, end_ts):
+        parts = self.partitions(exchange_name, symbol, timeframe)
+        if start_ts is not None:
+            parts = [p for p in parts if p.stem >= start_ts.strftime('%Y-%m')]
+        if end_ts is not None:
+            parts = [p for p in parts if p.stem <= end_ts.strftime('%Y-%m')]
+        return parts
+
+    @staticmethod
+    def _frame(columns, start_ts, end_ts):
+        index = pd.DatetimeIndex(pd.to_datetime(columns.pop('timestamp'), unit='ms', utc=True), name='timestamp')
+        df = pd.DataFrame(columns, index=index)
+        if start_ts is not None:
+            df = df[df.index >= start_ts]
+        if end_ts is not None:
+            df = df[df.index <= end_ts]
+        return df
+
+    def read(self, exchange_name: str, symbol: str, timeframe: str, start=None, end=None):
+        """
+        DataFrame OHLCV (index timestamp UTC) entre start et end inclus
+        (dates ou Timestamps, optionnels). Ne charge que les mois nécessaires.
+        """
+        start_ts = _utc(start)
+        end_ts = _utc(end)
+
+        loaded = [self._load(p) for p in self._parts(exchange_name, symbol, timeframe, start_ts, end_ts)]
+        columns = {
+            name: np.concatenate([part[name] for part in loaded]) if loaded
+            else np.empty(0, dtype=np.int64 if name == 'timestamp' else np.float64)
+            for name in COLUMNS
+        }
+        return self._frame(columns, start_ts, end_ts)
+
+    def iter_read(self, exchange_name: str, symbol: str, timeframe: str, start=None, end=None):
+        """Comme read(), un DataFrame par partition mensuelle (historiques plus grands que la mémoire)."""
+        start_ts = _utc(start)
+        end_ts = _utc(end)
+        for path in self._parts(exchange_name, symbol, timeframe, start_ts, end_ts):
+            df = self._frame(self._load(path), start_ts, end_ts)
+            if not df.empty:
+                yield df
+
+    def drop_before(self, exchange_name: str, symbol: str, timeframe: str, before) -> int:
+        """Supprime les partitions entièrement antérieures à `before` (fenêtre glissante)."""
+        month = _utc(before).strftime('%Y-%m')
+        removed = 0
+        for path in self.partitions(exchange_name, symbol, timeframe):
+            if path.stem < month:
+                path.unlink()
+                removed += 1
+        return removed
+
+    def update(self, exchange, exchange_name: str, symbol: str, timeframe: str,
+               since_ms: int | None = None, limit: int = 720) -> int:
+        """
+        Télécharge uniquement les bougies manquantes puis les ajoute au store.
+
+        - store vide (ou sans période couverte connue) : historique depuis since_ms ;
+        - since_ms antérieur à la période couverte : bougies de since_ms au
+          début de la période couverte ;
+        - puis : bougies postérieures à la dernière bougie stockée.
+        La bougie en cours (non clôturée) n'est jamais stockée.
+        """
+        timeframe_ms = timeframe_to_ms(timeframe)
+        meta = self._read_meta(exchange_name, symbol, timeframe)
+        last_ts = self.last_timestamp(exchange_name, symbol, timeframe)
+
+        covered_since = meta.get('since_ms')
+        full = last_ts is None or (since_ms is not None and covered_since is None)
+        head = not full and since_ms is not None and since_ms < covered_since
+
+        # Début manquant : bougies toutes antérieures à la période couverte, donc clôturées
+        earlier = []
+        if head:
+            earlier = fetch_all_ohlcv(exchange, symbol, timeframe=timeframe, since_ms=since_ms, limit=limit,
+                                      until_ms=covered_since)
+        fetch_since = since_ms if full else last_ts + timeframe_ms
+
+        ohlcv = fetch_all_ohlcv(exchange, symbol, timeframe=timeframe, since_ms=fetch_since, limit=limit)
+        now_ms = int(time.time() * 1000)
+        closed = closed_candles(ohlcv, timeframe_ms, now_ms)
+        added = self.write(exchange_name, symbol, timeframe, earlier + closed)
+
+        if full or head:
+            self.mark_covered(exchange_name, symbol, timeframe, since_ms)
+        return added
+
+    def mark_covered(self, exchange_name: str, symbol: str, timeframe: str, since_ms: int | None):
+        """
+        Enregistre que l'historique est complet depuis since_ms : update() ne
+        télécharge ensuite que le début manquant (si since_ms recule) et les
+        bougies postérieures à la dernière stockée.
+        """
+        if since_ms is None:
+            return
+        meta = self._read_meta(exchange_name, symbol, timeframe)
+        covered_since = meta.get('since_ms')
+        meta['since_ms'] = since_ms if covered_since is None else min(since_ms, covered_since)
+        self._write_meta(exchange_name, symbol, timeframe, meta)
@@ -0,0 +1,238 @@
+"""
+Calcul des indicateurs hors mémoire pour les longs historiques (1m / 5m sur
+plusieurs années) : les partitions du CandleStore sont lues bloc par bloc,
+chaque bloc reprend l'état du précédent (récurrences des EMA, sommes
+compensées et fins de fenêtres glissantes) et les lignes terminées sont
+écrites dans un store en colonnes. Le résultat est identique au bit près à
+add_all_indicators sur tout l'historique, pour une mémoire de l'ordre d'un bloc.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import compact_frame
+from src.candle_store import CandleStore, _utc
+from src.fused_indicators import STRUCTURE_LABELS, Scans, compute_indicators, labels
+from src.htf_aggregator import period_ns
+
+
+class Carry(Scans):
+    """
+    État des balayages de compute_indicators d'un bloc au suivant : pour
+    chaque clé, l'état du noyau et les dernières valeurs d'entrée nécessaires
+    à la fenêtre (voir Scans._scan).
+
+    timeframe : durée des bougies ('1m', '1h', ...) ; les blocs HTF des
+    filtres 4h / 1j se terminent sur cette grille.
+    """
+
+    def __init__(self, timeframe):
+        self.delta = period_ns(timeframe)
+        self.pending = 0
+        self.revised = {}
+        self._scans = {}
+        self._states = {}
+        self._htf = {}
+
+    def _scan(self, key, run, values, out, state, keep, commit=None):
+        state, tail = self._scans.get(key, (state, values[:0]))
+        commit = len(values) if commit is None else commit
+        for start, stop, save in ((0, commit, True), (commit, len(values), False)):
+            if start == stop:
+                continue
+            if not save:
+                # Valeurs provisoires : l'état définitif n'avance pas
+                state = None if state is None else state.copy()
+            values_ext = np.concatenate([tail, values[start:stop]])
+            out_ext = np.empty(len(values_ext), dtype=out.dtype)
+            run(values_ext, out_ext, state, len(tail))
+            out[start:stop] = out_ext[len(tail):]
+            if save:
+                tail = values_ext[len(values_ext) - min(keep, len(values_ext)):]
+                self._scans[key] = (state, tail)
+        return out
+
+    def _state(self, key, state):
+        return self._states.setdefault(key, state)
+
+    def htf_state(self, name):
+        return self._htf.setdefault(name, {})
+
+    def hold(self, pending, revised):
+        self.pending = pending
+        self.revised = revised
+
+
+def iter_indicators(chunks, timeframe, chop_period=14, sr_lookback=50, atr_period=14, htf_seed=None):
+    """
+    Indicateurs d'une suite de blocs OHLCV consécutifs (index trié, sans
+    doublon, sur la grille de `timeframe`). Produit des DataFrames au format
+    de add_all_indicators ; les 9 dernières bougies d'un bloc (structure
+    centrée) sont retenues jusqu'au bloc suivant.
+    """
+    carry = Carry(timeframe)
+    held = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        frame = compute_indicators(chunk, chop_period, sr_lookback, atr_period, htf_seed, scans=carry)
+        if held is not None:
+            # Structure des bougies retenues, recalculée avec la suite de l'historique
+            for name, values in carry.revised.items():
+                if name == 'structure':
+                    values = labels(values, STRUCTURE_LABELS, held.index)
+                held[name] = values
+            frame = pd.concat([held, frame])
+        split = len(frame) - carry.pending
+        held = frame.iloc[split:].copy()
+        if split:
+            yield frame.iloc[:split]
+    if held is not None and len(held):
+        yield held
+
+
+def rechunk(frames, rows):
+    """Regroupe des DataFrames consécutifs (ex. partitions mensuelles) en blocs d'au moins `rows` lignes."""
+    buffer, count = [], 0
+    for frame in frames:
+        buffer.append(frame)
+        count += len(frame)
+        if count >= rows:
+            yield pd.concat(buffer) if len(buffer) > 1 else buffer[0]
+            buffer, count = [], 0
+    if buffer:
+        yield pd.concat(buffer) if len(buffer) > 1 else buffer[0]
+
+
+class IndicatorStore:
+    """
+    Indicateurs calculés stockés dans <root>/<exchange>/<SYMBOLE>/<timeframe>/AAAA-MM.npz
+    (une colonne par champ : index et date en datetime64 UTC, float64,
+    booléens, régimes en codes int8). read() ne charge que les mois et colonnes demandés.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root or os.getenv('INDICATOR_STORE_DIR', 'data/indicators'))
+
+    def _dir(self, exchange_name: str, symbol: str, timeframe: str) -> Path:
+        return self.root / exchange_name / symbol.replace('/', '-') / timeframe
+
+    def partitions(self, exchange_name: str, symbol: str, timeframe: str):
+        """Fichiers de partition triés par mois."""
+        directory = self._dir(exchange_name, symbol, timeframe)
+        if not directory.exists():
+            return []
+        return sorted(directory.glob('*.npz'))
+
+    def clear(self, exchange_name: str, symbol: str, timeframe: str) -> int:
+        """Supprime toutes les partitions (recalcul complet)."""
+        parts = self.partitions(exchange_name, symbol, timeframe)
+        for path in parts:
+            path.unlink()
+        return len(parts)
+
+    @staticmethod
+    def _encode(df):
+        data = {'timestamp': df.index.tz_convert('UTC').tz_localize(None).to_numpy()}
+        for name in df.columns:
+            column = df[name]
+            if name in compact_frame.REGIME_COLUMNS:
+                data[name] = compact_frame.regime_codes(column)
+            elif name == 'date':
+                data[name] = pd.DatetimeIndex(column).tz_convert('UTC').tz_localize(None).to_numpy()
+            else:
+                data[name] = column.to_numpy()
+        return data
+
+    def append(self, exchange_name: str, symbol: str, timeframe: str, df) -> int:
+        """
+        Ajoute des lignes (index UTC trié) postérieures à celles déjà stockées.
+        Seules les partitions des mois touchés sont réécrites.
+        """
+        directory = self._dir(exchange_name, symbol, timeframe)
+        directory.mkdir(parents=True, exist_ok=True)
+        start = 0
+        while start < len(df):
+            month = _utc(df.index[start]).normalize().replace(day=1)
+            stop = df.index.searchsorted(month + pd.offsets.MonthBegin(1))
+            new = self._encode(df.iloc[start:stop])
+            path = directory / f"{month.strftime('%Y-%m')}.npz"
+            if path.exists():
+                with np.load(path) as old:
+                    new = {name: np.concatenate([old[name], new[name]]) for name in new}
+            tmp = path.with_name(path.name + '.tmp')
+            with open(tmp, 'wb') as f:
+                np.savez(f, **new)
+            os.replace(tmp, path)
+            start = stop
+        return len(df)
+
+    def read(self, exchange_name: str, symbol: str, timeframe: str, columns=None, start=None, end=None):
+        """
+        DataFrame (index timestamp UTC) des colonnes demandées (toutes si None)
+        entre start et end inclus.
+        """
+        start_ts = _utc(start)
+        end_ts = _utc(end)
+        parts = self.partitions(exchange_name, symbol, timeframe)
+        if start_ts is not None:
+            parts = [p for p in parts if p.stem >= start_ts.strftime('%Y-%m')]
+        if end_ts is not None:
+            parts = [p for p in parts if p.stem <= end_ts.strftime('%Y-%m')]
+
+        loaded = {}
+        for path in parts:
+            with np.load(path) as data:
+                names = ['timestamp'] + [name for name in data.files if name != 'timestamp'
+                                         and (columns is None or name in columns)]
+                for name in names:
+                    loaded.setdefault(name, []).append(data[name])
+        if not loaded:
+            return pd.DataFrame(columns=list(columns or ()))
+
+        index = pd.DatetimeIndex(pd.to_datetime(np.concatenate(loaded.pop('timestamp')), utc=True), name='timestamp')
+        data = {}
+        for name, arrays in loaded.items():
+            values = np.concatenate(arrays)
+            if name in compact_frame.REGIME_COLUMNS:
+                data[name] = compact_frame.regime_labels(values, index)
+            elif name == 'date':
+                data[name] = pd.to_datetime(values, utc=True)
+            else:
+                data[name] = values
+        df = pd.DataFrame(data, index=index, copy=False)
+        if start_ts is not None:
+            df = df[df.index >= start_ts]
+        if end_ts is not None:
+            df = df[df.index <= end_ts]
+        return df
+
+
+def compute_to_store(exchange_name, symbol, timeframe, candles=None, indicators=None, chunk_rows=None,
+                     start=None, end=None, htf_seed=None, **params):
+    """
+    Recalcule les indicateurs de tout l'historique du CandleStore, bloc par
+    bloc (chunk_rows bougies, défaut INDICATORS_CHUNK_ROWS), et les écrit dans
+    l'IndicatorStore. params : chop_period, sr_lookback, atr_period.
+    Retourne le nombre de lignes écrites.
+    """
+    candles = candles or CandleStore()
+    indicators = indicators or IndicatorStore()
+    if chunk_rows is None:
+        chunk_rows = int(os.getenv('INDICATORS_CHUNK_ROWS', '200000'))
+
+    indicators.clear(exchange_name, symbol, timeframe)
+    chunks = rechunk(candles.iter_read(exchange_name, symbol, timeframe, start=start, end=end), chunk_rows)
+    written = 0
+    month = []  # lignes du mois en cours : chaque partition n'est écrite qu'une fois
+    for frame in iter_indicators(chunks, timeframe, htf_seed=htf_seed, **params):
+        complete = frame.index.searchsorted(_utc(frame.index[-1]).normalize().replace(day=1))
+        if complete:
+            written += indicators.append(exchange_name, symbol, timeframe, pd.concat(month + [frame.iloc[:complete]]))
+            month = []
+        month.append(frame.iloc[complete:])
+    if month:
+        written += indicators.append(exchange_name, symbol, timeframe, pd.concat(month))
+    return written
@@ -0,0 +1,97 @@
+"""
+Mode compact des DataFrames d'indicateurs (longs historiques 1m/5m) :
+float32 quand la précision le permet, codes int8 pour les régimes
+(trend, structure), booléens regroupés bit à bit dans une colonne `flags`
+et intermédiaires supprimés. memory_report() détaille l'empreinte par colonne
+"""
+import numpy as np
+import pandas as pd
+
+from src.fused_indicators import COLUMNS, labels
+
+# Régimes : code int8 -1 / 0 / 1 <-> libellé
+REGIME_COLUMNS = ('trend', 'structure')
+REGIME_LABELS = ('BEARISH', 'NEUTRAL', 'BULLISH')
+
+# Booléens regroupés dans `flags` (uint8), bit k = FLAG_BITS[k]
+FLAG_BITS = ('hh', 'hl', 'lh', 'll', 'bb_squeeze')
+
+# Intermédiaires de calcul non conservés par défaut
+DROPPED_COLUMNS = ('date', 'swing_high', 'swing_low', 'bb_std', 'bb_width_ma')
+COMPACT_COLUMNS = tuple(name for name in COLUMNS if name not in DROPPED_COLUMNS)
+
+
+def regime_labels(codes, index):
+    """Codes -1 / 0 / 1 -> colonne texte BEARISH / NEUTRAL / BULLISH."""
+    return labels(np.asarray(codes, dtype=np.int8) + 1, REGIME_LABELS, index)
+
+
+def regime_codes(values):
+    """Colonne texte de régime -> codes int8 (-1 / 0 / 1)."""
+    values = np.asarray(values, dtype=object)
+    return (np.where(values == 'BULLISH', 1, 0) - np.where(values == 'BEARISH', 1, 0)).astype(np.int8)
+
+
+def to_float32(values):
+    """
+    float32 si la colonne tient dans sa plage normale (l'arrondi y reste sous
+    2^-24 en relatif) ; float64 inchangé en cas de dépassement ou de valeurs
+    trop petites (sous-normales).
+    """
+    compact = values.astype(np.float32)
+    magnitude = np.abs(compact)
+    overflow = np.count_nonzero(np.isinf(magnitude)) != np.count_nonzero(np.isinf(values))
+    underflow = np.count_nonzero(magnitude < np.finfo(np.float32).tiny) != np.count_nonzero(values == 0)
+    return values if overflow or underflow else compact
+
+
+def pack_flags(columns, n):
+    """{nom: tableau bool} -> uint8 (bit k = FLAG_BITS[k], 0 si absent)."""
+    flags = np.zeros(n, dtype=np.uint8)
+    for bit, name in enumerate(FLAG_BITS):
+        if name in columns:
+            flags |= np.asarray(columns[name], dtype=np.uint8) << np.uint8(bit)
+    return flags
+
+
+def unpack_flags(df):
+    """Colonnes booléennes hh, hl, lh, ll, bb_squeeze d'un DataFrame compact."""
+    flags = df['flags'].to_numpy()
+    return pd.DataFrame({name: (flags >> bit) & 1 == 1 for bit, name in enumerate(FLAG_BITS)}, index=df.index)
+
+
+def compact(df, drop=DROPPED_COLUMNS):
+    """
+    Version compacte d'un DataFrame d'indicateurs déjà calculé (colonnes
+    float -> float32 si possible, régimes -> int8, booléens -> flags).
+    """
+    data = {}
+    flags = {}
+    for name in df.columns:
+        if name in drop:
+            continue
+        column = df[name]
+        if name in FLAG_BITS:
+            flags[name] = column.to_numpy(dtype=np.bool_)
+        elif name in REGIME_COLUMNS:
+            data[name] = regime_codes(column)
+        elif column.dtype == np.float64:
+            data[name] = to_float32(column.to_numpy())
+        else:
+            data[name] = column
+    if flags:
+        data['flags'] = pack_flags(flags, len(df))
+    return pd.DataFrame(data, index=df.index, copy=False)
+
+
+def memory_report(df):
+    """Empreinte mémoire par colonne (index compris) : dtype, octets, octets/ligne, part du total."""
+    usage = df.memory_usage(deep=True)
+    dtypes = pd.Series({'Index': df.index.dtype, **df.dtypes.to_dict()})
+    report = pd.DataFrame({
+        'dtype': dtypes.reindex(usage.index).astype(str),
+        'bytes': usage,
+        'bytes_per_row': usage / max(len(df), 1),
+        'share': usage / usage.sum(),
+    })
+    return report.sort_values('bytes', ascending=False)
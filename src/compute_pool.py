@@ -0,0 +1,138 @@
+"""
+Évaluation indicateurs + stratégie répartie sur plusieurs processus :
+les bougies de nombreux symboles partent en mémoire partagée, seuls des
+résultats compacts (signal + quelques valeurs) reviennent
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.indicators import TechnicalIndicators
+from src.shared_arrays import SharedArrays
+from src.strategy import ImprovedStrategy
+
+
+# Valeurs de la dernière bougie clôturée renvoyées avec le signal (notification)
+SIGNAL_FIELDS = ('close', 'rsi', 'ema_20', 'ema_50', 'ema_200', 'chop', 'support', 'resistance')
+
+# Seules les colonnes lues par la stratégie et renvoyées sont calculées
+INDICATOR_COLUMNS = tuple(dict.fromkeys(ImprovedStrategy.REQUIRED_COLUMNS + SIGNAL_FIELDS[1:] + ('trend',)))
+
+_worker_params = None
+
+
+def evaluate_candles(ohlcv, params=None):
+    """
+    Indicateurs + signal pour une liste de bougies [ts, o, h, l, c, v]
+    (bougie en cours en dernière ligne). Retourne un dict compact : timestamp
+    (ms) de la bougie clôturée, signal, reason, trend, niveaux et SIGNAL_FIELDS.
+    """
+    rows = np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
+    index = pd.DatetimeIndex(pd.to_datetime(rows[:, 0].astype(np.int64), unit='ms'), name='timestamp')
+    df = pd.DataFrame(rows[:, 1:], columns=['open', 'high', 'low', 'close', 'volume'], index=index)
+    return _evaluate_frame(df, params)
+
+
+def _evaluate_frame(df, params):
+    started = time.perf_counter()
+    df = TechnicalIndicators.add_all_indicators(df, columns=INDICATOR_COLUMNS)
+    signal = ImprovedStrategy.generate_signal(df, params)
+    last = df.iloc[-2]
+    result = {
+        'timestamp': int(pd.Timestamp(last.name).value // 1_000_000),
+        'signal': signal.signal,
+        'reason': signal.reason,
+        'trend': signal.context.get('trend', last['trend']),
+        'stop_loss': signal.stop_loss,
+        'take_profit_1': signal.take_profit_1,
+        'take_profit_2': signal.take_profit_2,
+    }
+    for name in SIGNAL_FIELDS:
+        result[name] = float(last[name])
+    result['compute_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def pack_candles(batch):
+    """
+    Concatène les bougies de plusieurs symboles dans un bloc partagé :
+    une colonne par champ + offsets (symbole k = lignes offsets[k]:offsets[k+1]).
+    """
+    rows = [np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6) for ohlcv in batch]
+    stacked = np.concatenate(rows) if rows else np.empty((0, 6))
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(r) for r in rows])
+    return SharedArrays.create({
+        'offsets': offsets,
+        'timestamp': stacked[:, 0].astype(np.int64),
+        'ohlcv': stacked[:, 1:],
+    })
+
+
+def _worker_init(params):
+    global _worker_params
+    _worker_params = params
+
+
+def _evaluate_shard(spec):
+    """Worker : attache le bloc, évalue chaque symbole, ne renvoie que les résultats compacts."""
+    shared = SharedArrays.attach(spec)
+    try:
+        offsets = shared['offsets']
+        results = []
+        for k in range(len(offsets) - 1):
+            lo, hi = offsets[k], offsets[k + 1]
+            # Copie locale de quelques Ko : le bloc partagé peut être fermé juste après
+            index = pd.DatetimeIndex(pd.to_datetime(shared['timestamp'][lo:hi], unit='ms'), name='timestamp')
+            df = pd.DataFrame(np.array(shared['ohlcv'][lo:hi]),
+                              columns=['open', 'high', 'low', 'close', 'volume'], index=index)
+            try:
+                results.append(_evaluate_frame(df, _worker_params))
+            except Exception as e:
+                results.append({'error': f"{type(e).__name__}: {e}"})
+        return results
+    finally:
+        shared.close()
+
+
+class ShardedEvaluator:
+    """
+    Pool de processus (spawn) qui évalue des lots de symboles.
+
+    submit(batch) copie le lot dans un bloc SharedMemory et retourne un
+    Future (liste de résultats dans l'ordre du lot) ; le bloc est libéré
+    dès que le worker a terminé. workers=0 : un processus par cœur.
+    """
+
+    def __init__(self, workers=0, params=None):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.params = params
+        ctx = multiprocessing.get_context("spawn")
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx,
+                                         initializer=_worker_init, initargs=(params,))
+
+    def submit(self, batch):
+        shared = pack_candles(batch)
+        future = self._pool.submit(_evaluate_shard, shared.spec)
+        future.add_done_callback(lambda _: shared.close())
+        return future
+
+    def evaluate(self, batch, shard_size=None):
+        """Évalue tout le lot (découpé en shards) et retourne les résultats dans l'ordre."""
+        if shard_size is None:
+            shard_size = max(1, -(-len(batch) // (self.workers * 4)))
+        futures = [self.submit(batch[i:i + shard_size]) for i in range(0, len(batch), shard_size)]
+        return [result for future in futures for result in future.result()]
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
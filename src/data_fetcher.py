@@ -1,31 +1,113 @@
 """
 Récupération des données de marché
 """
+import os
+import time
+
 import ccxt
 import pandas as pd
 from datetime import datetime
 
+from src.candle_store import COLUMNS, CandleStore, closed_candles, timeframe_to_ms
+from src.htf_aggregator import HTF_PERIODS
+
 class DataFetcher:
-    def __init__(self, exchange_name='kraken', symbol='BTC/USDT'):
+    def __init__(self, exchange_name='kraken', symbol='BTC/USDT', cache_dir=None):
         self.exchange = getattr(ccxt, exchange_name)({
             'enableRateLimit': True
         })
+        self.exchange_name = exchange_name
         self.symbol = symbol
 
+        # Fenêtre de bougies persistée sur disque (OHLCV_CACHE=false pour désactiver)
+        if cache_dir is None and os.getenv('OHLCV_CACHE', 'true').lower() == 'true':
+            cache_dir = os.getenv('OHLCV_CACHE_DIR', 'data/live')
+        self.store = CandleStore(cache_dir) if cache_dir else None
+        self._windows = {}
+        self.last_fetch_size = None
+
+    @staticmethod
+    def _to_frame(ohlcv):
+        # Conversion en DataFrame pandas
+        df = pd.DataFrame(ohlcv, columns=list(COLUMNS))
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df.set_index('timestamp', inplace=True)
+        return df
+
     def get_ohlcv(self, timeframe='1h', limit=100):
-        """Récupère les données OHLCV"""
+        """Récupère les données OHLCV (les `limit` dernières bougies, bougie en cours incluse)"""
         try:
+            if self.store is not None:
+                return self._get_ohlcv_cached(timeframe, limit)
+
             ohlcv = self.exchange.fetch_ohlcv(self.symbol, timeframe, limit=limit)
+            self.last_fetch_size = len(ohlcv)
+            return self._to_frame(ohlcv)
+        except Exception as e:
+            print(f"❌ Erreur récupération données: {e}")
+            return None
 
-            # Conversion en DataFrame pandas
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
+    def _get_ohlcv_cached(self, timeframe, limit):
+        """
+        Ne télécharge que les bougies postérieures à la dernière bougie
+        clôturée en cache (donc la bougie en cours est toujours rafraîchie),
+        puis complète avec la fenêtre stockée sur disque (ou gardée en
+        mémoire d'un appel à l'autre, en mode démon).
+        """
+        timeframe_ms = timeframe_to_ms(timeframe)
+        now_ms = int(time.time() * 1000)
+        window = self._windows.get(timeframe)
+        if window is not None and not window.empty:
+            last_ts = window.index[-1].value // 1_000_000
+        else:
+            window = None
+            last_ts = self.store.last_timestamp(self.exchange_name, self.symbol, timeframe)
 
-            return df
+        if last_ts is None or (now_ms - last_ts) // timeframe_ms >= limit:
+            window = None
+            ohlcv = self.exchange.fetch_ohlcv(self.symbol, timeframe, limit=limit)
+        else:
+            ohlcv = self.exchange.fetch_ohlcv(self.symbol, timeframe, since=last_ts + timeframe_ms)
+        self.last_fetch_size = len(ohlcv)
+
+        # Seules les bougies clôturées (et confirmées par l'exchange) sont persistées
+        closed = closed_candles(ohlcv, timeframe_ms, now_ms)
+        live = ohlcv[len(closed):]
+        self.store.write(self.exchange_name, self.symbol, timeframe, closed)
+
+        window_start = pd.Timestamp(now_ms - limit * timeframe_ms, unit='ms', tz='UTC')
+        if window is not None:
+            history = pd.concat([window, self._to_frame(closed)]) if closed else window
+            history = history[history.index >= window_start.tz_localize(None)]
+        else:
+            history = self.store.read(self.exchange_name, self.symbol, timeframe, start=window_start)
+            history.index = history.index.tz_localize(None)
+        self.store.drop_before(self.exchange_name, self.symbol, timeframe, window_start)
+        history = history[~history.index.duplicated(keep='last')]
+        self._windows[timeframe] = history
+
+        df = pd.concat([history, self._to_frame(live)]) if live else history
+        df = df[~df.index.duplicated(keep='last')]
+        return df.tail(limit)
+
+    def get_htf_seed(self, limit=None):
+        """
+        Bougies natives 4h / 1j clôturées ({'4h': df, '1d': df}) pour préchauffer
+        l'EMA 200 4h et la SMA 200 journalière sans télécharger des milliers de
+        bougies de base. None en cas d'erreur.
+        """
+        if limit is None:
+            limit = int(os.getenv('HTF_SEED_LIMIT', '300'))
+        now_ms = int(time.time() * 1000)
+        seed = {}
+        try:
+            for period in HTF_PERIODS:
+                ohlcv = self.exchange.fetch_ohlcv(self.symbol, period, limit=limit)
+                seed[period] = self._to_frame(closed_candles(ohlcv, timeframe_to_ms(period), now_ms))
         except Exception as e:
-            print(f"❌ Erreur récupération données: {e}")
+            print(f"❌ Erreur récupération bougies HTF: {e}")
             return None
+        return seed
 
     def get_current_price(self):
         """Prix actuel"""
@@ -48,4 +130,4 @@ if __name__ == "__main__":
         print(f"\n{df.tail()}")
 
         price = fetcher.get_current_price()
-        print(f"\n💰 Prix actuel: ${price:,.2f}")
\ No newline at end of file
+        print(f"\n💰 Prix actuel: ${price:,.2f}")
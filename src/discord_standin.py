@@ -0,0 +1,171 @@
+"""
+Faux webhook Discord local (tests et charge sans toucher au vrai canal)
+
+    python -m src.discord_standin --port 8790 --latency 20-150 --error-rate 0.02
+    DISCORD_TEST_WEBHOOK_URL=http://127.0.0.1:8790/api/webhooks/1/test
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class DiscordStandIn:
+    """
+    Serveur HTTP (thread) qui imite un webhook Discord :
+
+    - POST /api/webhooks/<id>/<token> : 204 si le message est valide
+      (contenu ou 1 à 10 embeds), 400 sinon ;
+    - limite de débit par webhook (rate_limit requêtes par fenêtre de
+      rate_window s) annoncée par les en-têtes X-RateLimit-*, 429 avec
+      retry_after (corps JSON) et Retry-After au-delà ;
+    - latence aléatoire (latency_ms = (min, max)) et 5xx aléatoires (error_rate).
+
+    Chaque message accepté est enregistré dans `received` (heure de
+    réception, chemin, embeds) ; `counts` compte les réponses par statut.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, rate_limit=5, rate_window=2.0,
+                 latency_ms=(0, 0), error_rate=0.0, seed=None):
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.received = []
+        self.counts = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def webhook_url(self, name='test'):
+        return f'{self.url}/api/webhooks/1/{name}'
+
+    def _take(self, path, now):
+        """Consomme une requête du bucket du webhook ; retourne (autorisé, restant, reset_after)."""
+        with self._lock:
+            window_end, used = self._buckets.get(path, (0.0, 0))
+            if now >= window_end:
+                window_end, used = now + self.rate_window, 0
+            if used >= self.rate_limit:
+                return False, 0, window_end - now
+            used += 1
+            self._buckets[path] = (window_end, used)
+            return True, self.rate_limit - used, window_end - now
+
+    def _count(self, status):
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=None, headers=None):
+                payload = json.dumps(body).encode() if body is not None else b''
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if payload:
+                    self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                standin._count(status)
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if not self.path.startswith('/api/webhooks/'):
+                    return self._reply(404, {'message': 'Unknown Webhook', 'code': 10015})
+
+                low, high = standin.latency_ms
+                if high > 0:
+                    time.sleep(standin.rng.uniform(low, high) / 1000)
+                if standin.rng.random() < standin.error_rate:
+                    return self._reply(standin.rng.choice((500, 502, 503)), {'message': 'Internal Server Error'})
+
+                allowed, remaining, reset_after = standin._take(self.path, time.monotonic())
+                headers = {
+                    'X-RateLimit-Limit': str(standin.rate_limit),
+                    'X-RateLimit-Remaining': str(remaining),
+                    'X-RateLimit-Reset-After': f'{reset_after:.3f}',
+                    'X-RateLimit-Bucket': self.path.rsplit('/', 1)[-1],
+                }
+                if not allowed:
+                    headers['Retry-After'] = str(max(int(reset_after + 0.999), 1))
+                    return self._reply(429, {'message': 'You are being rate limited.',
+                                             'retry_after': round(reset_after, 3), 'global': False}, headers)
+
+                try:
+                    data = json.loads(raw or b'{}')
+                except ValueError:
+                    return self._reply(400, {'message': 'Cannot send an empty message', 'code': 50006})
+                embeds = data.get('embeds') or []
+                if (not embeds and not data.get('content')) or len(embeds) > 10:
+                    return self._reply(400, {'message': 'Invalid Form Body', 'code': 50035})
+
+                with standin._lock:
+                    standin.received.append((time.time(), self.path, embeds))
+                self._reply(204, headers=headers)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name='discord-standin')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _latency(value):
+    low, _, high = value.partition('-')
+    return float(low), float(high or low)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux webhook Discord local")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8790)
+    parser.add_argument('--rate-limit', type=int, default=5, help="requêtes par fenêtre et par webhook")
+    parser.add_argument('--rate-window', type=float, default=2.0, help="durée de la fenêtre (s)")
+    parser.add_argument('--latency', type=_latency, default=(0, 0), help="latence en ms, ex. 20-150")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="proportion de réponses 5xx")
+    args = parser.parse_args()
+
+    standin = DiscordStandIn(args.host, args.port, args.rate_limit, args.rate_window,
+                             args.latency, args.error_rate).start()
+    print(f"🧪 Faux webhook Discord : {standin.webhook_url()}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"📬 {len(standin.received)} message(s) reçus, réponses {standin.counts}")
+    except KeyboardInterrupt:
+        standin.stop()
+        print("\n🛑 Arrêt du faux webhook")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,637 @@
+"""
+Moteur d'indicateurs fusionné : mêmes colonnes (et mêmes valeurs, au bit
+près) que TechnicalIndicators.add_all_indicators, calculées sur tableaux
+NumPy. Les intermédiaires partagés (true range, EMA, fenêtres glissantes)
+ne sont calculés qu'une fois et écrits dans un bloc de sortie préalloué,
+sans copie de DataFrame
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from src import htf_aggregator
+
+try:
+    from numba import njit
+except ImportError:  # numba est optionnel : repli sur les boucles Python (lent)
+    njit = None
+
+
+NAN = np.nan
+
+# Colonnes produites, dans l'ordre historique de add_all_indicators
+COLUMNS = (
+    'ema_20', 'ema_50', 'ema_200', 'ema_200_slope', 'ema_50_slope', 'ema_200_slope_10',
+    'ema_50_slope_10', 'rsi', 'rsi_delta', 'volume_sma_20', 'chop', 'atr', 'atr_ma', 'support',
+    'resistance', 'trend', 'macd', 'macd_signal', 'macd_hist', 'date', 'vwap', 'swing_high',
+    'swing_low', 'hh', 'hl', 'lh', 'll', 'structure', 'bb_mid', 'bb_std', 'bb_upper', 'bb_lower',
+    'bb_width', 'bb_width_ma', 'bb_squeeze', 'ema_gap', 'volume_ratio', 'atr_pct', 'atr_pct_sma_20',
+    'ema_200_4h', 'ema_200_4h_slope', 'sma_200_1d',
+)
+
+# Colonnes non flottantes (insérées à leur place autour du bloc float64)
+_OTHER_COLUMNS = ('trend', 'date', 'hh', 'hl', 'lh', 'll', 'structure', 'bb_squeeze')
+FLOAT_COLUMNS = tuple(name for name in COLUMNS if name not in _OTHER_COLUMNS)
+
+# Codes de la colonne structure (0 = aucun swing confirmé)
+STRUCTURE_LABELS = ('NEUTRAL', 'BULLISH', 'BEARISH')
+
+# Seuil de perte de précision de la variance glissante (comme pandas)
+_INV_COND_TOL = np.finfo(np.float64).eps * 1e3
+
+
+# ----------------------------------------------------------------------
+# Noyaux (mêmes algorithmes que pandas._libs.window.aggregations)
+# Uniquement des scalaires et des tableaux pour être compilés par numba.
+# `state` porte les accumulateurs d'un appel au suivant (calcul par blocs,
+# voir chunked_indicators) ; `start` : premier indice calculé, les valeurs
+# précédentes étant la fin du bloc précédent (fenêtre glissante).
+# ----------------------------------------------------------------------
+def _ewm_mean(values, span, out, state):
+    """ewm(span, adjust=False).mean() ; state = [moyenne, poids]"""
+    com = (span - 1) / 2.0
+    alpha = 1.0 / (1.0 + com)
+    old_wt_factor = 1.0 - alpha
+    weighted = state[0]
+    old_wt = state[1]
+    for i in range(len(values)):
+        cur = values[i]
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if cur == cur:
+                if weighted != cur:
+                    weighted = old_wt * weighted + alpha * cur
+                    weighted /= (old_wt + alpha)
+                old_wt = 1.0
+        elif cur == cur:
+            weighted = cur
+        out[i] = weighted
+    state[0] = weighted
+    state[1] = old_wt
+
+
+def _rolling_mean(values, window, out, state, start):
+    """
+    rolling(window).mean() : sommes compensées (Kahan) en ajout et en retrait.
+    state = [somme, compensation ajout, compensation retrait, nobs, négatifs, répétitions, dernière valeur]
+    """
+    n = len(values)
+    sum_x = state[0]
+    comp_add = state[1]
+    comp_remove = state[2]
+    nobs = int(state[3])
+    neg_ct = int(state[4])
+    same_run = int(state[5])
+    prev_value = state[6]
+    for i in range(start, n):
+        if i >= window:
+            val = values[i - window]
+            if val == val:
+                nobs -= 1
+                y = -val - comp_remove
+                t = sum_x + y
+                comp_remove = t - sum_x - y
+                sum_x = t
+                if math.copysign(1.0, val) < 0.0:
+                    neg_ct -= 1
+        val = values[i]
+        if val == val:
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if math.copysign(1.0, val) < 0.0:
+                neg_ct += 1
+            if val == prev_value:
+                same_run += 1
+            else:
+                same_run = 1
+            prev_value = val
+        if nobs >= window and nobs > 0:
+            result = sum_x / nobs
+            if same_run >= nobs:
+                result = prev_value
+            elif neg_ct == 0 and result < 0:
+                result = 0.0
+            elif neg_ct == nobs and result > 0:
+                result = 0.0
+            out[i] = result
+        else:
+            out[i] = NAN
+    state[0] = sum_x
+    state[1] = comp_add
+    state[2] = comp_remove
+    state[3] = nobs
+    state[4] = neg_ct
+    state[5] = same_run
+    state[6] = prev_value
+
+
+def _rolling_sum(values, window, out, state, start):
+    """rolling(window).sum() ; state comme _rolling_mean (sans le compteur de négatifs, toujours 0)"""
+    n = len(values)
+    sum_x = state[0]
+    comp_add = state[1]
+    comp_remove = state[2]
+    nobs = int(state[3])
+    same_run = int(state[5])
+    prev_value = state[6]
+    for i in range(start, n):
+        if i >= window:
+            val = values[i - window]
+            if val == val:
+                nobs -= 1
+                y = -val - comp_remove
+                t = sum_x + y
+                comp_remove = t - sum_x - y
+                sum_x = t
+        val = values[i]
+        if val == val:
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if val == prev_value:
+                same_run += 1
+            else:
+                same_run = 1
+            prev_value = val
+        if nobs >= window:
+            out[i] = prev_value * nobs if same_run >= nobs else sum_x
+        else:
+            out[i] = NAN
+    state[0] = sum_x
+    state[1] = comp_add
+    state[2] = comp_remove
+    state[3] = nobs
+    state[5] = same_run
+    state[6] = prev_value
+
+
+def _add_var(val, nobs, mean_x, ssqdm_x, compensation, unstable):
+    if val != val:
+        return nobs, mean_x, ssqdm_x, compensation, unstable
+    prev_m2 = ssqdm_x
+    nobs += 1.0
+    prev_mean = mean_x - compensation
+    y = val - compensation
+    t = y - mean_x
+    compensation = t + mean_x - y
+    mean_x = mean_x + t / nobs
+    ssqdm_x = ssqdm_x + (val - prev_mean) * (val - mean_x)
+    if prev_m2 * _INV_COND_TOL > ssqdm_x:
+        unstable = True
+    return nobs, mean_x, ssqdm_x, compensation, unstable
+
+
+def _remove_var(val, nobs, mean_x, ssqdm_x, compensation, unstable):
+    if val != val:
+        return nobs, mean_x, ssqdm_x, compensation, unstable
+    prev_m2 = ssqdm_x
+    nobs -= 1.0
+    if nobs:
+        prev_mean = mean_x - compensation
+        y = val - compensation
+        t = y - mean_x
+        compensation = t + mean_x - y
+        mean_x = mean_x - t / nobs
+        ssqdm_x = ssqdm_x - (val - prev_mean) * (val - mean_x)
+        if prev_m2 * _INV_COND_TOL > ssqdm_x:
+            unstable = True
+    else:
+        mean_x = 0.0
+        ssqdm_x = 0.0
+        unstable = False
+    return nobs, mean_x, ssqdm_x, compensation, unstable
+
+
+def _rolling_std(values, window, out, state, start):
+    """
+    rolling(window).std() (ddof=1) : Welford compensé, recalcul de la fenêtre si instable.
+    state = [nobs, moyenne, somme des carrés, compensation ajout, compensation retrait, instable]
+    """
+    nobs = state[0]
+    mean_x = state[1]
+    ssqdm_x = state[2]
+    comp_add = state[3]
+    comp_remove = state[4]
+    unstable = state[5] != 0.0
+    for i in range(start, len(values)):
+        if i > 0:
+            if i >= window:
+                nobs, mean_x, ssqdm_x, comp_remove, unstable = _remove_var(
+                    values[i - window], nobs, mean_x, ssqdm_x, comp_remove, unstable)
+            nobs, mean_x, ssqdm_x, comp_add, unstable = _add_var(
+                values[i], nobs, mean_x, ssqdm_x, comp_add, unstable)
+        if i == 0 or unstable:
+            nobs = mean_x = ssqdm_x = comp_add = comp_remove = 0.0
+            for j in range(max(i + 1 - window, 0), i + 1):
+                nobs, mean_x, ssqdm_x, comp_add, unstable = _add_var(
+                    values[j], nobs, mean_x, ssqdm_x, comp_add, unstable)
+            unstable = False
+        if nobs >= window and nobs > 1:
+            var = ssqdm_x / (nobs - 1.0)
+            out[i] = 0.0 if var < 0 else math.sqrt(var)
+        else:
+            out[i] = NAN
+    state[0] = nobs
+    state[1] = mean_x
+    state[2] = ssqdm_x
+    state[3] = comp_add
+    state[4] = comp_remove
+    state[5] = 1.0 if unstable else 0.0
+
+
+def _rolling_extreme(values, window, is_max, out):
+    """
+    rolling(window).max() / .min() (van Herk / Gil-Werman : maxima préfixe et
+    suffixe par blocs de `window`). À égalité la valeur la plus récente est
+    gardée, comme la deque de pandas (0.0 / -0.0 identiques au bit près).
+    """
+    n = len(values)
+    sign = 1.0 if is_max else -1.0
+    prefix = np.empty(n)
+    suffix = out  # écrasé de la fin vers le début par le résultat
+    for start in range(0, n, window):
+        stop = min(start + window, n)
+        best = sign * values[start]
+        for i in range(start, stop):
+            v = sign * values[i]
+            if v >= best or i == start:
+                best = v
+            prefix[i] = best
+        best = sign * values[stop - 1]
+        for i in range(stop - 1, start - 1, -1):
+            v = sign * values[i]
+            if v > best or i == stop - 1:
+                best = v
+            suffix[i] = best
+    missing = 0  # NaN dans la fenêtre [i + 1 - window, i]
+    for i in range(max(n - window, 0), n):
+        missing += values[i] != values[i]
+    for i in range(n - 1, -1, -1):
+        if i + 1 < window or missing:
+            out[i] = NAN
+        else:
+            s = suffix[i + 1 - window]
+            out[i] = sign * (s if s > prefix[i] else prefix[i])
+        missing -= values[i] != values[i]
+        if i >= window:
+            missing += values[i - window] != values[i - window]
+
+
+def _group_cumsum(values, group_start, out, state):
+    """groupby(...).cumsum() sur des groupes contigus (Kahan, NaN ignorés) ; state = [somme, compensation]"""
+    total = state[0]
+    comp = state[1]
+    for i in range(len(values)):
+        if group_start[i]:
+            total = 0.0
+            comp = 0.0
+        val = values[i]
+        if val == val:
+            y = val - comp
+            t = total + y
+            comp = t - total - y
+            total = t
+            out[i] = total
+        else:
+            out[i] = NAN
+    state[0] = total
+    state[1] = comp
+
+
+if njit is not None:
+    _ewm_mean = njit(cache=True)(_ewm_mean)
+    _rolling_mean = njit(cache=True)(_rolling_mean)
+    _rolling_sum = njit(cache=True)(_rolling_sum)
+    _add_var = njit(cache=True)(_add_var)
+    _remove_var = njit(cache=True)(_remove_var)
+    _rolling_std = njit(cache=True)(_rolling_std)
+    _rolling_extreme = njit(cache=True)(_rolling_extreme)
+    _group_cumsum = njit(cache=True)(_group_cumsum)
+
+
+def jit_available():
+    """True si numba est installé (sinon le moteur fusionné est plus lent que pandas)."""
+    return njit is not None
+
+
+def supports(df):
+    """Le moteur fusionné exige un index temporel trié sans doublon et aucune colonne d'indicateur existante."""
+    index = df.index
+    return (
+        isinstance(index, pd.DatetimeIndex) and len(index) > 0
+        and index.is_monotonic_increasing and index.is_unique
+        and not any(name in df.columns for name in COLUMNS)
+    )
+
+
+def _diff(values, periods, out):
+    out[:periods] = NAN
+    np.subtract(values[periods:], values[:-periods], out=out[periods:])
+
+
+def _shift(values, periods, out):
+    out[:periods] = NAN
+    out[periods:] = values[:-periods]
+
+
+# État initial des noyaux
+def _ewm_state():
+    return np.array([NAN, 1.0])
+
+
+def _window_state(how):
+    if how == 'std':
+        return np.zeros(6)
+    return np.array([0.0, 0.0, 0.0, 0.0, 0.0, 0.0, NAN])
+
+
+def _run_window(how, window):
+    """Noyau glissant (values, out, state, start) ; max / min n'ont pas d'état."""
+    if how == 'mean':
+        return lambda values, out, state, start: _rolling_mean(values, window, out, state, start)
+    if how == 'sum':
+        return lambda values, out, state, start: _rolling_sum(values, window, out, state, start)
+    if how == 'std':
+        return lambda values, out, state, start: _rolling_std(values, window, out, state, start)
+    return lambda values, out, state, start: _rolling_extreme(values, window, how == 'max', out)
+
+
+def _ffill_codes(codes, out, state, start):
+    """Codes non nuls propagés vers l'avant ; state = [dernier code propagé]."""
+    filled = np.where(codes != 0, np.arange(len(codes)), -1)
+    np.maximum.accumulate(filled, out=filled)
+    out[:] = np.where(filled >= 0, codes[np.maximum(filled, 0)], state[0])
+    if len(out):
+        state[0] = out[-1]
+
+
+class Scans:
+    """
+    Balayages séquentiels de compute_indicators (EMA, fenêtres glissantes,
+    décalages, cumuls) sur un seul bloc : tout l'historique est en mémoire.
+    chunked_indicators.Carry reprend chaque balayage (identifié par `key`)
+    d'un bloc à l'autre. `commit` : nombre de valeurs définitives, les
+    suivantes sont calculées sans faire avancer l'état (Carry uniquement).
+    """
+
+    # Durée des bougies pour les filtres HTF (None : déduite de l'index)
+    delta = None
+    # Bougies du bloc précédent dont la structure dépendait de ce bloc
+    pending = 0
+
+    def _scan(self, key, run, values, out, state, keep, commit=None):
+        """run(values, out, state, start) ; `keep` : valeurs précédentes nécessaires à la reprise."""
+        run(values, out, state, 0)
+        return out
+
+    def _state(self, key, state):
+        return state
+
+    @staticmethod
+    def _out(values, out, dtype=np.float64):
+        return np.empty(len(values), dtype=dtype) if out is None else out
+
+    def ewm(self, key, values, span, out=None, commit=None):
+        run = lambda values, out, state, start: _ewm_mean(values, span, out, state)
+        return self._scan(key, run, values, self._out(values, out), _ewm_state(), 0, commit)
+
+    def rolling(self, key, values, window, how, out=None, commit=None):
+        keep = window - 1 if how in ('max', 'min') else window
+        return self._scan(key, _run_window(how, window), values, self._out(values, out),
+                          _window_state(how), keep, commit)
+
+    def diff(self, key, values, periods, out=None, commit=None):
+        run = lambda values, out, state, start: _diff(values, periods, out)
+        return self._scan(key, run, values, self._out(values, out), None, periods, commit)
+
+    def shift(self, key, values, periods, out=None, commit=None):
+        run = lambda values, out, state, start: _shift(values, periods, out)
+        return self._scan(key, run, values, self._out(values, out), None, periods, commit)
+
+    def group_cumsum(self, key, values, group_start, out=None):
+        out = self._out(values, out)
+        _group_cumsum(values, group_start, out, self._state(key, np.zeros(2)))
+        return out
+
+    def new_groups(self, key, labels):
+        """True à chaque changement de valeur de `labels` (et sur la toute première ligne)."""
+        def run(values, out, state, start):
+            out[:1] = True
+            np.not_equal(values[1:], values[:-1], out=out[1:])
+        return self._scan(key, run, labels, self._out(labels, None, np.bool_), None, 1)
+
+    def ffill_codes(self, key, codes, commit=None):
+        """Codes int8 non nuls propagés vers l'avant (0 avant le premier)."""
+        return self._scan(key, _ffill_codes, codes, self._out(codes, None, np.int8), np.zeros(1), 0, commit)
+
+    def htf_state(self, name):
+        """État du filtre HTF `name` d'un bloc à l'autre (None en mémoire)."""
+        return None
+
+    def hold(self, pending, revised):
+        """Bougies en attente du bloc suivant et colonnes recalculées des précédentes (Carry uniquement)."""
+
+
+# ----------------------------------------------------------------------
+# Primitives sur tableaux (noyaux numba, ou pandas sans numba : mêmes valeurs)
+# ----------------------------------------------------------------------
+def ewm_mean(values, span):
+    """ewm(span, adjust=False).mean() d'un tableau float64."""
+    if njit is None:
+        return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+    out = np.empty(len(values))
+    _ewm_mean(values, span, out, _ewm_state())
+    return out
+
+
+def rolling(values, window, how):
+    """rolling(window).<how>() d'un tableau float64, how parmi mean, sum, std, max, min."""
+    if njit is None:
+        return getattr(pd.Series(values).rolling(window), how)().to_numpy()
+    out = np.empty(len(values))
+    _run_window(how, window)(values, out, _window_state(how), 0)
+    return out
+
+
+def group_cumsum(values, group_start):
+    """Somme cumulée remise à zéro à chaque group_start (groupby(...).cumsum() sur groupes contigus)."""
+    if njit is None:
+        return pd.Series(values).groupby(np.cumsum(group_start)).cumsum().to_numpy()
+    out = np.empty(len(values))
+    _group_cumsum(values, group_start, out, np.zeros(2))
+    return out
+
+
+# Filtres appliqués aux clôtures HTF (voir htf_aggregator.HTF_FILTERS)
+_HTF_SMOOTHERS = {
+    'ema': lambda closes: ewm_mean(closes, 200),
+    'sma': lambda closes: rolling(closes, 200, 'mean'),
+}
+
+
+def htf_filter(index, close, name, out, htf_seed=None, scans=None):
+    """
+    ema_200_4h / sma_200_1d : filtre calculé sur les seules bougies HTF
+    terminées à chaque bougie (voir htf_aggregator.point_in_time).
+    htf_seed : {'4h': bougies 4h, '1d': bougies 1j} natives de préchauffage.
+    scans : Scans de compute_indicators (reprise d'un bloc à l'autre).
+    """
+    period, kind = htf_aggregator.HTF_FILTERS[name]
+    seed = (htf_seed or {}).get(period)
+    if scans is None:
+        out[:] = htf_aggregator.point_in_time(index, close, period, _HTF_SMOOTHERS[kind], seed)
+        return
+    if kind == 'ema':
+        smooth = lambda closes, commit=None: scans.ewm(name, closes, 200, commit=commit)
+    else:
+        smooth = lambda closes, commit=None: scans.rolling(name, closes, 200, 'mean', commit=commit)
+    out[:] = htf_aggregator.point_in_time(index, close, period, smooth, seed, scans.delta, scans.htf_state(name))
+
+
+def labels(codes, labels, index):
+    """Colonne texte (dtype str, comme np.where(..., 'A', 'B') dans un DataFrame) depuis des codes."""
+    return pd.Series(pd.Categorical.from_codes(codes, labels), index=index).astype(str)
+
+
+def compute_indicators(df, chop_period=14, sr_lookback=50, atr_period=14, htf_seed=None, scans=None):
+    """
+    Retourne df + toutes les colonnes de add_all_indicators (df n'est pas modifié).
+    Voir supports() pour les conditions d'utilisation.
+    htf_seed : {'4h': bougies 4h, '1d': bougies 1j} natives pour le préchauffage HTF.
+    scans : état repris du bloc précédent (chunked_indicators.Carry) ; None = historique complet.
+    """
+    if scans is None:
+        scans = Scans()
+    n = len(df)
+    high, low, close, volume = (df[name].to_numpy(dtype=np.float64) for name in ('high', 'low', 'close', 'volume'))
+
+    # Bloc de sortie unique (une ligne contiguë par colonne float)
+    block = np.empty((len(FLOAT_COLUMNS), n))
+    col = {name: block[k] for k, name in enumerate(FLOAT_COLUMNS)}
+    scratch = np.empty((4, n))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # EMA (partagées entre tendance, pentes, écart et MACD)
+        for span in (20, 50, 200):
+            scans.ewm(f'ema_{span}', close, span, col[f'ema_{span}'])
+        scans.diff('ema_200_slope', col['ema_200'], 1, col['ema_200_slope'])
+        scans.diff('ema_50_slope', col['ema_50'], 1, col['ema_50_slope'])
+        scans.diff('ema_200_slope_10', col['ema_200'], 10, col['ema_200_slope_10'])
+        scans.diff('ema_50_slope_10', col['ema_50'], 10, col['ema_50_slope_10'])
+
+        # RSI (moyennes simples)
+        delta = scans.diff('close_delta', close, 1, scratch[0])
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = -np.where(delta < 0, delta, 0.0)
+        scans.rolling('rsi_gain', gain, 14, 'mean', scratch[1])
+        scans.rolling('rsi_loss', loss, 14, 'mean', scratch[2])
+        rs = scratch[1] / scratch[2]
+        np.subtract(100, 100 / (1 + rs), out=col['rsi'])
+        scans.diff('rsi_delta', col['rsi'], 1, col['rsi_delta'])
+
+        scans.rolling('volume_sma_20', volume, 20, 'mean', col['volume_sma_20'])
+
+        # True range calculé une fois pour CHOP et ATR
+        prev_close = scans.shift('prev_close', close, 1, scratch[0])
+        true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+        scans.rolling('chop_tr', true_range, chop_period, 'sum', scratch[1])
+        scans.rolling('chop_high', high, chop_period, 'max', scratch[2])
+        scans.rolling('chop_low', low, chop_period, 'min', scratch[3])
+        chop = col['chop']
+        np.divide(100 * np.log10(scratch[1] / (scratch[2] - scratch[3])), np.log10(chop_period), out=chop)
+        chop[np.isinf(chop)] = NAN
+        scans.rolling('atr', true_range, atr_period, 'mean', col['atr'])
+        scans.rolling('atr_ma', col['atr'], 20, 'mean', col['atr_ma'])
+
+        # Support / résistance (fenêtre précédente)
+        scans.rolling('sr_low', low, sr_lookback, 'min', scratch[2])
+        scans.shift('support', scratch[2], 1, col['support'])
+        scans.rolling('sr_high', high, sr_lookback, 'max', scratch[2])
+        scans.shift('resistance', scratch[2], 1, col['resistance'])
+
+        # MACD
+        scans.ewm('ema_12', close, 12, scratch[1])
+        scans.ewm('ema_26', close, 26, scratch[2])
+        np.subtract(scratch[1], scratch[2], out=col['macd'])
+        scans.ewm('macd_signal', col['macd'], 9, col['macd_signal'])
+        np.subtract(col['macd'], col['macd_signal'], out=col['macd_hist'])
+
+        # VWAP journalier
+        date = df.index.normalize()
+        new_day = scans.new_groups('date', date.asi8)
+        scans.group_cumsum('vwap_pv', close * volume, new_day, scratch[1])
+        scans.group_cumsum('vwap_volume', volume, new_day, scratch[2])
+        np.divide(scratch[1], scratch[2], out=col['vwap'])
+
+        # Structure : swings centrés (max glissant avancé de 9 bougies). Par blocs,
+        # les `pending` dernières bougies du bloc précédent attendaient celui-ci :
+        # leur structure est recalculée ici, les 9 dernières restent en attente
+        lookback = 20
+        offset = (lookback - 1) // 2
+        pending = scans.pending
+        rows = n + pending
+        final = max(rows - offset, 0)
+        swings = {}
+        for source, name, how in ((high, 'swing_high', 'max'), (low, 'swing_low', 'min')):
+            swing = col[name] if pending == 0 else np.empty(rows)
+            scans.rolling(name, source, lookback, how, scratch[1])
+            swing[:final] = scratch[1][n - final:]
+            swing[final:] = NAN
+            swings[name] = swing
+        prev_high = scans.shift('swing_high_prev', swings['swing_high'], lookback, commit=final)
+        prev_low = scans.shift('swing_low_prev', swings['swing_low'], lookback, commit=final)
+        hh = swings['swing_high'] > prev_high
+        hl = swings['swing_low'] > prev_low
+        lh = swings['swing_high'] < prev_high
+        ll = swings['swing_low'] < prev_low
+        codes = np.zeros(rows, dtype=np.int8)
+        codes[hh & hl] = 1
+        codes[lh & ll] = 2
+        structure = scans.ffill_codes('structure', codes, commit=final)
+        revised = {
+            **{name: swing[:pending] for name, swing in swings.items()},
+            'hh': hh[:pending], 'hl': hl[:pending], 'lh': lh[:pending], 'll': ll[:pending],
+            'structure': structure[:pending],
+        }
+        scans.hold(rows - final, revised)
+        if pending:
+            col['swing_high'][:] = swings['swing_high'][pending:]
+            col['swing_low'][:] = swings['swing_low'][pending:]
+            hh, hl, lh, ll, structure = hh[pending:], hl[pending:], lh[pending:], ll[pending:], structure[pending:]
+
+        # Bollinger
+        scans.rolling('bb_mid', close, 20, 'mean', col['bb_mid'])
+        scans.rolling('bb_std', close, 20, 'std', col['bb_std'])
+        np.add(col['bb_mid'], 2 * col['bb_std'], out=col['bb_upper'])
+        np.subtract(col['bb_mid'], 2 * col['bb_std'], out=col['bb_lower'])
+        np.divide(col['bb_upper'] - col['bb_lower'], col['bb_mid'], out=col['bb_width'])
+        scans.rolling('bb_width_ma', col['bb_width'], 50, 'mean', col['bb_width_ma'])
+        bb_squeeze = col['bb_width'] < (col['bb_width_ma'] * 0.7)
+
+        # Métriques supplémentaires
+        np.divide(np.abs(col['ema_20'] - col['ema_50']), close, out=col['ema_gap'])
+        np.divide(volume, col['volume_sma_20'], out=col['volume_ratio'])
+        np.divide(col['atr'], close, out=col['atr_pct'])
+        scans.rolling('atr_pct_sma_20', col['atr_pct'], 20, 'mean', col['atr_pct_sma_20'])
+
+        htf_filter(df.index, close, 'ema_200_4h', col['ema_200_4h'], htf_seed, scans)
+        scans.diff('ema_200_4h_slope', col['ema_200_4h'], 1, col['ema_200_4h_slope'])
+        htf_filter(df.index, close, 'sma_200_1d', col['sma_200_1d'], htf_seed, scans)
+
+    indicators = pd.DataFrame(block.T, index=df.index, columns=list(FLOAT_COLUMNS), copy=False)
+    others = {
+        'trend': labels(np.where(col['ema_20'] > col['ema_50'], 0, 1), ('BULLISH', 'BEARISH'), df.index),
+        'date': date,
+        'hh': hh, 'hl': hl, 'lh': lh, 'll': ll,
+        'structure': labels(structure, STRUCTURE_LABELS, df.index),
+        'bb_squeeze': bb_squeeze,
+    }
+    for name in _OTHER_COLUMNS:
+        indicators.insert(COLUMNS.index(name), name, others[name])
+    return pd.concat([df, indicators], axis=1)
@@ -0,0 +1,229 @@
+"""
+Agrégation multi-timeframe sans regard vers le futur : les bougies 4h / 1j
+sont construites à partir des bougies de base, et chaque bougie de base ne
+voit que les bougies HTF terminées à sa clôture (une bougie 1h de 11:00
+termine le bloc 4h de 08:00, celle de 10:00 ne voit que le bloc de 04:00).
+
+Le préchauffage (EMA 200 en 4h, SMA 200 journalière) peut venir de bougies
+natives 4h / 1j téléchargées (`seed`) plutôt que de milliers de bougies 1h.
+Les blocs couverts par les bougies de base gardent leur propre clôture.
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from src.candle_store import timeframe_to_ms
+
+NAN = float('nan')
+_NS_PER_UNIT = {'s': 1_000_000_000, 'ms': 1_000_000, 'us': 1_000, 'ns': 1}
+
+# Colonne -> (unité supérieure, filtre)
+HTF_FILTERS = {
+    'ema_200_4h': ('4h', 'ema'),
+    'sma_200_1d': ('1d', 'sma'),
+}
+HTF_PERIODS = tuple(period for period, _ in HTF_FILTERS.values())
+
+
+def period_ns(period):
+    """Durée d'une bougie ('4h', '1d', ... ou Timedelta) en nanosecondes."""
+    if isinstance(period, str):
+        return timeframe_to_ms(period) * 1_000_000
+    return pd.Timedelta(period).value
+
+
+def wall_ns(index, tz=None):
+    """
+    Horodatages en ns « heure murale » du fuseau `tz` (celui des bougies de
+    base) : les blocs 4h / 1j commencent à minuit local, comme resample().
+    Un index sans fuseau est considéré en UTC.
+    """
+    index = pd.DatetimeIndex(index)
+    if tz is not None and str(tz) != 'UTC':
+        index = (index.tz_localize('UTC') if index.tz is None else index).tz_convert(tz).tz_localize(None)
+    # UTC / sans fuseau : asi8 est déjà l'heure murale, seule l'unité change
+    return index.asi8 * _NS_PER_UNIT[index.unit]
+
+
+def infer_delta(wall):
+    """Durée des bougies de base : écart médian entre horodatages (0 si moins de 2 bougies)."""
+    if len(wall) < 2:
+        return 0
+    return int(np.median(np.diff(wall)))
+
+
+def _seed_closes(seed, tz, step):
+    """(blocs, clôtures) des bougies natives, triées ; tableaux vides sans seed."""
+    if seed is None or len(seed) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    return wall_ns(seed.index, tz) // step, seed['close'].to_numpy(dtype=np.float64)
+
+
+def point_in_time(index, close, period, smooth, seed=None, delta=None, state=None):
+    """
+    Filtre HTF vu par chaque bougie de base (version vectorisée de HTFAggregator).
+
+    Les clôtures HTF (dernière clôture non NaN du bloc, sinon celle de la bougie
+    native de `seed`, sinon NaN pour un bloc vide) passent dans `smooth`
+    (tableau -> tableau, ex. EMA 200). La bougie i reçoit la valeur du dernier
+    bloc terminé à sa clôture (début + delta ; delta déduit de l'index si absent).
+
+    state : dict conservé d'un appel au suivant pour un historique découpé en
+    blocs consécutifs (bougies sur la grille de delta). Le dernier bloc HTF reste
+    ouvert et smooth(closes, commit) ne fait avancer son état que sur les
+    `commit` premières clôtures.
+    """
+    n = len(index)
+    out = np.full(n, NAN)
+    if n == 0:
+        return out
+    step = period_ns(period)
+    wall = wall_ns(index, index.tz)
+    if delta is None:
+        delta = infer_delta(wall)
+    bucket = wall // step
+    resumed = state is not None and 'pending' in state
+
+    seed_bucket, seed_close = _seed_closes(seed, index.tz, step)
+    keep = seed_bucket <= bucket[-1]
+    if resumed:
+        first = state['pending']
+        keep &= seed_bucket >= first
+    seed_bucket, seed_close = seed_bucket[keep], seed_close[keep]
+    if not resumed:
+        first = min(bucket[0], seed_bucket.min()) if len(seed_bucket) else bucket[0]
+
+    closes = np.full(int(bucket[-1] - first) + 1, NAN)
+    closes[seed_bucket - first] = seed_close
+    if resumed and state['close'] == state['close']:
+        closes[0] = state['close']
+    # Dernière clôture valide de chaque bloc des bougies de base (prioritaire sur seed)
+    valid = close == close
+    valid_bucket = bucket[valid]
+    if len(valid_bucket):
+        last = np.flatnonzero(np.append(valid_bucket[1:] != valid_bucket[:-1], True))
+        closes[valid_bucket[last] - first] = close[valid][last]
+
+    smoothed = smooth(closes) if state is None else smooth(closes, len(closes) - 1)
+    completed = (wall + delta) // step - 1 - first
+    ready = completed >= 0
+    out[ready] = smoothed[np.minimum(completed[ready], len(smoothed) - 1)]
+    if state is not None:
+        # Bloc précédant `first` : dernière valeur définitive de l'appel précédent
+        origin = state.setdefault('origin', first)
+        out[(completed == -1) & (first - 1 >= origin)] = state.get('last', NAN)
+        if len(closes) > 1:
+            state['last'] = smoothed[-2]
+        state['pending'] = int(bucket[-1])
+        state['close'] = closes[-1]
+    return out
+
+
+class HTFAggregator:
+    """
+    Construit les bougies d'une unité supérieure au fil des bougies de base
+    clôturées. update() retourne les clôtures des blocs HTF terminés par cette
+    bougie, dans l'ordre (celle de la bougie native de seed() si le bloc n'a
+    pas de clôture, NaN pour un bloc vide) ; les bougies terminées sont
+    gardées dans `candles`.
+
+    delta : durée des bougies de base ('1h' ou Timedelta) ; sinon le plus petit
+    écart observé (un bloc se termine alors au plus tard à l'arrivée d'une
+    bougie du bloc suivant).
+    """
+
+    def __init__(self, period, delta=None, history=500):
+        self.period = period
+        self.step = period_ns(period)
+        self.delta = period_ns(delta) if delta is not None else None
+        self.candles = deque(maxlen=history)
+        self._seed_frame = None
+        self._seed = {}
+        self._tz = None
+        self._last_wall = None
+        self._min_gap = None
+        self._bucket = None
+        self._candle = None
+        self._closed = False
+        self._next = None
+
+    def seed(self, candles):
+        """Bougies natives terminées de cette unité (DataFrame OHLCV), avant la première update()."""
+        self._seed_frame = candles
+
+    def _start(self, timestamp):
+        """Première bougie : fuseau de référence et blocs natifs indexés."""
+        self._tz = timestamp.tz
+        if self._seed_frame is not None and len(self._seed_frame):
+            columns = self._seed_frame[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=np.float64)
+            buckets = wall_ns(self._seed_frame.index, self._tz) // self.step
+            self._seed = {int(bucket): list(row) for bucket, row in zip(buckets, columns)}
+        first = self._wall(timestamp) // self.step
+        self._next = min([first] + list(self._seed))
+
+    @staticmethod
+    def _wall(timestamp):
+        return (timestamp.tz_localize(None) if timestamp.tz is not None else timestamp).value
+
+    def _emit(self, bucket, candle):
+        """Termine le bloc : bougie construite (clôture native si absente) ou bougie native."""
+        native = self._seed.get(bucket)
+        if candle is None or candle[3] != candle[3]:
+            if candle is None:
+                candle = native
+            elif native is not None:
+                candle = candle[:3] + [native[3], candle[4]]
+        self._next = bucket + 1
+        if candle is None:
+            return NAN
+        start = pd.Timestamp(bucket * self.step)
+        if self._tz is not None:
+            start = start.tz_localize(self._tz, ambiguous=True, nonexistent='shift_forward')
+        self.candles.append((start, *candle))
+        return candle[3]
+
+    def update(self, timestamp, open_, high, low, close, volume):
+        timestamp = pd.Timestamp(timestamp)
+        if self._next is None:
+            self._start(timestamp)
+        wall = self._wall(timestamp)
+        if self._last_wall is not None and wall > self._last_wall:
+            gap = wall - self._last_wall
+            self._min_gap = gap if self._min_gap is None else min(self._min_gap, gap)
+        self._last_wall = wall
+        bucket = wall // self.step
+
+        completed = []
+        if bucket != self._bucket:
+            if self._bucket is not None and not self._closed:
+                completed.append(self._emit(self._bucket, self._candle))
+            while self._next < bucket:
+                completed.append(self._emit(self._next, None))
+            self._bucket, self._candle, self._closed = bucket, None, False
+        if self._closed:
+            return completed  # bloc déjà terminé (bougie hors grille)
+
+        if self._candle is None:
+            self._candle = [open_, high, low, close, volume]
+        else:
+            candle = self._candle
+            candle[1] = max(candle[1], high)
+            candle[2] = min(candle[2], low)
+            if close == close:
+                candle[3] = close
+            candle[4] += volume
+
+        delta = self.delta if self.delta is not None else (self._min_gap or 0)
+        if wall + delta >= (bucket + 1) * self.step:
+            completed.append(self._emit(bucket, self._candle))
+            self._closed = True
+        return completed
+
+    def frame(self):
+        """DataFrame des bougies HTF terminées conservées."""
+        columns = ['open', 'high', 'low', 'close', 'volume']
+        if not self.candles:
+            return pd.DataFrame(columns=columns)
+        index = pd.DatetimeIndex([row[0] for row in self.candles], name='timestamp')
+        return pd.DataFrame([row[1:] for row in self.candles], index=index, columns=columns)
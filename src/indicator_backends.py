@@ -0,0 +1,173 @@
+"""
+Backends des indicateurs de base de TechnicalIndicators (EMA, RSI, ATR,
+MACD, Bollinger) : pandas (référence), NumPy (noyaux de fused_indicators,
+mêmes valeurs au bit près) ou TA-Lib (C, valeurs égales à la précision
+flottante près). Choix via INDICATORS_BACKEND ; sans TA-Lib installé, repli
+automatique sur NumPy.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src import fused_indicators
+
+try:
+    import talib
+except ImportError:  # TA-Lib est optionnel (bibliothèque C à installer séparément)
+    talib = None
+
+
+def _true_range(high, low, close):
+    prev_close = close.shift(1)
+    return pd.concat([(high - low), (high - prev_close).abs(), (low - prev_close).abs()], axis=1).max(axis=1)
+
+
+class PandasBackend:
+    """Implémentation historique (rolling / ewm de pandas) : sert de référence aux autres."""
+
+    name = 'pandas'
+
+    def ema(self, values, period):
+        return values.ewm(span=period, adjust=False).mean()
+
+    def sma(self, values, period):
+        return values.rolling(window=period).mean()
+
+    def std(self, values, period):
+        """Écart-type glissant (ddof=1)."""
+        return values.rolling(period).std()
+
+    def rsi(self, close, period=14):
+        delta = close.diff()
+        gain = self.sma(delta.where(delta > 0, 0), period)
+        loss = self.sma(-delta.where(delta < 0, 0), period)
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+
+    def atr(self, high, low, close, period=14):
+        return self.sma(_true_range(high, low, close), period)
+
+    def macd(self, close, fast=12, slow=26, signal=9):
+        """(macd, signal, histogramme)"""
+        macd = self.ema(close, fast) - self.ema(close, slow)
+        macd_signal = self.ema(macd, signal)
+        return macd, macd_signal, macd - macd_signal
+
+    def bollinger(self, close, period=20, std_dev=2):
+        """(milieu, écart-type, bande haute, bande basse)"""
+        mid = self.sma(close, period)
+        std = self.std(close, period)
+        return mid, std, mid + (std_dev * std), mid - (std_dev * std)
+
+
+class NumpyBackend(PandasBackend):
+    """Noyaux NumPy / numba de fused_indicators (repli pandas sans numba) : identique au bit près."""
+
+    name = 'numpy'
+
+    def ema(self, values, period):
+        return pd.Series(fused_indicators.ewm_mean(values.to_numpy(dtype=np.float64), period), index=values.index)
+
+    def sma(self, values, period):
+        return pd.Series(fused_indicators.rolling(values.to_numpy(dtype=np.float64), period, 'mean'), index=values.index)
+
+    def std(self, values, period):
+        return pd.Series(fused_indicators.rolling(values.to_numpy(dtype=np.float64), period, 'std'), index=values.index)
+
+    def atr(self, high, low, close, period=14):
+        index = close.index
+        high, low, close = (s.to_numpy(dtype=np.float64) for s in (high, low, close))
+        prev_close = np.concatenate([[np.nan], close[:-1]])
+        # fmax ignore le NaN de la première bougie, comme max(axis=1)
+        true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+        return pd.Series(fused_indicators.rolling(true_range, period, 'mean'), index=index)
+
+
+class TalibBackend(NumpyBackend):
+    """
+    Fonctions C de TA-Lib, ajustées aux conventions de la référence : EMA
+    amorcée sur la première valeur (et non sur une SMA), SMA des gains / pertes
+    pour le RSI et de la true range pour l'ATR (pas de lissage de Wilder),
+    écart-type d'échantillon (ddof=1). Séries contenant des NaN : NumPy.
+    """
+
+    name = 'talib'
+
+    def ema(self, values, period):
+        array = values.to_numpy(dtype=np.float64)
+        if len(array) == 0 or np.isnan(array).any():
+            return super().ema(values, period)
+        # period - 1 copies de la première valeur : la SMA d'amorçage de TA-Lib vaut alors values[0]
+        padded = np.concatenate([np.full(period - 1, array[0]), array])
+        return pd.Series(talib.EMA(padded, timeperiod=period)[period - 1:], index=values.index)
+
+    def sma(self, values, period):
+        array = values.to_numpy(dtype=np.float64)
+        if np.isnan(array).any():
+            return super().sma(values, period)
+        return pd.Series(talib.SMA(array, timeperiod=period), index=values.index)
+
+    def std(self, values, period):
+        array = values.to_numpy(dtype=np.float64)
+        if np.isnan(array).any() or period < 2:
+            return super().std(values, period)
+        # STDDEV de TA-Lib : écart-type de population
+        std = talib.STDDEV(array, timeperiod=period, nbdev=1) * np.sqrt(period / (period - 1))
+        return pd.Series(std, index=values.index)
+
+    def atr(self, high, low, close, period=14):
+        true_range = talib.TRANGE(*(s.to_numpy(dtype=np.float64) for s in (high, low, close)))
+        if len(true_range):
+            true_range[0] = high.iloc[0] - low.iloc[0]  # comme max(axis=1) qui ignore la clôture précédente absente
+        return self.sma(pd.Series(true_range, index=close.index), period)
+
+
+BACKENDS = {backend.name: backend for backend in (PandasBackend, NumpyBackend, TalibBackend)}
+
+
+def talib_available():
+    """True si TA-Lib (bibliothèque C + module Python) est installé."""
+    return talib is not None
+
+
+def available_backends():
+    """Noms des backends utilisables dans cet environnement."""
+    return [name for name in BACKENDS if name != 'talib' or talib_available()]
+
+
+_instances = {}
+
+
+def get_backend(name=None):
+    """
+    Backend `name` (None = INDICATORS_BACKEND, défaut pandas). TA-Lib absent :
+    repli sur NumPy (avec un avertissement unique).
+    """
+    if name is None:
+        name = os.getenv('INDICATORS_BACKEND', 'pandas').lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Backend d'indicateurs inconnu : {name} (choix : {', '.join(BACKENDS)})")
+    if name == 'talib' and not talib_available():
+        if 'talib' not in _instances:
+            print("⚠️ TA-Lib non installé : repli sur le backend numpy")
+            _instances['talib'] = get_backend('numpy')
+        return _instances['talib']
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
+
+
+_warned = set()
+
+
+def warn_unused(engine):
+    """
+    Les moteurs fused / graphe calculent avec leurs propres noyaux NumPy
+    (équivalents au backend numpy) : INDICATORS_BACKEND=talib n'y a pas
+    d'effet. Avertissement unique par moteur.
+    """
+    if os.getenv('INDICATORS_BACKEND', 'pandas').lower() == 'talib' and engine not in _warned:
+        _warned.add(engine)
+        print(f"⚠️ INDICATORS_BACKEND=talib ignoré par le moteur {engine} (noyaux NumPy) : "
+              f"INDICATORS_ENGINE=pandas pour utiliser TA-Lib")
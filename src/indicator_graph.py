@@ -0,0 +1,281 @@
+"""
+Graphe de dépendances des indicateurs : chaque colonne déclare ses entrées
+et ses paramètres. Un appelant demande un ensemble de colonnes et seul le
+sous-graphe nécessaire est calculé, dans l'ordre topologique, avec les mêmes
+valeurs (au bit près) que add_all_indicators
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src import compact_frame
+from src.fused_indicators import COLUMNS, ewm_mean, group_cumsum, htf_filter, rolling
+
+# Entrées fournies par le DataFrame de bougies (et bougies HTF natives de préchauffage)
+SOURCES = ('open', 'high', 'low', 'close', 'volume', 'index', 'htf_seed')
+
+# Paramètres réglables (ceux de add_all_indicators) et leurs valeurs par défaut
+DEFAULT_PARAMS = {'chop_period': 14, 'sr_lookback': 50, 'atr_period': 14}
+
+
+class Indicator:
+    """Nœud du graphe : nom de la colonne, entrées, paramètres et fonction de calcul."""
+
+    def __init__(self, name, inputs, func, params=()):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.func = func
+        self.params = tuple(params)
+
+    def compute(self, values, params):
+        return self.func(*(values[name] for name in self.inputs), **{p: params[p] for p in self.params})
+
+
+REGISTRY = {}
+
+
+def indicator(name, inputs, params=()):
+    """Décorateur : enregistre la fonction comme calcul de la colonne `name`."""
+    def register(func):
+        REGISTRY[name] = Indicator(name, inputs, func, params)
+        return func
+    return register
+
+
+def _diff(values, periods=1):
+    out = np.empty(len(values))
+    out[:periods] = np.nan
+    np.subtract(values[periods:], values[:-periods], out=out[periods:])
+    return out
+
+
+def _shift(values, periods):
+    out = np.empty(len(values))
+    if periods >= 0:
+        out[:periods] = np.nan
+        out[periods:] = values[:len(values) - periods]
+    else:
+        out[periods:] = np.nan
+        out[:periods] = values[-periods:]
+    return out
+
+
+# ----------------------------------------------------------------------
+# Registre (les colonnes préfixées par _ sont des intermédiaires partagés)
+# ----------------------------------------------------------------------
+indicator('ema_20', ('close',))(lambda close: ewm_mean(close, 20))
+indicator('ema_50', ('close',))(lambda close: ewm_mean(close, 50))
+indicator('ema_200', ('close',))(lambda close: ewm_mean(close, 200))
+indicator('ema_200_slope', ('ema_200',))(lambda ema: _diff(ema))
+indicator('ema_50_slope', ('ema_50',))(lambda ema: _diff(ema))
+indicator('ema_200_slope_10', ('ema_200',))(lambda ema: _diff(ema, 10))
+indicator('ema_50_slope_10', ('ema_50',))(lambda ema: _diff(ema, 10))
+
+
+@indicator('rsi', ('close',))
+def _rsi(close, period=14):
+    delta = _diff(close)
+    gain = rolling(np.where(delta > 0, delta, 0.0), period, 'mean')
+    loss = rolling(-np.where(delta < 0, delta, 0.0), period, 'mean')
+    return 100 - 100 / (1 + gain / loss)
+
+
+indicator('rsi_delta', ('rsi',))(lambda rsi: _diff(rsi))
+indicator('volume_sma_20', ('volume',))(lambda volume: rolling(volume, 20, 'mean'))
+
+
+@indicator('_true_range', ('high', 'low', 'close'))
+def _true_range(high, low, close):
+    prev_close = _shift(close, 1)
+    return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+
+@indicator('chop', ('_true_range', 'high', 'low'), params=('chop_period',))
+def _chop(true_range, high, low, chop_period):
+    price_range = rolling(high, chop_period, 'max') - rolling(low, chop_period, 'min')
+    chop = 100 * np.log10(rolling(true_range, chop_period, 'sum') / price_range) / np.log10(chop_period)
+    chop[np.isinf(chop)] = np.nan
+    return chop
+
+
+indicator('atr', ('_true_range',), params=('atr_period',))(
+    lambda true_range, atr_period: rolling(true_range, atr_period, 'mean')
+)
+indicator('atr_ma', ('atr',))(lambda atr: rolling(atr, 20, 'mean'))
+indicator('support', ('low',), params=('sr_lookback',))(
+    lambda low, sr_lookback: _shift(rolling(low, sr_lookback, 'min'), 1)
+)
+indicator('resistance', ('high',), params=('sr_lookback',))(
+    lambda high, sr_lookback: _shift(rolling(high, sr_lookback, 'max'), 1)
+)
+
+
+# Régimes calculés en codes int8 (-1 / 0 / 1), convertis en libellés à la sortie
+indicator('trend', ('ema_20', 'ema_50'))(lambda ema_20, ema_50: np.where(ema_20 > ema_50, 1, -1).astype(np.int8))
+
+
+indicator('_ema_12', ('close',))(lambda close: ewm_mean(close, 12))
+indicator('_ema_26', ('close',))(lambda close: ewm_mean(close, 26))
+indicator('macd', ('_ema_12', '_ema_26'))(lambda fast, slow: fast - slow)
+indicator('macd_signal', ('macd',))(lambda macd: ewm_mean(macd, 9))
+indicator('macd_hist', ('macd', 'macd_signal'))(lambda macd, signal: macd - signal)
+
+indicator('date', ('index',))(lambda index: index.normalize())
+
+
+@indicator('vwap', ('close', 'volume', 'date'))
+def _vwap(close, volume, date):
+    day = date.asi8
+    new_day = np.empty(len(day), dtype=np.bool_)
+    new_day[:1] = True
+    np.not_equal(day[1:], day[:-1], out=new_day[1:])
+    return group_cumsum(close * volume, new_day) / group_cumsum(volume, new_day)
+
+
+# Structure : swings centrés sur 20 bougies, comparés au swing 20 bougies plus tôt
+indicator('swing_high', ('high',))(lambda high: _shift(rolling(high, 20, 'max'), -9))
+indicator('swing_low', ('low',))(lambda low: _shift(rolling(low, 20, 'min'), -9))
+indicator('hh', ('swing_high',))(lambda swing: swing > _shift(swing, 20))
+indicator('hl', ('swing_low',))(lambda swing: swing > _shift(swing, 20))
+indicator('lh', ('swing_high',))(lambda swing: swing < _shift(swing, 20))
+indicator('ll', ('swing_low',))(lambda swing: swing < _shift(swing, 20))
+
+
+@indicator('structure', ('hh', 'hl', 'lh', 'll'))
+def _structure(hh, hl, lh, ll):
+    codes = np.zeros(len(hh), dtype=np.int8)
+    codes[hh & hl] = 1
+    codes[lh & ll] = -1
+    filled = np.where(codes != 0, np.arange(len(codes)), -1)
+    np.maximum.accumulate(filled, out=filled)
+    return np.where(filled >= 0, codes[np.maximum(filled, 0)], 0).astype(np.int8)
+
+
+indicator('bb_mid', ('close',))(lambda close: rolling(close, 20, 'mean'))
+indicator('bb_std', ('close',))(lambda close: rolling(close, 20, 'std'))
+indicator('bb_upper', ('bb_mid', 'bb_std'))(lambda mid, std: mid + 2 * std)
+indicator('bb_lower', ('bb_mid', 'bb_std'))(lambda mid, std: mid - 2 * std)
+indicator('bb_width', ('bb_upper', 'bb_lower', 'bb_mid'))(lambda upper, lower, mid: (upper - lower) / mid)
+indicator('bb_width_ma', ('bb_width',))(lambda width: rolling(width, 50, 'mean'))
+indicator('bb_squeeze', ('bb_width', 'bb_width_ma'))(lambda width, width_ma: width < (width_ma * 0.7))
+
+indicator('ema_gap', ('ema_20', 'ema_50', 'close'))(lambda ema_20, ema_50, close: np.abs(ema_20 - ema_50) / close)
+indicator('volume_ratio', ('volume', 'volume_sma_20'))(lambda volume, sma: volume / sma)
+indicator('atr_pct', ('atr', 'close'))(lambda atr, close: atr / close)
+indicator('atr_pct_sma_20', ('atr_pct',))(lambda atr_pct: rolling(atr_pct, 20, 'mean'))
+
+
+@indicator('ema_200_4h', ('index', 'close', 'htf_seed'))
+def _ema_200_4h(index, close, htf_seed):
+    out = np.empty(len(close))
+    htf_filter(index, close, 'ema_200_4h', out, htf_seed)
+    return out
+
+
+indicator('ema_200_4h_slope', ('ema_200_4h',))(lambda ema: _diff(ema))
+
+
+@indicator('sma_200_1d', ('index', 'close', 'htf_seed'))
+def _sma_200_1d(index, close, htf_seed):
+    out = np.empty(len(close))
+    htf_filter(index, close, 'sma_200_1d', out, htf_seed)
+    return out
+
+
+# ----------------------------------------------------------------------
+# Planification et calcul
+# ----------------------------------------------------------------------
+@lru_cache(maxsize=64)
+def _plan(columns):
+    order, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done or name in SOURCES:
+            return
+        if name not in REGISTRY:
+            raise ValueError(f"Indicateur inconnu : {name}")
+        if name in visiting:
+            raise ValueError(f"Dépendance circulaire sur {name}")
+        visiting.add(name)
+        for dep in REGISTRY[name].inputs:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in columns:
+        visit(name)
+    return tuple(order)
+
+
+def plan(columns):
+    """Colonnes à calculer (intermédiaires compris) pour obtenir `columns`, dans l'ordre topologique."""
+    return _plan(tuple(sorted(set(columns))))
+
+
+def compute(df, columns, compact=False, htf_seed=None, **params):
+    """
+    Retourne df + les colonnes demandées (dans l'ordre de add_all_indicators),
+    sans calculer les autres. Les intermédiaires sont libérés dès que leur
+    dernier consommateur est calculé. df n'est pas modifié.
+
+    compact : chaque colonne est compactée dès qu'elle n'est plus une entrée
+    (voir compact_frame) ; les booléens finissent dans `flags`.
+    htf_seed : {'4h': bougies 4h, '1d': bougies 1j} natives (préchauffage HTF).
+    params : chop_period, sr_lookback, atr_period (défauts de add_all_indicators).
+    """
+    unknown = set(params) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Paramètres inconnus : {sorted(unknown)}")
+    params = {**DEFAULT_PARAMS, **params}
+    wanted = set(columns).difference(SOURCES)
+    order = plan(wanted)
+
+    # Nombre de consommateurs restants de chaque colonne (libération au plus tôt)
+    consumers = {}
+    for name in order:
+        for dep in REGISTRY[name].inputs:
+            consumers[dep] = consumers.get(dep, 0) + 1
+
+    values = {'index': df.index, 'htf_seed': htf_seed}
+    for name in ('open', 'high', 'low', 'close', 'volume'):
+        if name in consumers:
+            values[name] = df[name].to_numpy(dtype=np.float64)
+
+    def release(name):
+        # Plus aucun consommateur : colonne finale (compactée) ou intermédiaire libéré
+        if name in SOURCES:
+            return
+        if name not in wanted:
+            del values[name]
+        elif compact and isinstance(values[name], np.ndarray) and values[name].dtype == np.float64:
+            values[name] = compact_frame.to_float32(values[name])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name in order:
+            node = REGISTRY[name]
+            values[name] = node.compute(values, params)
+            if name not in consumers:
+                release(name)
+            for dep in node.inputs:
+                consumers[dep] -= 1
+                if consumers[dep] == 0:
+                    release(dep)
+
+    ordered = [name for name in COLUMNS if name in wanted]
+    ordered += sorted(wanted.difference(COLUMNS))
+    data = {}
+    for name in ordered:
+        if compact and name in compact_frame.FLAG_BITS:
+            continue
+        if not compact and name in compact_frame.REGIME_COLUMNS:
+            data[name] = compact_frame.regime_labels(values[name], df.index)
+        else:
+            data[name] = values[name]
+    if compact:
+        if wanted.intersection(compact_frame.FLAG_BITS):
+            data['flags'] = compact_frame.pack_flags(values, len(df))
+        df = compact_frame.compact(df, drop=())
+    indicators = pd.DataFrame(data, index=df.index, copy=False)
+    return pd.concat([df, indicators], axis=1)
@@ -1,26 +1,28 @@
 """
 Calcul des indicateurs techniques
 """
+import os
+
 import pandas as pd
 import numpy as np
 
+from src import compact_frame, fused_indicators, htf_aggregator, indicator_backends, indicator_graph
+
 class TechnicalIndicators:
 
+    # EMA, RSI, ATR, MACD et Bollinger passent par un backend (pandas / numpy / talib),
+    # choisi par `backend` ou INDICATORS_BACKEND (voir indicator_backends). Seul le
+    # moteur pandas de add_all_indicators passe par ces fonctions
+
     @staticmethod
-    def calculate_ema(df, period):
+    def calculate_ema(df, period, backend=None):
         """Moyenne Mobile Exponentielle"""
-        return df['close'].ewm(span=period, adjust=False).mean()
+        return indicator_backends.get_backend(backend).ema(df['close'], period)
 
     @staticmethod
-    def calculate_rsi(df, period=14):
+    def calculate_rsi(df, period=14, backend=None):
         """RSI (Relative Strength Index)"""
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        return indicator_backends.get_backend(backend).rsi(df['close'], period)
 
     @staticmethod
     def calculate_choppiness(df, period=14):
@@ -50,24 +52,9 @@ class TechnicalIndicators:
         return chop
 
     @staticmethod
-    def calculate_atr(df, period=14):
+    def calculate_atr(df, period=14, backend=None):
         """Average True Range (ATR)"""
-        high = df['high']
-        low = df['low']
-        close = df['close']
-
-        prev_close = close.shift(1)
-        true_range = pd.concat(
-            [
-                (high - low),
-                (high - prev_close).abs(),
-                (low - prev_close).abs()
-            ],
-            axis=1
-        ).max(axis=1)
-
-        atr = true_range.rolling(window=period).mean()
-        return atr
+        return indicator_backends.get_backend(backend).atr(df['high'], df['low'], df['close'], period)
 
     @staticmethod
     def add_support_resistance(df, lookback=50):
@@ -77,15 +64,11 @@ class TechnicalIndicators:
         return df
 
     @staticmethod
-    def calculate_macd(df, fast=12, slow=26, signal=9):
+    def calculate_macd(df, fast=12, slow=26, signal=9, backend=None):
         """MACD classique"""
-        ema_fast = df['close'].ewm(span=fast, adjust=False).mean()
-        ema_slow = df['close'].ewm(span=slow, adjust=False).mean()
-        
-        df['macd'] = ema_fast - ema_slow
-        df['macd_signal'] = df['macd'].ewm(span=signal, adjust=False).mean()
-        df['macd_hist'] = df['macd'] - df['macd_signal']
-        
+        df['macd'], df['macd_signal'], df['macd_hist'] = indicator_backends.get_backend(backend).macd(
+            df['close'], fast, slow, signal
+        )
         return df
 
     @staticmethod
@@ -133,26 +116,57 @@ class TechnicalIndicators:
         return df
 
     @staticmethod
-    def calculate_bollinger_squeeze(df, period=20, std_dev=2):
+    def calculate_bollinger_squeeze(df, period=20, std_dev=2, backend=None):
         """Détecte compression Bollinger Bands"""
         df = df.copy()
+        backend = indicator_backends.get_backend(backend)
         
-        df['bb_mid'] = df['close'].rolling(period).mean()
-        df['bb_std'] = df['close'].rolling(period).std()
-        df['bb_upper'] = df['bb_mid'] + (std_dev * df['bb_std'])
-        df['bb_lower'] = df['bb_mid'] - (std_dev * df['bb_std'])
+        df['bb_mid'], df['bb_std'], df['bb_upper'], df['bb_lower'] = backend.bollinger(df['close'], period, std_dev)
         df['bb_width'] = (df['bb_upper'] - df['bb_lower']) / df['bb_mid']
-        df['bb_width_ma'] = df['bb_width'].rolling(50).mean()
+        df['bb_width_ma'] = backend.sma(df['bb_width'], 50)
         
         # Squeeze = largeur < 70% de la moyenne
         df['bb_squeeze'] = df['bb_width'] < (df['bb_width_ma'] * 0.7)
         
         return df
 
-    # Modifier add_all_indicators
     @staticmethod
-    def add_all_indicators(df, chop_period=14, sr_lookback=50, atr_period=14):
-        """Ajoute TOUS les indicateurs"""
+    def add_all_indicators(df, chop_period=14, sr_lookback=50, atr_period=14, engine=None, columns=None,
+                           compact=False, htf_seed=None):
+        """
+        Ajoute TOUS les indicateurs (ou seulement `columns` et leurs dépendances)
+
+        engine : 'fused' (noyau numba sur tableaux NumPy, mêmes valeurs au bit
+        près), 'pandas' (calcul historique colonne par colonne) ou None =
+        INDICATORS_ENGINE (défaut : fused si numba est installé).
+        columns : colonnes voulues (ex. ImprovedStrategy.REQUIRED_COLUMNS) ;
+        seul le sous-graphe nécessaire est calculé (voir indicator_graph).
+        compact : float32 / codes int8 / `flags` sans intermédiaires (voir
+        compact_frame). Réservé aux chargeurs du backtest / de l'optimiseur
+        (INDICATORS_COMPACT) : trend et structure n'y sont plus des libellés.
+        htf_seed : {'4h': bougies 4h, '1d': bougies 1j} natives terminées,
+        pour préchauffer ema_200_4h / sma_200_1d (voir htf_aggregator).
+        """
+        if engine is None:
+            engine = os.getenv('INDICATORS_ENGINE', 'fused' if fused_indicators.jit_available() else 'pandas')
+        if compact and columns is None:
+            columns = compact_frame.COMPACT_COLUMNS
+        if columns is not None and engine != 'pandas' and fused_indicators.supports(df):
+            indicator_backends.warn_unused('graph')
+            return indicator_graph.compute(df, columns, compact=compact, htf_seed=htf_seed, chop_period=chop_period,
+                                           sr_lookback=sr_lookback, atr_period=atr_period)
+        if engine == 'fused' and fused_indicators.supports(df):
+            indicator_backends.warn_unused('fused')
+            df = fused_indicators.compute_indicators(df, chop_period, sr_lookback, atr_period, htf_seed)
+        else:
+            df = TechnicalIndicators._add_all_indicators_pandas(df, chop_period, sr_lookback, atr_period, htf_seed)
+        if columns is not None:
+            df = df.drop(columns=[name for name in fused_indicators.COLUMNS if name not in set(columns)])
+        return compact_frame.compact(df) if compact else df
+
+    @staticmethod
+    def _add_all_indicators_pandas(df, chop_period=14, sr_lookback=50, atr_period=14, htf_seed=None):
+        """Calcul historique, indicateur par indicateur sur le DataFrame"""
         # Existants
         df['ema_20'] = TechnicalIndicators.calculate_ema(df, 20)
         df['ema_50'] = TechnicalIndicators.calculate_ema(df, 50)
@@ -182,21 +196,28 @@ class TechnicalIndicators:
         df['atr_pct'] = df['atr'] / df['close']
         df['atr_pct_sma_20'] = df['atr_pct'].rolling(20).mean()
 
-        # HTF (4H) trend filter: EMA200 on 4H closes forward-filled to 1H
+        # HTF : bougies 4H / daily terminées uniquement (pas de regard vers le futur),
+        # préchauffées par des bougies natives si htf_seed est fourni
+        htf_seed = htf_seed or {}
+        close = df['close'].to_numpy(dtype=np.float64)
+
+        # HTF (4H) trend filter: EMA200 on completed 4H closes
         try:
-            h4_close = df['close'].resample('4h').last()
-            h4_ema200 = h4_close.ewm(span=200, adjust=False).mean()
-            df['ema_200_4h'] = h4_ema200.reindex(df.index, method='ffill')
+            df['ema_200_4h'] = htf_aggregator.point_in_time(
+                df.index, close, '4h', lambda h4_close: pd.Series(h4_close).ewm(span=200, adjust=False).mean().to_numpy(),
+                htf_seed.get('4h')
+            )
             df['ema_200_4h_slope'] = df['ema_200_4h'].diff()
         except Exception:
             df['ema_200_4h'] = np.nan
             df['ema_200_4h_slope'] = np.nan
 
-        # Daily regime filter (SMA200 daily forward-filled to 1h)
+        # Daily regime filter (SMA200 on completed daily closes)
         try:
-            d1_close = df['close'].resample('1d').last()
-            d1_sma200 = d1_close.rolling(200).mean()
-            df['sma_200_1d'] = d1_sma200.reindex(df.index, method='ffill')
+            df['sma_200_1d'] = htf_aggregator.point_in_time(
+                df.index, close, '1d', lambda d1_close: pd.Series(d1_close).rolling(200).mean().to_numpy(),
+                htf_seed.get('1d')
+            )
         except Exception:
             df['sma_200_1d'] = np.nan
         
@@ -204,7 +225,7 @@ class TechnicalIndicators:
 
 # Test
 if __name__ == "__main__":
-    from data_fetcher import DataFetcher
+    from src.data_fetcher import DataFetcher
 
     fetcher = DataFetcher()
     df = fetcher.get_ohlcv(timeframe='1h', limit=200)
@@ -1,14 +1,96 @@
 """
 Gestionnaire de notifications Discord
 """
-import requests
+import atexit
 from datetime import datetime
 import os
+import threading
 from dotenv import load_dotenv
 
+from src.outbox import NotificationOutbox, OutboxDispatcher
+from src.webhook_sender import WebhookSender
+
 load_dotenv()
 
+
+class _Transport:
+    """Sender, boîte d'envoi et thread d'envoi partagés par les DiscordNotifier d'une même configuration."""
+
+    def __init__(self, key, sender, outbox, dispatcher, flush_timeout):
+        self.key = key
+        self.sender = sender
+        self.outbox = outbox
+        self.dispatcher = dispatcher
+        self.flush_timeout = flush_timeout
+        self.refs = 0
+        self.closed = False
+
+    def close(self):
+        if self.closed:
+            return True
+        self.closed = True
+        if self.dispatcher is not None:
+            flushed = self.dispatcher.close(self.flush_timeout)
+            self.outbox.close()
+            return flushed
+        return self.sender.close(self.flush_timeout)
+
+
+# Une connexion SQLite et un thread d'envoi par boîte d'envoi et par process,
+# quel que soit le nombre de notifiers créés (un par analyze_market en run unique)
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def _acquire_transport(async_mode, flush_timeout):
+    outbox_path = os.getenv('NOTIFY_OUTBOX_PATH', 'data/outbox.db').strip() if async_mode else ''
+    sender_config = (
+        float(os.getenv('NOTIFY_TIMEOUT', '10')),
+        int(os.getenv('NOTIFY_MAX_RETRIES', '5')),
+        int(os.getenv('NOTIFY_QUEUE_SIZE', '1000')),
+    )
+    outbox_config = (
+        int(os.getenv('NOTIFY_OUTBOX_MAX_ATTEMPTS', '10')),
+        float(os.getenv('NOTIFY_COALESCE_MS', '500')) / 1000,
+    )
+    key = (async_mode, os.path.abspath(outbox_path) if outbox_path else None, sender_config, outbox_config)
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            timeout, max_retries, queue_size = sender_config
+            sender = WebhookSender(timeout=timeout, max_retries=max_retries, queue_size=queue_size)
+            outbox = dispatcher = None
+            if outbox_path:
+                max_attempts, linger = outbox_config
+                outbox = NotificationOutbox(outbox_path, max_attempts=max_attempts)
+                dispatcher = OutboxDispatcher(outbox, sender, linger=linger)
+            transport = _Transport(key, sender, outbox, dispatcher, flush_timeout)
+            _transports[key] = transport
+            if async_mode:
+                # Les messages encore en file partent avant la fin du process
+                atexit.register(transport.close)
+        transport.refs += 1
+        return transport
+
+
+def _release_transport(transport):
+    """Un notifier de moins ; le dernier ferme le transport (sinon simple attente de la file)."""
+    with _transports_lock:
+        transport.refs -= 1
+        last = transport.refs <= 0 and not transport.closed
+        if last and _transports.get(transport.key) is transport:
+            del _transports[transport.key]
+    if last:
+        return transport.close()
+    if transport.dispatcher is not None:
+        return transport.dispatcher.flush(transport.flush_timeout)
+    return transport.sender.flush(transport.flush_timeout)
+
+
 class DiscordNotifier:
+    # Colonnes d'indicateurs affichées dans les embeds de signal
+    INDICATOR_COLUMNS = ('rsi', 'trend', 'ema_20', 'ema_50', 'ema_200', 'chop', 'support', 'resistance')
+
     def __init__(self, webhook_url=None, heartbeat_webhook_url=None, test_mode=None):
         # Détection du mode test
         if test_mode is None:
@@ -39,6 +121,15 @@ class DiscordNotifier:
                 else:
                     self.heartbeat_webhook_url = self.webhook_url
 
+        # Envoi en arrière-plan (NOTIFY_ASYNC=false : envoi bloquant, mêmes reprises)
+        self.async_mode = os.getenv('NOTIFY_ASYNC', 'true').lower() == 'true'
+        self.flush_timeout = float(os.getenv('NOTIFY_FLUSH_TIMEOUT', '30'))
+        # Boîte d'envoi persistante : embeds regroupés par message, rien de perdu en cas de crash
+        self._transport = _acquire_transport(self.async_mode, self.flush_timeout)
+        self.sender = self._transport.sender
+        self.outbox = self._transport.outbox
+        self.dispatcher = self._transport.dispatcher
+
         # Debug
         mode_label = "🧪 TEST" if self.test_mode else "🚀 PRODUCTION"
         print(f"\n{mode_label}")
@@ -48,7 +139,7 @@ class DiscordNotifier:
             print(f"⚠️  Même webhook utilisé pour signaux et heartbeat")
         print()
 
-    def send_heartbeat(self, title, description, color=0x808080, fields=None):
+    def send_heartbeat(self, title, description, color=0x808080, fields=None, dedup_key=None):
         """Envoie un heartbeat sur le canal dédié"""
         embed = {
             "title": title,
@@ -63,20 +154,15 @@ class DiscordNotifier:
 
         data = {"embeds": [embed]}
 
-        try:
-            response = requests.post(self.heartbeat_webhook_url, json=data)
-            if response.status_code == 204:
-                print("✅ Heartbeat envoyé")
-                return True
-        except Exception as e:
-            print(f"❌ Erreur heartbeat: {e}")
-            return False
+        # Seul le dernier heartbeat compte : les précédents encore en attente sont abandonnés
+        return self._send(self.heartbeat_webhook_url, data, "Heartbeat", dedup_key, supersede=True)
 
-    def send_message(self, title, description, color=0x00ff00, fields=None):
+    def send_message(self, title, description, color=0x00ff00, fields=None, dedup_key=None):
         """
         Envoie un message embed sur Discord
 
         color: 0x00ff00 (vert), 0xff0000 (rouge), 0xffaa00 (orange)
+        dedup_key: clé unique (ex. signal + bougie) - jamais envoyé deux fois
         """
         embed = {
             "title": title,
@@ -95,19 +181,47 @@ class DiscordNotifier:
             "embeds": [embed]
         }
 
-        try:
-            response = requests.post(self.webhook_url, json=data)
-            if response.status_code == 204:
-                print("✅ Message Discord envoyé")
-                return True
-            else:
-                print(f"❌ Erreur Discord: {response.status_code}")
-                return False
-        except Exception as e:
-            print(f"❌ Erreur envoi Discord: {e}")
+        return self._send(self.webhook_url, data, "Message Discord", dedup_key)
+
+    def _send(self, url, data, label, dedup_key=None, supersede=False):
+        """
+        Mode asynchrone : mise en file (retour immédiat, True si accepté), via
+        la boîte d'envoi si elle est active. Sinon envoi bloquant ; True si
+        Discord a accepté le message.
+        """
+        if not url:
+            print(f"❌ {label} : webhook non défini")
             return False
+        if self.dispatcher is not None:
+            added = all(self.outbox.enqueue(url, embed, dedup_key, kind=label, supersede=supersede)
+                        for embed in data["embeds"])
+            if not added:
+                print(f"⏭️  {label} déjà envoyé ou en attente ({dedup_key})")
+            self.dispatcher.wake()
+            return added
+        if self.async_mode:
+            return self.sender.submit(url, data, label)
+        return self.sender.deliver(url, data, label)
+
+    def flush(self, timeout=None):
+        """Attend l'envoi des messages en file (timeout en s)."""
+        timeout = self.flush_timeout if timeout is None else timeout
+        if self.dispatcher is not None:
+            return self.dispatcher.flush(timeout)
+        return self.sender.flush(timeout)
+
+    def close(self):
+        """
+        Envoie ce qui reste en file (au plus NOTIFY_FLUSH_TIMEOUT s) ; le
+        dernier notifier fermé arrête les threads et la connexion partagés.
+        """
+        if self._transport is None:
+            return True
+        transport, self._transport = self._transport, None
+        self.dispatcher = None
+        return _release_transport(transport)
 
-    def send_buy_signal(self, symbol, price, indicators):
+    def send_buy_signal(self, symbol, price, indicators, dedup_key=None):
         """Signal d'achat"""
         fields = [
             {"name": "💰 Prix", "value": f"${price:,.2f}", "inline": True},
@@ -128,14 +242,15 @@ class DiscordNotifier:
             if value not in (None, "N/A"):
                 fields.append({"name": name, "value": f"{value}", "inline": True})
 
-        self.send_message(
+        return self.send_message(
             title=f"🟢 SIGNAL ACHAT - {symbol}" + (" [TEST]" if self.test_mode else ""),
             description="Conditions d'achat remplies !",
             color=0x00ff00,
-            fields=fields
+            fields=fields,
+            dedup_key=dedup_key
         )
 
-    def send_sell_signal(self, symbol, price, indicators):
+    def send_sell_signal(self, symbol, price, indicators, dedup_key=None):
         """Signal de vente"""
         fields = [
             {"name": "💰 Prix", "value": f"${price:,.2f}", "inline": True},
@@ -156,11 +271,12 @@ class DiscordNotifier:
             if value not in (None, "N/A"):
                 fields.append({"name": name, "value": f"{value}", "inline": True})
 
-        self.send_message(
+        return self.send_message(
             title=f"🔴 SIGNAL VENTE - {symbol}" + (" [TEST]" if self.test_mode else ""),
             description="Conditions de vente remplies !",
             color=0xff0000,
-            fields=fields
+            fields=fields,
+            dedup_key=dedup_key
         )
 
 # Test
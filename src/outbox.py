@@ -0,0 +1,329 @@
+"""
+Boîte d'envoi persistante (SQLite) entre la stratégie et Discord :
+regroupement des embeds en attente, livraison au moins une fois,
+clés de déduplication conservées d'un run à l'autre
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from src.webhook_sender import REJECTED, SENT
+
+# Limites Discord par message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+
+def embed_size(embed):
+    """Nombre de caractères comptés par Discord pour un embed."""
+    size = len(embed.get('title', '')) + len(embed.get('description', ''))
+    size += len(embed.get('footer', {}).get('text', '')) + len(embed.get('author', {}).get('name', ''))
+    for field in embed.get('fields', []):
+        size += len(str(field.get('name', ''))) + len(str(field.get('value', '')))
+    return size
+
+
+class NotificationOutbox:
+    """
+    Table `outbox` : une ligne par embed (webhook, clé de déduplication
+    unique, embed JSON, statut, tentatives, prochaine tentative, date d'envoi).
+
+    - enqueue() ignore une clé déjà vue (même envoyée lors d'un run précédent) ;
+    - claim() réserve (bail de `lease` s) les embeds dus d'un webhook, dans
+      l'ordre d'arrivée, dans la limite d'un message Discord ;
+    - mark_sent() après un 2xx seulement : un crash entre l'envoi et
+      l'acquittement provoque un renvoi (au moins une fois) ;
+    - mark_failed() reprogramme l'embed ; après max_attempts échecs il passe
+      en statut 'dead' (lettre morte : gardé pour inspection, plus renvoyé) ;
+    - mark_dead() : lettre morte directe pour un embed refusé par Discord (4xx) ;
+    - enqueue(..., supersede=True) remplace les embeds du même type en attente
+      (statut 'superseded') ;
+    - les lignes envoyées sont gardées retention_days jours pour la déduplication.
+    """
+
+    def __init__(self, path='data/outbox.db', lease=60.0, retention_days=7, max_attempts=10):
+        self.path = path
+        self.lease = lease
+        self.retention_days = retention_days
+        self.max_attempts = max_attempts
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                webhook TEXT NOT NULL,
+                dedup_key TEXT NOT NULL UNIQUE,
+                kind TEXT NOT NULL,
+                embed TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                sent_at REAL,
+                error TEXT
+            )
+        ''')
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(outbox)')}
+        if 'status' not in columns:
+            # Boîte créée avant les lettres mortes
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN status TEXT NOT NULL DEFAULT 'pending'")
+            self._conn.execute("UPDATE outbox SET status = 'sent' WHERE sent_at IS NOT NULL")
+        self._conn.execute('DROP INDEX IF EXISTS outbox_pending')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS outbox_due ON outbox (webhook, status, next_attempt_at)')
+        self.purge()
+
+    def enqueue(self, webhook, embed, dedup_key=None, kind='message', supersede=False):
+        """
+        Ajoute un embed ; False si la clé de déduplication est déjà connue.
+        supersede : les embeds du même type encore en attente pour ce webhook
+        sont abandonnés (statut 'superseded'), ex. heartbeats périmés après une
+        panne Discord : seul le plus récent part.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                if supersede:
+                    self._conn.execute(
+                        "UPDATE outbox SET status = 'superseded', next_attempt_at = ? "
+                        "WHERE webhook = ? AND kind = ? AND status = 'pending'", (now, webhook, kind)
+                    )
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO outbox (webhook, dedup_key, kind, embed, created_at, next_attempt_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (webhook, dedup_key or f'uuid:{uuid.uuid4()}', kind, json.dumps(embed), now, now)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return cursor.rowcount == 1
+
+    def pending_webhooks(self, now=None):
+        """Webhooks ayant au moins un embed dû."""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT webhook FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?", (now,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim(self, webhook, max_embeds=MAX_EMBEDS, max_chars=MAX_EMBED_CHARS, now=None, lease=None):
+        """
+        Réserve (bail de `lease` s, défaut self.lease) les prochains embeds dus
+        de ce webhook ; retourne [(id, embed), ...].
+        """
+        now = time.time() if now is None else now
+        lease = self.lease if lease is None else lease
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, embed FROM outbox WHERE webhook = ? AND status = 'pending' AND next_attempt_at <= ? "
+                    'ORDER BY id LIMIT ?', (webhook, now, max_embeds)
+                ).fetchall()
+                batch, chars = [], 0
+                for row_id, raw in rows:
+                    embed = json.loads(raw)
+                    size = embed_size(embed)
+                    if batch and chars + size > max_chars:
+                        break
+                    batch.append((row_id, embed))
+                    chars += size
+                if batch:
+                    ids = [row_id for row_id, _ in batch]
+                    self._conn.execute(
+                        f'UPDATE outbox SET next_attempt_at = ? WHERE id IN ({",".join("?" * len(ids))})',
+                        [now + lease, *ids]
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return batch
+
+    def mark_sent(self, ids):
+        self._update(ids, "status = 'sent', sent_at = ?, error = NULL", time.time())
+
+    def mark_failed(self, ids, error, retry_in):
+        """Nouvel essai dans retry_in s, ou lettre morte au max_attempts-ième échec."""
+        self._update(
+            ids,
+            "attempts = attempts + 1, error = ?, next_attempt_at = ?, "
+            "status = CASE WHEN attempts + 1 >= ? THEN 'dead' ELSE status END",
+            str(error), time.time() + retry_in, self.max_attempts
+        )
+
+    def mark_dead(self, ids, error):
+        """Lettre morte immédiate : refus définitif (4xx), inutile de renvoyer."""
+        self._update(ids, "attempts = attempts + 1, error = ?, status = 'dead'", str(error))
+
+    def _update(self, ids, assignments, *values):
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute(
+                f'UPDATE outbox SET {assignments} WHERE id IN ({",".join("?" * len(ids))})', [*values, *ids]
+            )
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def dead_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'dead'").fetchone()[0]
+
+    def next_due(self):
+        """Instant de la prochaine tentative en attente (None si rien en attente)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def purge(self):
+        """Supprime les embeds envoyés, en lettre morte ou remplacés depuis plus de retention_days jours."""
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock:
+            self._conn.execute('DELETE FROM outbox WHERE sent_at IS NOT NULL AND sent_at < ?', (cutoff,))
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status IN ('dead', 'superseded') AND next_attempt_at < ?", (cutoff,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxDispatcher:
+    """
+    Thread qui vide la boîte d'envoi : attend `linger` s après un ajout
+    (pour regrouper une rafale), puis envoie par webhook des messages d'au
+    plus 10 embeds via WebhookSender.deliver_status (reprises, 429, timeouts).
+    Un message en échec reste dans la boîte et repart plus tard ; un message
+    refusé (4xx) est renvoyé embed par embed, pour qu'un embed invalide ne
+    bloque pas les autres, et chaque embed refusé passe en lettre morte.
+    """
+
+    def __init__(self, outbox, sender, linger=0.5, retry_delay=30.0):
+        self.outbox = outbox
+        self.sender = sender
+        self.linger = linger
+        self.retry_delay = retry_delay
+        # Bail couvrant le pire envoi d'un lot (hors attentes 429) : le message
+        # groupé, puis chaque embed seul après un refus
+        self.lease = max(outbox.lease, (MAX_EMBEDS + 1) * sender.max_delivery_time())
+        self.messages = 0
+        self.embeds = 0
+        self._wake = threading.Event()
+        self._busy = False
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name='discord-outbox')
+        self._thread.start()
+        # Reprise des embeds laissés par un run précédent
+        self.wake()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop:
+            due = self.outbox.next_due()
+            timeout = None if due is None else max(due - time.time(), 0.0)
+            if timeout is None or timeout > 0:
+                self._wake.wait(timeout)
+            self._busy = True
+            self._wake.clear()
+            try:
+                if self._stop:
+                    break
+                if self.linger:
+                    time.sleep(self.linger)
+                self.drain()
+            except Exception as e:
+                print(f"❌ Erreur boîte d'envoi Discord: {e}")
+                time.sleep(1)
+            finally:
+                self._busy = False
+
+    def _send(self, webhook, rows, label):
+        """Envoie `rows` en un message ; acquitte les embeds si Discord l'accepte. Retourne le statut."""
+        status = self.sender.deliver_status(webhook, {"embeds": [embed for _, embed in rows]}, label)
+        if status == SENT:
+            self.outbox.mark_sent([row_id for row_id, _ in rows])
+            self.messages += 1
+            self.embeds += len(rows)
+        return status
+
+    def drain(self):
+        """Envoie tout ce qui est dû ; retourne le nombre de messages envoyés."""
+        sent = 0
+        for webhook in self.outbox.pending_webhooks():
+            while True:
+                batch = self.outbox.claim(webhook, lease=self.lease)
+                if not batch:
+                    break
+                label = "Message Discord" if len(batch) == 1 else f"Message Discord ({len(batch)} embeds)"
+                status = self._send(webhook, batch, label)
+                if status == SENT:
+                    sent += 1
+                    continue
+                rejected, failed = [], []
+                if status == REJECTED and len(batch) > 1:
+                    # Un embed invalide fait refuser tout le message : renvoi embed par embed
+                    for i, row in enumerate(batch):
+                        status = self._send(webhook, [row], "Message Discord")
+                        if status == SENT:
+                            sent += 1
+                        elif status == REJECTED:
+                            rejected.append(row[0])
+                        else:
+                            failed = [row_id for row_id, _ in batch[i:]]
+                            break
+                elif status == REJECTED:
+                    rejected = [batch[0][0]]
+                else:
+                    failed = [row_id for row_id, _ in batch]
+                self.outbox.mark_dead(rejected, "refusé par Discord (4xx)")
+                self.outbox.mark_failed(failed, "échec d'envoi", self.retry_delay)
+                if failed:
+                    # Discord injoignable : inutile d'insister sur ce webhook pour l'instant
+                    break
+        return sent
+
+    def flush(self, timeout=None):
+        """
+        Attend l'envoi de tout ce qui est dû ; False si le timeout est atteint
+        ou si des embeds en échec attendent leur prochaine tentative.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            due = self.outbox.next_due()
+            overdue = due is not None and due <= time.time()
+            if not overdue and not self._busy and not self._wake.is_set():
+                return due is None
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if overdue and not self._busy:
+                self.wake()
+            time.sleep(0.05)
+
+    def close(self, timeout=None):
+        flushed = self.flush(timeout)
+        remaining = self.outbox.pending_count()
+        if remaining:
+            print(f"💾 {remaining} embed(s) Discord en attente dans la boîte d'envoi (renvoyés au prochain run)")
+        dead = self.outbox.dead_count()
+        if dead:
+            print(f"⚠️ {dead} embed(s) Discord abandonné(s) (refusés ou {self.outbox.max_attempts} échecs, statut 'dead')")
+        self._stop = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        return flushed
@@ -0,0 +1,160 @@
+"""
+Paramètres de la stratégie et du backtest (objet figé, construit une fois)
+"""
+import argparse
+import os
+from dataclasses import dataclass, field, fields, replace
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y", "on")
+    return bool(value)
+
+
+def _parse_int(value) -> int:
+    if isinstance(value, str):
+        return int(float(value))
+    return int(value)
+
+
+_PARSERS = {float: float, int: _parse_int, bool: _parse_bool}
+
+
+@dataclass(frozen=True, slots=True)
+class StrategyParams:
+    """
+    Paramètres de ImprovedStrategy et de compute_trades.
+
+    Chaque champ correspond à la variable d'environnement du même nom en
+    majuscules (volume_ratio_min <-> VOLUME_RATIO_MIN). L'objet est figé :
+    on le passe explicitement, et with_overrides() en crée une copie modifiée
+    (utile pour lancer plusieurs essais en parallèle sans toucher os.environ).
+    """
+    # Filtres macro
+    volume_ratio_min: float = 0.5       # 0.5x vs 0.95x
+    volume_spike_min: float = 1.1       # 1.1x vs 1.4x
+    chop_no_trade_max: float = 65.0     # 65 vs 48
+    atr_pct_min: float = 0.002          # 0.2% vs 0.65%
+    atr_extreme_mult: float = 3.0
+
+    # RSI (zone LARGE)
+    rsi_min: float = 35.0               # 35 vs 48
+    rsi_max: float = 65.0               # 65 vs 52
+
+    # Stops & TPs
+    atr_stop_mult: float = 2.0          # 2.0 vs 0.95
+    tp1_mult: float = 1.5
+    tp2_mult: float = 3.0
+
+    # Backtest : frais, slippage, stops de repli
+    fee_rate: float = 0.0004            # 0.04% par ordre
+    slippage_bps: float = 0.0002
+    sl_pct: float = 0.01
+    tp_pct: float = 0.02
+    use_atr_stops: bool = True
+    atr_mult_sl: float = 1.5
+    atr_mult_tp: float = 2.5
+
+    # Backtest : gestion de position
+    cooldown_bars: int = 3
+    cooldown_bars_sl: int = None        # None = cooldown_bars
+    time_stop_bars: int = 48
+    long_only: bool = True
+
+    # True si cooldown_bars_sl a été déduit de cooldown_bars (à redéduire si ce dernier change)
+    _cooldown_sl_derived: bool = field(default=False, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.cooldown_bars_sl is None:
+            object.__setattr__(self, 'cooldown_bars_sl', self.cooldown_bars)
+            object.__setattr__(self, '_cooldown_sl_derived', True)
+
+    @classmethod
+    def _fields(cls):
+        return tuple(f for f in fields(cls) if f.init)
+
+    @classmethod
+    def env_names(cls):
+        """Noms des variables d'environnement reconnues."""
+        return tuple(f.name.upper() for f in cls._fields())
+
+    @classmethod
+    def _coerce(cls, values):
+        """Convertit {NOM_ENV ou nom_champ: valeur} en {nom_champ: valeur typée}."""
+        types = {f.name: f.type for f in cls._fields()}
+        out = {}
+        for key, value in values.items():
+            name = key.lower()
+            if name not in types:
+                raise ValueError(f"Paramètre inconnu: {key}")
+            if value is None:
+                out[name] = None
+                continue
+            out[name] = _PARSERS[types[name]](value)
+        return out
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """Construit les paramètres depuis l'environnement (.env déjà chargé par load_dotenv)."""
+        environ = os.environ if environ is None else environ
+        values = {name: environ[name] for name in cls.env_names() if environ.get(name) is not None}
+        return cls(**cls._coerce(values))
+
+    @classmethod
+    def from_cli(cls, argv=None, environ=None):
+        """
+        Environnement + surcharges en ligne de commande :
+        python main.py --set RSI_MIN=40 --set LONG_ONLY=false
+        """
+        parser = argparse.ArgumentParser(add_help=False)
+        parser.add_argument('--set', action='append', default=[], metavar='NOM=VALEUR',
+                            help="Surcharge un paramètre de stratégie")
+        args, _ = parser.parse_known_args(argv)
+
+        overrides = {}
+        for item in args.set:
+            key, sep, value = item.partition('=')
+            if not sep:
+                raise ValueError(f"Surcharge invalide (attendu NOM=VALEUR): {item}")
+            overrides[key.strip()] = value.strip()
+        return cls.from_env(environ).with_overrides(overrides)
+
+    def with_overrides(self, overrides):
+        """
+        Copie avec des valeurs modifiées (clés NOM_ENV ou nom de champ).
+        Un cooldown_bars_sl non fixé explicitement suit cooldown_bars, comme
+        dans from_env.
+        """
+        if not overrides:
+            return self
+        values = self._coerce(overrides)
+        if self._cooldown_sl_derived and 'cooldown_bars_sl' not in values:
+            values['cooldown_bars_sl'] = None
+        return replace(self, **values)
+
+    def to_env(self):
+        """Représentation {NOM_ENV: str} (workflow, logs)."""
+        env = {}
+        for f in self._fields():
+            value = getattr(self, f.name)
+            env[f.name.upper()] = str(value).lower() if isinstance(value, bool) else str(value)
+        return env
+
+# Test
+if __name__ == "__main__":
+    # --set NOM=VALEUR doit donner les mêmes paramètres que NOM=VALEUR dans l'environnement
+    cases = [
+        {'COOLDOWN_BARS': '10'},
+        {'COOLDOWN_BARS': '10', 'COOLDOWN_BARS_SL': '4'},
+        {'RSI_MIN': '40', 'LONG_ONLY': 'false'},
+    ]
+    for base in ({}, {'COOLDOWN_BARS_SL': '3'}, {'COOLDOWN_BARS': '5'}):
+        for overrides in cases:
+            from_cli = StrategyParams.from_cli([f'--set={k}={v}' for k, v in overrides.items()], environ=base)
+            from_env = StrategyParams.from_env({**base, **overrides})
+            status = "✅" if from_cli == from_env else "❌"
+            print(f"{status} env {base} + --set {overrides} : cooldown_bars_sl={from_cli.cooldown_bars_sl} "
+                  f"(env seul : {from_env.cooldown_bars_sl})")
+            if from_cli != from_env:
+                raise SystemExit(1)
@@ -0,0 +1,193 @@
+"""
+Serveur WebSocket local qui rejoue des bougies enregistrées (tests hors ligne du flux temps réel)
+
+    python -m src.replay_server --exchange binance --symbol BTC/USDT --timeframe 1h --interval 1
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from src.candle_store import COLUMNS, CandleStore
+
+
+class ReplayServer:
+    """
+    Rejoue des bougies ([ts, o, h, l, c, v], triées) en accéléré.
+
+    - WebSocket /ws : après {"method": "watch_ohlcv", ...}, le serveur pousse
+      chaque mise à jour de la bougie en cours au format watch_ohlcv
+      ({"symbol", "timeframe", "ohlcv": [...], "sent_at"}). Au changement de
+      bougie, le message contient la bougie clôturée (valeurs finales) suivie
+      de la nouvelle bougie.
+    - HTTP /ohlcv?since=&limit= : équivalent REST de fetch_ohlcv sur les
+      bougies déjà rejouées (bougie en cours incluse), pour le rattrapage.
+
+    candle_interval : durée réelle (s) d'une bougie rejouée.
+    updates_per_candle : nombre de mises à jour poussées par bougie.
+    start : nombre de bougies considérées comme passées au démarrage.
+    drop_every : coupe toutes les connexions toutes les N bougies (0 = jamais),
+    pour tester la reconnexion et le rattrapage REST.
+    """
+
+    def __init__(self, candles, symbol='BTC/USDT', timeframe='1h', candle_interval=1.0,
+                 updates_per_candle=4, start=500, drop_every=0):
+        self.candles = [list(map(float, row)) for row in candles]
+        for row in self.candles:
+            row[0] = int(row[0])
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.candle_interval = candle_interval
+        self.updates_per_candle = max(int(updates_per_candle), 1)
+        self.cursor = min(max(int(start), 1), len(self.candles) - 1)
+        self.step = 1
+        self.drop_every = drop_every
+        self.clients = set()
+        self.finished = asyncio.Event()
+        self._runner = None
+        self._task = None
+        self.port = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def _partial(self, index, step):
+        """Bougie `index` telle qu'elle apparaît après `step` mises à jour sur updates_per_candle."""
+        ts, o, h, l, c, v = self.candles[index]
+        if step >= self.updates_per_candle:
+            return [ts, o, h, l, c, v]
+        frac = step / self.updates_per_candle
+        close = o + (c - o) * frac
+        return [ts, o, max(o, close), min(o, close), close, v * frac]
+
+    def visible(self):
+        """Bougies déjà rejouées : clôturées puis bougie en cours (partielle)."""
+        return self.candles[:self.cursor] + [self._partial(self.cursor, self.step)]
+
+    async def _broadcast(self, rows):
+        message = json.dumps({'symbol': self.symbol, 'timeframe': self.timeframe,
+                              'ohlcv': rows, 'sent_at': time.time()})
+        for ws in list(self.clients):
+            try:
+                await ws.send_str(message)
+            except (ConnectionError, RuntimeError):
+                self.clients.discard(ws)
+
+    async def _drop_clients(self):
+        for ws in list(self.clients):
+            await ws.close()
+        self.clients.clear()
+
+    async def _replay(self):
+        delay = self.candle_interval / self.updates_per_candle
+        while self.cursor < len(self.candles) - 1:
+            await asyncio.sleep(delay)
+            if self.step < self.updates_per_candle:
+                self.step += 1
+                await self._broadcast([self._partial(self.cursor, self.step)])
+                continue
+
+            # Changement de bougie : la précédente est publiée avec ses valeurs finales
+            self.cursor += 1
+            self.step = 1
+            await self._broadcast([self.candles[self.cursor - 1], self._partial(self.cursor, self.step)])
+            if self.drop_every and self.cursor % self.drop_every == 0:
+                await self._drop_clients()
+
+        for ws in list(self.clients):
+            await ws.send_str(json.dumps({'event': 'end'}))
+        await self._drop_clients()
+        self.finished.set()
+
+    async def _handle_ws(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            if json.loads(msg.data).get('method') == 'watch_ohlcv':
+                self.clients.add(ws)
+                await ws.send_str(json.dumps({'symbol': self.symbol, 'timeframe': self.timeframe,
+                                              'ohlcv': [self._partial(self.cursor, self.step)],
+                                              'sent_at': time.time()}))
+        self.clients.discard(ws)
+        return ws
+
+    async def _handle_ohlcv(self, request):
+        rows = self.visible()
+        limit = int(request.query.get('limit', 500))
+        since = request.query.get('since')
+        if since is not None:
+            rows = [row for row in rows if row[0] >= int(since)][:limit]
+        else:
+            rows = rows[-limit:]
+        return web.json_response(rows)
+
+    async def start(self, host='127.0.0.1', port=0):
+        app = web.Application()
+        app.router.add_get('/ws', self._handle_ws)
+        app.router.add_get('/ohlcv', self._handle_ohlcv)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._task = asyncio.create_task(self._replay())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        await self._drop_clients()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def load_recorded_candles(exchange_name, symbol, timeframe, store=None):
+    """Bougies du CandleStore au format fetch_ohlcv."""
+    df = (store or CandleStore()).read(exchange_name, symbol, timeframe)
+    timestamps = df.index.as_unit('ms').asi8
+    values = df[list(COLUMNS[1:])].to_numpy(dtype=np.float64)
+    return [[int(ts), *row] for ts, row in zip(timestamps, values.tolist())]
+
+
+async def _serve(args):
+    candles = load_recorded_candles(args.exchange, args.symbol, args.timeframe)
+    if len(candles) <= args.start:
+        print(f"❌ Pas assez de bougies enregistrées ({len(candles)}) - lancer d'abord test_backtest.py")
+        return
+    server = ReplayServer(candles, args.symbol, args.timeframe, candle_interval=args.interval,
+                          updates_per_candle=args.updates, start=args.start, drop_every=args.drop_every)
+    await server.start(port=args.port)
+    print(f"📡 Rejeu de {len(candles) - args.start} bougies {args.symbol} {args.timeframe} sur {server.url}")
+    print(f"   WS_REPLAY_URL={server.url}")
+    try:
+        await server.finished.wait()
+    finally:
+        await server.stop()
+    print("🏁 Rejeu terminé")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur de rejeu WebSocket de bougies enregistrées")
+    parser.add_argument('--exchange', default='binance')
+    parser.add_argument('--symbol', default='BTC/USDT')
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--interval', type=float, default=1.0, help="durée réelle d'une bougie (s)")
+    parser.add_argument('--updates', type=int, default=4, help="mises à jour poussées par bougie")
+    parser.add_argument('--start', type=int, default=500, help="bougies déjà passées au démarrage")
+    parser.add_argument('--drop-every', type=int, default=0, help="coupe les connexions toutes les N bougies")
+    parser.add_argument('--port', type=int, default=8765)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("\n🛑 Arrêt du serveur")
+
+
+if __name__ == "__main__":
+    main()
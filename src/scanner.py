@@ -0,0 +1,241 @@
+"""
+Scanner multi-symboles / multi-exchanges : bougies récupérées en parallèle
+(ccxt asynchrone, limites de chaque exchange respectées), puis indicateurs,
+stratégie et notification par symbole
+"""
+import asyncio
+import os
+import time
+
+import ccxt.async_support as ccxt_async
+import pandas as pd
+
+from src.compute_pool import evaluate_candles
+from src.state_manager import StateManager, StateStore
+
+
+def parse_targets(value, default_exchange):
+    """
+    'BTC/USDT, binance:ETH/USDT' -> [('kraken', 'BTC/USDT'), ('binance', 'ETH/USDT')]
+    (exchange par défaut pour les symboles sans préfixe).
+    """
+    targets = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        exchange_name, sep, symbol = item.partition(':')
+        targets.append((exchange_name.strip(), symbol.strip()) if sep else (default_exchange, item))
+    return targets
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else float('nan')
+
+
+class MarketScanner:
+    """
+    Analyse une liste de (exchange, symbole) en un seul passage.
+
+    Les requêtes partent toutes en même temps : le throttler ccxt de chaque
+    exchange (enableRateLimit) et un sémaphore par exchange (`concurrency`
+    requêtes en vol au maximum) bornent le débit. L'analyse d'un symbole
+    démarre dès que ses bougies arrivent, sans attendre les autres : dans un
+    thread, ou sur un ShardedEvaluator (processus, un cœur par worker) si
+    `evaluator` est fourni.
+
+    L'état anti-doublon est propre à chaque symbole (clé exchange/symbole/
+    timeframe du StateStore partagé) ; les anciens fichiers JSON de state_dir
+    y sont importés au premier passage. Chaque symbole produit une ligne de
+    métriques (attente, téléchargement, analyse, total, signal).
+    """
+
+    def __init__(self, targets, timeframe='1h', limit=500, params=None, notifier=None,
+                 concurrency=20, state_dir='data/scanner', exchanges=None, evaluator=None, shard_size=None,
+                 state_store=None):
+        self.targets = list(targets)
+        self.timeframe = timeframe
+        self.limit = limit
+        self.params = params
+        self.notifier = notifier
+        self.concurrency = concurrency
+        self.state_dir = state_dir
+        self.exchanges = dict(exchanges or {})
+        self.evaluator = evaluator
+        self.shard_size = shard_size
+        self.state_store = state_store
+        self._semaphores = {}
+        self.wall_ms = None
+
+    def get_exchange(self, exchange_name):
+        if exchange_name not in self.exchanges:
+            self.exchanges[exchange_name] = getattr(ccxt_async, exchange_name)({'enableRateLimit': True})
+        return self.exchanges[exchange_name]
+
+    @staticmethod
+    async def discover(exchange, quote='USDT', max_symbols=200):
+        """Paires spot actives cotées en `quote` (ordre alphabétique, max_symbols au plus)."""
+        markets = await exchange.load_markets()
+        symbols = sorted(
+            symbol for symbol, market in markets.items()
+            if market.get('spot') and market.get('active', True) is not False and market.get('quote') == quote
+        )
+        return symbols[:max_symbols]
+
+    def state_for(self, exchange_name, symbol):
+        if self.state_store is None:
+            self.state_store = StateStore()
+        name = f"{exchange_name}_{symbol.replace('/', '-')}_{self.timeframe}.json"
+        return StateManager(exchange_name, symbol, self.timeframe, store=self.state_store,
+                            legacy_file=os.path.join(self.state_dir, name))
+
+    def _semaphore(self, exchange_name):
+        if exchange_name not in self._semaphores:
+            self._semaphores[exchange_name] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[exchange_name]
+
+    def notify(self, exchange_name, symbol, result):
+        if self.notifier is None:
+            return
+        indicators = {
+            'rsi': f"{result['rsi']:.2f}",
+            'trend': result['trend'],
+            'ema_20': f"${result['ema_20']:,.2f}",
+            'ema_50': f"${result['ema_50']:,.2f}",
+            'ema_200': f"${result['ema_200']:,.2f}",
+            'chop': f"{result['chop']:.2f}",
+            'support': f"${result['support']:,.2f}" if result['support'] == result['support'] else "N/A",
+            'resistance': f"${result['resistance']:,.2f}" if result['resistance'] == result['resistance'] else "N/A"
+        }
+        send = self.notifier.send_buy_signal if result['signal'] == 'BUY' else self.notifier.send_sell_signal
+        # Mise en file du notifier (limites de débit Discord gérées par son thread d'envoi)
+        dedup_key = f"signal:{exchange_name}:{symbol}:{self.timeframe}:{result['timestamp']}:{result['signal']}"
+        send(symbol=f"{symbol} ({exchange_name})", price=result['close'], indicators=indicators, dedup_key=dedup_key)
+
+    async def _fetch(self, exchange_name, symbol):
+        """Télécharge les bougies ; retourne (métriques, bougies ou None en cas d'erreur, début)."""
+        metrics = {
+            'exchange': exchange_name, 'symbol': symbol, 'candles': 0,
+            'queue_ms': None, 'fetch_ms': None, 'analyze_ms': None, 'total_ms': None,
+            'signal': None, 'reason': None, 'sent': False, 'error': None,
+        }
+        started = time.perf_counter()
+        try:
+            exchange = self.get_exchange(exchange_name)
+            async with self._semaphore(exchange_name):
+                queued = time.perf_counter()
+                ohlcv = await exchange.fetch_ohlcv(symbol, self.timeframe, limit=self.limit)
+        except Exception as e:
+            metrics['error'] = f"{type(e).__name__}: {e}"
+            return metrics, None, started
+        metrics['candles'] = len(ohlcv)
+        metrics['queue_ms'] = (queued - started) * 1000
+        metrics['fetch_ms'] = (time.perf_counter() - queued) * 1000
+        return metrics, ohlcv, started
+
+    async def _dispatch(self, exchange_name, symbol, result, metrics):
+        """Résultat compact (evaluate_candles) -> état anti-doublon et notification."""
+        if 'error' in result:
+            metrics['error'] = result['error']
+            return
+        metrics['analyze_ms'] = result['compute_ms']
+        metrics['signal'] = result['signal']
+        metrics['reason'] = result['reason']
+        if result['signal'] == 'NEUTRAL':
+            return
+        state = self.state_for(exchange_name, symbol)
+        if state.should_send_signal(result['signal']):
+            self.notify(exchange_name, symbol, result)
+            state.update_signal(result['signal'], result['close'])
+            metrics['sent'] = True
+
+    async def scan_symbol(self, exchange_name, symbol):
+        """Chemin sans pool : l'analyse tourne dans un thread dès l'arrivée des bougies."""
+        metrics, ohlcv, started = await self._fetch(exchange_name, symbol)
+        if ohlcv is not None:
+            try:
+                result = await asyncio.to_thread(evaluate_candles, ohlcv, self.params)
+                await self._dispatch(exchange_name, symbol, result, metrics)
+            except Exception as e:
+                metrics['error'] = f"{type(e).__name__}: {e}"
+        metrics['total_ms'] = (time.perf_counter() - started) * 1000
+        return metrics
+
+    async def _finish_shard(self, batch, future):
+        try:
+            results = await future
+        except Exception as e:
+            results = [{'error': f"{type(e).__name__}: {e}"}] * len(batch)
+        for (metrics, _, started), result in zip(batch, results):
+            try:
+                await self._dispatch(metrics['exchange'], metrics['symbol'], result, metrics)
+            except Exception as e:
+                metrics['error'] = f"{type(e).__name__}: {e}"
+            metrics['total_ms'] = (time.perf_counter() - started) * 1000
+        return [metrics for metrics, _, _ in batch]
+
+    async def _scan_sharded(self):
+        """
+        Chemin avec pool : les bougies reçues sont regroupées par shards de
+        shard_size symboles envoyés aux workers au fil des téléchargements.
+        """
+        shard_size = self.shard_size or max(1, -(-len(self.targets) // (self.evaluator.workers * 4)))
+        pending, shards, failed = [], [], []
+
+        def flush():
+            batch = pending[:]
+            pending.clear()
+            future = asyncio.wrap_future(self.evaluator.submit([ohlcv for _, ohlcv, _ in batch]))
+            shards.append(asyncio.create_task(self._finish_shard(batch, future)))
+
+        for fetch in asyncio.as_completed([self._fetch(ex, symbol) for ex, symbol in self.targets]):
+            metrics, ohlcv, started = await fetch
+            if ohlcv is None:
+                metrics['total_ms'] = (time.perf_counter() - started) * 1000
+                failed.append(metrics)
+                continue
+            pending.append((metrics, ohlcv, started))
+            if len(pending) >= shard_size:
+                flush()
+        if pending:
+            flush()
+
+        results = failed + [metrics for shard in await asyncio.gather(*shards) for metrics in shard]
+        position = {target: i for i, target in enumerate(self.targets)}
+        return sorted(results, key=lambda m: position[(m['exchange'], m['symbol'])])
+
+    async def scan(self):
+        """Analyse tous les symboles ; retourne un DataFrame de métriques (une ligne par symbole)."""
+        started = time.perf_counter()
+        try:
+            if self.evaluator is not None:
+                results = await self._scan_sharded()
+            else:
+                results = await asyncio.gather(*(self.scan_symbol(ex, symbol) for ex, symbol in self.targets))
+        finally:
+            await self.close()
+        self.wall_ms = (time.perf_counter() - started) * 1000
+        return pd.DataFrame(results)
+
+    async def close(self):
+        for exchange in self.exchanges.values():
+            close = getattr(exchange, 'close', None)
+            if close is not None:
+                await close()
+
+    def summary(self, metrics):
+        """Synthèse du passage : durée réelle vs somme des requêtes (équivalent séquentiel)."""
+        ok = metrics[metrics['error'].isna()]
+        fetch = ok['fetch_ms'].dropna().tolist()
+        return {
+            'symbols': len(metrics),
+            'errors': int(metrics['error'].notna().sum()),
+            'signals': int((ok['signal'].isin(['BUY', 'SELL'])).sum()),
+            'sent': int(metrics['sent'].sum()),
+            'wall_ms': self.wall_ms,
+            'sequential_fetch_ms': float(sum(fetch)),
+            'fetch_p50_ms': _percentile(fetch, 0.5),
+            'fetch_p95_ms': _percentile(fetch, 0.95),
+            'analyze_total_ms': float(ok['analyze_ms'].dropna().sum()),
+        }
@@ -0,0 +1,82 @@
+"""
+Planification alignée sur la clôture des bougies, avec interrogation
+bornée (et légèrement aléatoire) de l'exchange juste après la clôture
+"""
+import random
+import time
+
+from src.candle_store import timeframe_to_ms
+
+
+class CandleScheduler:
+    """
+    Calcule la prochaine clôture de chaque timeframe configuré et attend
+    qu'elle soit publiée par l'exchange.
+
+    Après la clôture, `probe()` est appelée toutes les poll_interval secondes
+    (± jitter, pour ne pas frapper l'API au même instant que tout le monde)
+    pendant au plus poll_window secondes, jusqu'à ce qu'elle retourne une
+    valeur (la bougie clôturée est disponible). Aucun cycle à vide entre
+    deux clôtures.
+    """
+
+    def __init__(self, timeframes, poll_interval=1.0, poll_window=30.0, jitter=0.25,
+                 clock=time.time, sleep=time.sleep, rng=None):
+        self.timeframes = list(timeframes)
+        self.poll_interval = poll_interval
+        self.poll_window = poll_window
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+    @staticmethod
+    def next_close(timeframe, now):
+        """Timestamp (s) de la prochaine clôture de `timeframe` strictement après now."""
+        period = timeframe_to_ms(timeframe) / 1000
+        return (now // period + 1) * period
+
+    def next_event(self, now=None):
+        """(instant de clôture, timeframes qui clôturent à cet instant)."""
+        now = self.clock() if now is None else now
+        closes = {tf: self.next_close(tf, now) for tf in self.timeframes}
+        close_ts = min(closes.values())
+        return close_ts, [tf for tf, ts in closes.items() if ts == close_ts]
+
+    def _jittered(self, delay):
+        return max(delay * (1 + self.rng.uniform(-self.jitter, self.jitter)), 0.0)
+
+    def sleep_until(self, ts):
+        remaining = ts - self.clock()
+        if remaining > 0:
+            self.sleep(remaining)
+
+    def wait_for_candle(self, close_ts, probe):
+        """
+        Interroge probe() à partir de close_ts jusqu'à obtenir une valeur ou
+        épuiser poll_window. Retourne (valeur ou None, nombre d'appels).
+        """
+        self.sleep_until(close_ts + self.rng.uniform(0, self.jitter * self.poll_interval))
+        deadline = close_ts + self.poll_window
+        polls = 0
+        while True:
+            polls += 1
+            result = probe()
+            if result is not None:
+                return result, polls
+            if self.clock() >= deadline:
+                return None, polls
+            self.sleep(min(self._jittered(self.poll_interval), max(deadline - self.clock(), 0.0)))
+
+    def run(self, probe, handler, max_cycles=None):
+        """
+        Boucle : attend chaque clôture, attend la bougie via probe(tf, close_ts)
+        puis appelle handler(tf, résultat, close_ts, polls) une seule fois.
+        """
+        cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            close_ts, timeframes = self.next_event()
+            for tf in timeframes:
+                result, polls = self.wait_for_candle(close_ts, lambda: probe(tf, close_ts))
+                handler(tf, result, close_ts, polls)
+            cycles += 1
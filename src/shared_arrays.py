@@ -0,0 +1,124 @@
+"""
+Tableaux NumPy en mémoire partagée (un seul bloc pour plusieurs colonnes)
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+_ALIGN = 64
+
+
+class SharedArrays:
+    """
+    Plusieurs tableaux NumPy nommés dans un seul bloc SharedMemory.
+
+    Le processus parent appelle create() puis transmet `spec` (petit tuple
+    picklable) aux workers, qui appellent attach(spec) : les workers lisent
+    les mêmes pages mémoire, sans copie ni pickling des données.
+    """
+
+    def __init__(self, shm, layout, owner=False):
+        self._shm = shm
+        self._layout = layout
+        self._owner = owner
+        self.arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for name, dtype, shape, offset in layout
+        }
+
+    @classmethod
+    def create(cls, arrays):
+        """Copie `arrays` ({nom: ndarray}) dans un nouveau bloc partagé."""
+        layout = []
+        offset = 0
+        for name, values in arrays.items():
+            values = np.asarray(values)
+            if values.dtype == object:
+                raise TypeError(f"Colonne non numérique non partageable: {name}")
+            offset = -(-offset // _ALIGN) * _ALIGN
+            layout.append((name, values.dtype.str, values.shape, offset))
+            offset += values.nbytes
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        shared = cls(shm, tuple(layout), owner=True)
+        for name, values in arrays.items():
+            shared.arrays[name][...] = values
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        """Ouvre un bloc créé par un autre processus (lecture seule conseillée)."""
+        name, layout = spec
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, layout, owner=False)
+
+    @property
+    def spec(self):
+        return (self._shm.name, self._layout)
+
+    @property
+    def nbytes(self):
+        return self._shm.size
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def close(self):
+        """Détache ce processus ; le créateur libère aussi le bloc."""
+        self.arrays = {}
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SharedFrame:
+    """
+    DataFrame d'indicateurs (colonnes numériques + index temporel) en mémoire partagée.
+
+    Les colonnes texte (trend, structure) ne sont pas partagées : le backtest
+    n'en a pas besoin.
+    """
+
+    _INDEX = '__index__'
+
+    def __init__(self, shared, tz=None, columns=()):
+        self.shared = shared
+        self._tz = tz
+        self._columns = tuple(columns)
+
+    @classmethod
+    def from_frame(cls, df):
+        numeric = [c for c in df.columns if df[c].dtype != object and pd.api.types.is_numeric_dtype(df[c])]
+        index = pd.DatetimeIndex(df.index)
+        arrays = {cls._INDEX: index.as_unit('ns').asi8}  # epoch UTC en ns
+        for c in numeric:
+            arrays[c] = df[c].to_numpy()
+        tz = str(index.tz) if index.tz is not None else None
+        return cls(SharedArrays.create(arrays), tz=tz, columns=numeric)
+
+    @property
+    def spec(self):
+        return (self.shared.spec, self._tz, self._columns)
+
+    @classmethod
+    def attach(cls, spec):
+        shared_spec, tz, columns = spec
+        return cls(SharedArrays.attach(shared_spec), tz=tz, columns=columns)
+
+    def to_frame(self):
+        """DataFrame dont les colonnes pointent sur la mémoire partagée (pas de copie)."""
+        index = pd.DatetimeIndex(self.shared[self._INDEX].view('datetime64[ns]'), name='timestamp')
+        if self._tz is not None:
+            index = index.tz_localize('UTC').tz_convert(self._tz)
+        return pd.DataFrame({c: self.shared[c] for c in self._columns}, index=index, copy=False)
+
+    def close(self):
+        self.shared.close()
@@ -0,0 +1,391 @@
+"""
+Moteur de simulation des trades sur tableaux NumPy
+(même logique que la boucle historique de test_backtest.compute_trades)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:  # numba est optionnel : repli sur la boucle Python
+    njit = None
+
+
+# Codes de sortie
+EXIT_TP1 = 0
+EXIT_TP2 = 1
+EXIT_TP2_FULL = 2
+EXIT_SL = 3
+EXIT_TIME = 4
+EXIT_REV = 5
+EXIT_EOD = 6
+
+EXIT_REASONS = np.array(['TP1', 'TP2', 'TP2_full', 'SL', 'TIME', 'REV', 'EOD'], dtype=object)
+
+# Trades en colonnes (une ligne par sortie, partielle ou totale)
+TRADE_DTYPE = np.dtype([
+    ('entry_idx', np.int64),
+    ('exit_idx', np.int64),
+    ('side', np.int8),          # 1 = BUY, -1 = SELL
+    ('entry', np.float64),
+    ('exit', np.float64),
+    ('return', np.float64),
+    ('exit_reason', np.int8),   # EXIT_*
+    ('stop', np.float64),
+    ('tp1', np.float64),
+    ('tp2', np.float64),
+])
+
+
+# État de la position entre deux tranches (tableau float64 pour numba)
+STATE_SIZE = 9
+
+
+def new_state():
+    """État initial : à plat, pas de cooldown."""
+    state = np.zeros(STATE_SIZE, dtype=np.float64)
+    state[2] = -1.0
+    state[4:7] = np.nan
+    return state
+
+
+def _simulate_core(open_, high, low, close, direction, stop_loss, take_profit_1, take_profit_2,
+                   warmup, fee_rate, slippage_bps, cooldown_bars, cooldown_bars_sl,
+                   time_stop_bars, long_only, start, stop, state, finalize):
+    """
+    Boucle de gestion de position. Uniquement des scalaires et des tableaux
+    pour pouvoir être compilée telle quelle par numba.
+
+    Entrée à l'ouverture de la bougie suivante, 50% à TP1 puis stop à BE,
+    reste à TP2 ou stop, stop temps, sortie sur signal opposé, cooldown.
+
+    Traite les bougies [start, stop) ; la position ouverte est lue puis
+    réécrite dans `state` pour pouvoir reprendre à la tranche suivante.
+    finalize clôture la position restante au dernier close.
+    """
+    n = len(close)
+    cap = max(stop - start, 0) + 1
+    out_entry_idx = np.empty(cap, dtype=np.int64)
+    out_exit_idx = np.empty(cap, dtype=np.int64)
+    out_side = np.empty(cap, dtype=np.int8)
+    out_entry = np.empty(cap, dtype=np.float64)
+    out_exit = np.empty(cap, dtype=np.float64)
+    out_return = np.empty(cap, dtype=np.float64)
+    out_reason = np.empty(cap, dtype=np.int8)
+    out_stop = np.empty(cap, dtype=np.float64)
+    out_tp1 = np.empty(cap, dtype=np.float64)
+    out_tp2 = np.empty(cap, dtype=np.float64)
+    count = 0
+
+    position = int(state[0])  # 1 = BUY, -1 = SELL, 0 = flat
+    entry_price = state[1]
+    entry_idx = int(state[2])
+    cooldown = int(state[3])
+    stop_price = state[4]
+    take_price_1 = state[5]
+    take_price_2 = state[6]
+    took_tp1 = state[7] != 0.0
+    bars_in_position = int(state[8])
+
+    for i in range(max(warmup, start), min(stop, n - 1)):
+        signal = direction[i]
+        j = i + 1
+
+        # Gestion position existante
+        if position != 0:
+            bars_in_position += 1
+
+            if position == 1:
+                hit_tp2 = high[j] >= take_price_2
+                hit_tp1 = high[j] >= take_price_1
+                hit_stop = low[j] <= stop_price
+            else:
+                hit_tp2 = low[j] <= take_price_2
+                hit_tp1 = low[j] <= take_price_1
+                hit_stop = high[j] >= stop_price
+
+            exit_reason = -1
+            exit_price = 0.0
+            size = 1.0
+
+            if hit_tp2:
+                exit_price = take_price_2
+                exit_reason = EXIT_TP2 if took_tp1 else EXIT_TP2_FULL
+                size = 0.5 if took_tp1 else 1.0
+            elif hit_tp1 and not took_tp1:
+                exit_price = take_price_1
+                exit_reason = EXIT_TP1
+                size = 0.5
+                took_tp1 = True
+                stop_price = entry_price  # BE après TP1
+            elif hit_stop:
+                exit_price = stop_price
+                exit_reason = EXIT_SL
+                size = 0.5 if took_tp1 else 1.0
+            elif bars_in_position >= time_stop_bars:
+                exit_price = open_[j]
+                exit_reason = EXIT_TIME
+                size = 0.5 if took_tp1 else 1.0
+            elif (position == 1 and signal == -1) or (position == -1 and signal == 1):
+                exit_price = open_[j]
+                exit_reason = EXIT_REV
+                size = 0.5 if took_tp1 else 1.0
+
+            if exit_reason >= 0:
+                # Slippage de sortie (même convention que apply_slippage historique)
+                if position == 1:
+                    exit_price_slip = exit_price * (1 + slippage_bps)
+                else:
+                    exit_price_slip = exit_price * (1 - slippage_bps)
+                ret = position * (exit_price_slip - entry_price) / entry_price * size
+                # Frais : entrée déjà payée une fois, sortie proportionnelle à la taille
+                ret -= fee_rate * (1 + size)
+
+                out_entry_idx[count] = entry_idx
+                out_exit_idx[count] = j
+                out_side[count] = position
+                out_entry[count] = entry_price
+                out_exit[count] = exit_price_slip
+                out_return[count] = ret
+                out_reason[count] = exit_reason
+                out_stop[count] = stop_price
+                out_tp1[count] = take_price_1
+                out_tp2[count] = take_price_2
+                count += 1
+
+                if exit_reason == EXIT_TP1:
+                    # conserver la moitié restante
+                    continue
+
+                position = 0
+                entry_price = 0.0
+                entry_idx = -1
+                stop_price = np.nan
+                take_price_1 = np.nan
+                take_price_2 = np.nan
+                took_tp1 = False
+                bars_in_position = 0
+                if exit_reason == EXIT_SL:
+                    cooldown = max(cooldown, cooldown_bars_sl)
+                else:
+                    cooldown = max(cooldown, cooldown_bars)
+
+        # Cooldown pour nouvelles entrées
+        if cooldown > 0:
+            cooldown -= 1
+            continue
+
+        # Nouvelle entrée
+        if position == 0 and signal != 0:
+            if long_only and signal == -1:
+                continue
+
+            if signal == 1:
+                entry_price = open_[j] * (1 + slippage_bps)
+            else:
+                entry_price = open_[j] * (1 - slippage_bps)
+            entry_idx = j
+            stop_price = stop_loss[i]
+            take_price_1 = take_profit_1[i]
+            take_price_2 = take_profit_2[i]
+            position = signal
+            took_tp1 = False
+            bars_in_position = 0
+
+    # Si une position reste ouverte à la fin, on la clôture au dernier close
+    if finalize and position != 0:
+        if position == 1:
+            exit_price_slip = close[n - 1] * (1 + slippage_bps)
+        else:
+            exit_price_slip = close[n - 1] * (1 - slippage_bps)
+        size = 0.5 if took_tp1 else 1.0
+        ret = position * (exit_price_slip - entry_price) / entry_price * size
+        ret -= fee_rate * (1 + size)
+
+        out_entry_idx[count] = entry_idx
+        out_exit_idx[count] = n - 1
+        out_side[count] = position
+        out_entry[count] = entry_price
+        out_exit[count] = exit_price_slip
+        out_return[count] = ret
+        out_reason[count] = EXIT_EOD
+        out_stop[count] = stop_price
+        out_tp1[count] = take_price_1
+        out_tp2[count] = take_price_2
+        count += 1
+        position = 0
+
+    state[0] = position
+    state[1] = entry_price
+    state[2] = entry_idx
+    state[3] = cooldown
+    state[4] = stop_price
+    state[5] = take_price_1
+    state[6] = take_price_2
+    state[7] = 1.0 if took_tp1 else 0.0
+    state[8] = bars_in_position
+
+    return (count, out_entry_idx, out_exit_idx, out_side, out_entry, out_exit,
+            out_return, out_reason, out_stop, out_tp1, out_tp2)
+
+
+_simulate_core_jit = njit(cache=True)(_simulate_core) if njit is not None else None
+
+
+def jit_available():
+    """True si numba est installé."""
+    return _simulate_core_jit is not None
+
+
+def resolve_levels(direction, open_, atr, stop_loss, take_profit_1, take_profit_2,
+                   slippage_bps, use_atr=True, atr_mult_sl=1.5, atr_mult_tp=2.5,
+                   sl_pct=0.01, tp_pct=0.02):
+    """
+    Complète les stops/TP absents (NaN) des bougies à signal comme le faisait
+    compute_trades : stop/TP ATR depuis le prix d'entrée si use_atr et atr
+    fourni, sinon en %. Le niveau de la ligne i s'applique à une entrée à
+    l'ouverture de i + 1.
+
+    direction/stop/TP peuvent être des matrices (jeux de paramètres, bougies) :
+    open_ et atr (1D) sont alors diffusés sur chaque ligne.
+    """
+    stop_loss = np.array(stop_loss, dtype=np.float64)
+    take_profit_1 = np.array(take_profit_1, dtype=np.float64)
+    take_profit_2 = np.array(take_profit_2, dtype=np.float64)
+
+    has_signal = np.asarray(direction) != 0
+    has_signal[..., -1] = False  # pas de bougie suivante pour entrer
+    missing_stop = has_signal & np.isnan(stop_loss)
+    missing_tp = has_signal & (np.isnan(take_profit_1) | np.isnan(take_profit_2))
+    if not (missing_stop.any() or missing_tp.any()):
+        return stop_loss, take_profit_1, take_profit_2
+
+    n = np.shape(direction)[-1]
+    next_open = np.broadcast_to(np.append(open_[1:], np.nan), np.shape(direction))
+    is_buy = np.asarray(direction) == 1
+    entry = np.where(is_buy, next_open * (1 + slippage_bps), next_open * (1 - slippage_bps))
+
+    if use_atr and atr is not None:
+        atr_now = np.broadcast_to(atr[:n], np.shape(direction))
+        fallback_stop = np.where(is_buy, entry - atr_mult_sl * atr_now, entry + atr_mult_sl * atr_now)
+        fallback_tp = np.where(is_buy, entry + atr_mult_tp * atr_now, entry - atr_mult_tp * atr_now)
+    else:
+        fallback_stop = np.where(is_buy, entry * (1 - sl_pct), entry * (1 + sl_pct))
+        fallback_tp = np.where(is_buy, entry * (1 + tp_pct), entry * (1 - tp_pct))
+
+    stop_loss[missing_stop] = fallback_stop[missing_stop]
+    take_profit_1[missing_tp] = fallback_tp[missing_tp]
+    take_profit_2[missing_tp] = fallback_tp[missing_tp]
+    return stop_loss, take_profit_1, take_profit_2
+
+
+def _resolve_core(use_jit):
+    if use_jit is None:
+        use_jit = os.getenv('BACKTEST_JIT', 'true').lower() == 'true'
+    return _simulate_core_jit if (use_jit and _simulate_core_jit is not None) else _simulate_core
+
+
+def _to_trades(result):
+    count = result[0]
+    trades = np.empty(count, dtype=TRADE_DTYPE)
+    for name, values in zip(TRADE_DTYPE.names, result[1:]):
+        trades[name] = values[:count]
+    return trades
+
+
+class ChunkedSimulation:
+    """
+    Simulation reprenable tranche par tranche (ordre chronologique).
+
+    Les tableaux de signaux/niveaux (attributs direction, stop_loss,
+    take_profit_1, take_profit_2) peuvent être remplis au fur et à mesure :
+    advance(stop) ne lit que les lignes [position courante, stop).
+    L'enchaînement des tranches donne exactement les mêmes trades que
+    simulate_trades sur tout l'historique.
+    """
+
+    def __init__(self, open_, high, low, close, direction, stop_loss, take_profit_1, take_profit_2,
+                 warmup=220, fee_rate=0.0004, slippage_bps=0.0002, cooldown_bars=3,
+                 cooldown_bars_sl=3, time_stop_bars=48, long_only=True, use_jit=None):
+        self.open = np.ascontiguousarray(open_, dtype=np.float64)
+        self.high = np.ascontiguousarray(high, dtype=np.float64)
+        self.low = np.ascontiguousarray(low, dtype=np.float64)
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.direction = np.ascontiguousarray(direction, dtype=np.int8)
+        self.stop_loss = np.ascontiguousarray(stop_loss, dtype=np.float64)
+        self.take_profit_1 = np.ascontiguousarray(take_profit_1, dtype=np.float64)
+        self.take_profit_2 = np.ascontiguousarray(take_profit_2, dtype=np.float64)
+        self.settings = (int(warmup), float(fee_rate), float(slippage_bps), int(cooldown_bars),
+                         int(cooldown_bars_sl), int(time_stop_bars), bool(long_only))
+        self.state = new_state()
+        self.bar = 0
+        self._core = _resolve_core(use_jit)
+
+    @property
+    def last_bar(self):
+        """Dernière bougie de décision (la bougie suivante sert à l'exécution)."""
+        return max(len(self.close) - 1, 0)
+
+    @property
+    def done(self):
+        return self.bar >= self.last_bar
+
+    def advance(self, stop):
+        """
+        Simule jusqu'à la bougie `stop` (exclue) et retourne les trades
+        clôturés dans la tranche (TRADE_DTYPE). Atteindre la dernière bougie
+        clôture la position restante (EOD).
+        """
+        stop = min(int(stop), self.last_bar)
+        finalize = stop >= self.last_bar and not self.done
+        result = self._core(
+            self.open, self.high, self.low, self.close, self.direction,
+            self.stop_loss, self.take_profit_1, self.take_profit_2,
+            *self.settings, self.bar, stop, self.state, finalize
+        )
+        self.bar = max(self.bar, stop)
+        return _to_trades(result)
+
+
+def simulate_trades(open_, high, low, close, direction, stop_loss, take_profit_1, take_profit_2,
+                    warmup=220, fee_rate=0.0004, slippage_bps=0.0002, cooldown_bars=3,
+                    cooldown_bars_sl=3, time_stop_bars=48, long_only=True, use_jit=None):
+    """
+    Simule les trades à partir de tableaux NumPy (signaux et niveaux précalculés).
+
+    direction : 1 (BUY), -1 (SELL), 0 (NEUTRAL) par bougie.
+    use_jit : None = numba si disponible (désactivable via BACKTEST_JIT=false).
+
+    Retourne un tableau structuré TRADE_DTYPE.
+    """
+    simulation = ChunkedSimulation(
+        open_, high, low, close, direction, stop_loss, take_profit_1, take_profit_2,
+        warmup=warmup, fee_rate=fee_rate, slippage_bps=slippage_bps, cooldown_bars=cooldown_bars,
+        cooldown_bars_sl=cooldown_bars_sl, time_stop_bars=time_stop_bars, long_only=long_only,
+        use_jit=use_jit
+    )
+    return simulation.advance(simulation.last_bar)
+
+
+def trades_to_frame(trades, index):
+    """Convertit le tableau TRADE_DTYPE au format DataFrame historique de compute_trades."""
+    columns = ['timestamp', 'signal', 'entry', 'exit', 'return', 'prediction_correct',
+               'exit_reason', 'entry_time', 'stop', 'tp1', 'tp2']
+    if len(trades) == 0:
+        return pd.DataFrame(columns=columns)
+
+    return pd.DataFrame({
+        'timestamp': index[trades['exit_idx']],
+        'signal': np.where(trades['side'] == 1, 'BUY', 'SELL').astype(object),
+        'entry': trades['entry'],
+        'exit': trades['exit'],
+        'return': trades['return'],
+        'prediction_correct': trades['return'] > 0,
+        'exit_reason': EXIT_REASONS[trades['exit_reason']],
+        'entry_time': index[trades['entry_idx']],
+        'stop': trades['stop'],
+        'tp1': trades['tp1'],
+        'tp2': trades['tp2'],
+    }, columns=columns)
@@ -3,22 +3,177 @@ Gestionnaire d'état pour éviter les signaux dupliqués
 """
 import json
 import os
+import sqlite3
+import threading
 from datetime import datetime
 
+
+class StateStore:
+    """
+    État des signaux en SQLite (WAL), partagé par tous les symboles d'un
+    process et par des runs concurrents :
+
+    - `signal_state` : dernier signal par (exchange, symbole, timeframe, stratégie) ;
+    - `signal_history` : historique en ajout seul de chaque signal enregistré.
+
+    Chaque mise à jour (état + historique) est une seule transaction.
+    """
+
+    def __init__(self, path='data/state.db'):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS signal_state (
+                exchange TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                strategy TEXT NOT NULL,
+                last_signal TEXT,
+                last_signal_time TEXT,
+                last_price REAL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (exchange, symbol, timeframe, strategy)
+            );
+            CREATE TABLE IF NOT EXISTS signal_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                exchange TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                strategy TEXT NOT NULL,
+                signal TEXT NOT NULL,
+                price REAL,
+                signal_time TEXT NOT NULL,
+                source TEXT NOT NULL DEFAULT 'live'
+            );
+            CREATE INDEX IF NOT EXISTS signal_history_key
+                ON signal_history (exchange, symbol, timeframe, strategy, signal_time);
+            CREATE INDEX IF NOT EXISTS signal_history_time ON signal_history (signal_time);
+            CREATE TABLE IF NOT EXISTS json_imports (
+                state_file TEXT PRIMARY KEY,
+                imported_at TEXT NOT NULL
+            );
+        ''')
+
+    def get(self, key):
+        """État de la clé (exchange, symbol, timeframe, strategy) ; None si inconnue."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT last_signal, last_signal_time, last_price FROM signal_state '
+                'WHERE exchange = ? AND symbol = ? AND timeframe = ? AND strategy = ?', key
+            ).fetchone()
+        if row is None:
+            return None
+        return {'last_signal': row[0], 'last_signal_time': row[1], 'last_price': row[2]}
+
+    def record(self, key, signal, price, signal_time=None, source='live'):
+        """Enregistre le signal : état de la clé et ligne d'historique, atomiquement."""
+        signal_time = signal_time or datetime.now().isoformat()
+        price = None if price is None else float(price)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute(
+                    'INSERT INTO signal_state (exchange, symbol, timeframe, strategy, last_signal, '
+                    'last_signal_time, last_price, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (exchange, symbol, timeframe, strategy) DO UPDATE SET '
+                    'last_signal = excluded.last_signal, last_signal_time = excluded.last_signal_time, '
+                    'last_price = excluded.last_price, updated_at = excluded.updated_at',
+                    (*key, signal, signal_time, price, datetime.now().isoformat())
+                )
+                self._conn.execute(
+                    'INSERT INTO signal_history (exchange, symbol, timeframe, strategy, signal, price, '
+                    'signal_time, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (*key, signal, price, signal_time, source)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def history(self, exchange=None, symbol=None, timeframe=None, strategy=None, since=None, limit=None):
+        """Signaux enregistrés (les plus récents d'abord), filtrés sur les critères fournis."""
+        clauses, values = [], []
+        for column, value in (('exchange', exchange), ('symbol', symbol),
+                              ('timeframe', timeframe), ('strategy', strategy)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                values.append(value)
+        if since is not None:
+            clauses.append('signal_time >= ?')
+            values.append(since.isoformat() if isinstance(since, datetime) else since)
+        query = 'SELECT exchange, symbol, timeframe, strategy, signal, price, signal_time, source FROM signal_history'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY signal_time DESC, id DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            values.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(query, values).fetchall()
+        columns = ('exchange', 'symbol', 'timeframe', 'strategy', 'signal', 'price', 'signal_time', 'source')
+        return [dict(zip(columns, row)) for row in rows]
+
+    def migrate_json(self, state_file, key):
+        """
+        Importe un ancien state.json pour cette clé si elle est encore vide
+        (une seule fois par fichier). Retourne True si un signal a été importé.
+        """
+        if not state_file or not os.path.exists(state_file):
+            return False
+        source = os.path.abspath(state_file)
+        with self._lock:
+            imported = self._conn.execute('SELECT 1 FROM json_imports WHERE state_file = ?', (source,)).fetchone()
+            if imported is None:
+                self._conn.execute('INSERT INTO json_imports VALUES (?, ?)', (source, datetime.now().isoformat()))
+        if imported is not None or self.get(key) is not None:
+            return False
+        try:
+            with open(state_file, 'r') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not legacy.get('last_signal'):
+            return False
+        self.record(key, legacy['last_signal'], legacy.get('last_price'),
+                    legacy.get('last_signal_time'), source='json')
+        print(f"📦 État importé depuis {state_file} ({legacy['last_signal']})")
+        return True
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
 class StateManager:
-    def __init__(self, state_file='state.json'):
-        self.state_file = state_file
-        self.state = self.load_state()
+    """
+    État anti-doublon d'un couple exchange/symbole/timeframe/stratégie,
+    stocké dans un StateStore (STATE_DB_PATH, partageable entre symboles).
+    legacy_file : ancien fichier JSON importé au premier passage.
+    """
+
+    def __init__(self, exchange=None, symbol=None, timeframe=None, strategy='improved',
+                 store=None, legacy_file='state.json'):
+        self.key = (
+            exchange or os.getenv('EXCHANGE', 'kraken'),
+            symbol or os.getenv('SYMBOL', 'BTC/USDT'),
+            timeframe or os.getenv('TIMEFRAME', '1h'),
+            strategy,
+        )
+        self.store = store or StateStore(os.getenv('STATE_DB_PATH', 'data/state.db'))
+        self.store.migrate_json(legacy_file, self.key)
+
+    @property
+    def state(self):
+        return self.load_state()
 
     def load_state(self):
         """Charge l'état précédent"""
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return self._get_default_state()
-        return self._get_default_state()
+        return self.store.get(self.key) or self._get_default_state()
 
     def _get_default_state(self):
         """État par défaut"""
@@ -28,17 +183,12 @@ class StateManager:
             'last_price': None
         }
 
-    def save_state(self):
-        """Sauvegarde l'état"""
-        with open(self.state_file, 'w') as f:
-            json.dump(self.state, f, indent=2)
-
     def should_send_signal(self, new_signal):
         """
         Détermine si on doit envoyer le signal
         Retourne True seulement si le signal a CHANGÉ
         """
-        last_signal = self.state.get('last_signal')
+        last_signal = self.get_last_signal()
 
         # Cas 1 : Premier signal
         if last_signal is None:
@@ -52,12 +202,14 @@ class StateManager:
         return False
 
     def update_signal(self, signal, price):
-        """Met à jour l'état après envoi d'un signal"""
-        self.state['last_signal'] = signal
-        self.state['last_signal_time'] = datetime.now().isoformat()
-        self.state['last_price'] = price
-        self.save_state()
+        """Met à jour l'état après envoi d'un signal (et l'ajoute à l'historique)"""
+        self.store.record(self.key, signal, price)
 
     def get_last_signal(self):
         """Récupère le dernier signal envoyé"""
-        return self.state.get('last_signal')
\ No newline at end of file
+        return self.load_state().get('last_signal')
+
+    def history(self, limit=None):
+        """Historique des signaux de cette clé (les plus récents d'abord)"""
+        exchange, symbol, timeframe, strategy = self.key
+        return self.store.history(exchange, symbol, timeframe, strategy, limit=limit)
@@ -178,8 +178,36 @@ PERFORMANCE ATTENDUE :
 - Max drawdown : 15-25%
 """
 from dataclasses import dataclass
-import os
 import numpy as np
+import pandas as pd
+
+from src.params import StrategyParams
+
+
+# Codes de raison (communs à generate_signal et generate_signals)
+REASON_INSUFFICIENT_DATA = 0
+REASON_LOW_VOLUME = 1
+REASON_CHOPPY = 2
+REASON_LOW_VOLATILITY = 3
+REASON_EXTREME_VOLATILITY = 4
+REASON_NO_TREND = 5
+REASON_BUY = 6
+REASON_SELL = 7
+REASON_NO_TRIGGER = 8
+
+REASON_LABELS = {
+    REASON_INSUFFICIENT_DATA: "Données insuffisantes",
+    REASON_LOW_VOLUME: "Volume trop faible",
+    REASON_CHOPPY: "Marché en range",
+    REASON_LOW_VOLATILITY: "Volatilité trop faible",
+    REASON_EXTREME_VOLATILITY: "Volatilité extrême",
+    REASON_NO_TREND: "Pas de tendance claire",
+    REASON_BUY: "Signal BUY",
+    REASON_SELL: "Signal SELL",
+    REASON_NO_TRIGGER: "Conditions incomplètes",
+}
+
+MIN_BARS = 220
 
 
 @dataclass
@@ -190,6 +218,7 @@ class StrategySignal:
     stop_loss: float = None
     take_profit_1: float = None
     take_profit_2: float = None
+    reason_code: int = None
 
 
 class ImprovedStrategy:
@@ -206,16 +235,25 @@ class ImprovedStrategy:
     
     SHORT : inverse
     """
-    
+
+    # Colonnes d'indicateurs lues par generate_signal / generate_signals
+    REQUIRED_COLUMNS = ('ema_50', 'ema_200', 'ema_200_slope', 'sma_200_1d', 'rsi', 'macd_hist',
+                        'atr', 'atr_pct', 'atr_ma', 'volume_ratio', 'chop')
+
     @staticmethod
-    def generate_signal(df):
-        """Génère signal BUY/SELL/NEUTRAL."""
+    def generate_signal(df, params=None):
+        """
+        Génère signal BUY/SELL/NEUTRAL.
+
+        params : StrategyParams (lu depuis l'environnement si absent).
+        """
         
-        if df is None or len(df) < 220:
+        if df is None or len(df) < MIN_BARS:
             return StrategySignal(
                 signal="NEUTRAL",
                 reason="Données insuffisantes (< 220 bougies)",
-                context={}
+                context={},
+                reason_code=REASON_INSUFFICIENT_DATA
             )
         
         # Dernières bougies
@@ -225,21 +263,24 @@ class ImprovedStrategy:
         # PARAMÈTRES (valeurs par défaut OPTIMISÉES)
         # ═══════════════════════════════════════════════════════════
         
+        if params is None:
+            params = StrategyParams.from_env()
+
         # Filtres macro
-        vol_min = float(os.getenv('VOLUME_RATIO_MIN', '0.5'))        # 0.5x vs 0.95x
-        vol_spike = float(os.getenv('VOLUME_SPIKE_MIN', '1.1'))      # 1.1x vs 1.4x
-        chop_max = float(os.getenv('CHOP_NO_TRADE_MAX', '65'))       # 65 vs 48
-        atr_min_pct = float(os.getenv('ATR_PCT_MIN', '0.002'))       # 0.2% vs 0.65%
-        atr_max_mult = float(os.getenv('ATR_EXTREME_MULT', '3.0'))
-        
+        vol_min = params.volume_ratio_min
+        vol_spike = params.volume_spike_min
+        chop_max = params.chop_no_trade_max
+        atr_min_pct = params.atr_pct_min
+        atr_max_mult = params.atr_extreme_mult
+
         # RSI (zone LARGE)
-        rsi_min = float(os.getenv('RSI_MIN', '35'))                  # 35 vs 48
-        rsi_max = float(os.getenv('RSI_MAX', '65'))                  # 65 vs 52
-        
+        rsi_min = params.rsi_min
+        rsi_max = params.rsi_max
+
         # Stops & TPs
-        atr_stop_mult = float(os.getenv('ATR_STOP_MULT', '2.0'))     # 2.0 vs 0.95
-        tp1_mult = float(os.getenv('TP1_MULT', '1.5'))
-        tp2_mult = float(os.getenv('TP2_MULT', '3.0'))
+        atr_stop_mult = params.atr_stop_mult
+        tp1_mult = params.tp1_mult
+        tp2_mult = params.tp2_mult
         
         # ═══════════════════════════════════════════════════════════
         # EXTRACTION INDICATEURS
@@ -272,7 +313,8 @@ class ImprovedStrategy:
             return StrategySignal(
                 signal="NEUTRAL",
                 reason=f"Volume trop faible ({volume_ratio:.2f}x < {vol_min}x)",
-                context={"volume_ratio": volume_ratio}
+                context={"volume_ratio": volume_ratio},
+                reason_code=REASON_LOW_VOLUME
             )
         
         # Marché choppy
@@ -280,7 +322,8 @@ class ImprovedStrategy:
             return StrategySignal(
                 signal="NEUTRAL",
                 reason=f"Marché en range (CHOP {chop:.1f} > {chop_max})",
-                context={"chop": chop}
+                context={"chop": chop},
+                reason_code=REASON_CHOPPY
             )
         
         # Volatilité trop faible
@@ -288,7 +331,8 @@ class ImprovedStrategy:
             return StrategySignal(
                 signal="NEUTRAL",
                 reason=f"Volatilité trop faible (ATR {atr_pct*100:.2f}% < {atr_min_pct*100:.2f}%)",
-                context={"atr_pct": atr_pct}
+                context={"atr_pct": atr_pct},
+                reason_code=REASON_LOW_VOLATILITY
             )
         
         # Volatilité extrême
@@ -296,7 +340,8 @@ class ImprovedStrategy:
             return StrategySignal(
                 signal="NEUTRAL",
                 reason=f"Volatilité extrême (ATR > {atr_max_mult}x moyenne)",
-                context={"atr": atr, "atr_ma": atr_ma}
+                context={"atr": atr, "atr_ma": atr_ma},
+                reason_code=REASON_EXTREME_VOLATILITY
             )
         
         # ═══════════════════════════════════════════════════════════
@@ -328,7 +373,8 @@ class ImprovedStrategy:
                     "close": close,
                     "ema_200": ema_200,
                     "ema_200_slope": ema_200_slope
-                }
+                },
+                reason_code=REASON_NO_TREND
             )
         
         # ═══════════════════════════════════════════════════════════
@@ -396,7 +442,8 @@ class ImprovedStrategy:
                 },
                 stop_loss=stop_loss,
                 take_profit_1=tp1,
-                take_profit_2=tp2
+                take_profit_2=tp2,
+                reason_code=REASON_BUY
             )
         
         # ═══════════════════════════════════════════════════════════
@@ -437,7 +484,8 @@ class ImprovedStrategy:
                 },
                 stop_loss=stop_loss,
                 take_profit_1=tp1,
-                take_profit_2=tp2
+                take_profit_2=tp2,
+                reason_code=REASON_SELL
             )
         
         # ═══════════════════════════════════════════════════════════
@@ -471,5 +519,147 @@ class ImprovedStrategy:
                 "rsi": rsi,
                 "macd_hist": macd_hist,
                 "volume_ratio": volume_ratio
-            }
-        )
\ No newline at end of file
+            },
+            reason_code=REASON_NO_TRIGGER
+        )
+    # ═══════════════════════════════════════════════════════════
+    # VERSION VECTORISÉE (backtest / optimisation)
+    # ═══════════════════════════════════════════════════════════
+
+    @staticmethod
+    def _closed_bar_arrays(df):
+        """
+        Colonnes utilisées par la stratégie, décalées d'une bougie :
+        la ligne i contient les valeurs de la bougie clôturée i - 1
+        (équivalent de df.iloc[-2] sur df.iloc[:i + 1]).
+        """
+        def shifted(values):
+            out = np.empty(len(values), dtype=np.float64)
+            out[:1] = np.nan
+            out[1:] = values[:-1]
+            return out
+
+        def column(name, default=None):
+            if name in df.columns:
+                return df[name].to_numpy(dtype=np.float64)
+            return default
+
+        atr = column('atr')
+        arrays = {
+            name: shifted(column(name))
+            for name in ('close', 'ema_50', 'ema_200', 'ema_200_slope', 'rsi',
+                         'macd_hist', 'atr', 'atr_pct', 'volume_ratio', 'chop')
+        }
+        arrays['sma_200_1d'] = shifted(column('sma_200_1d', np.full(len(df), np.nan)))
+        arrays['atr_ma'] = shifted(column('atr_ma', atr))
+
+        # Swing low/high sur les 9 bougies clôturées (df.iloc[-10:-1])
+        arrays['recent_low'] = shifted(df['low'].rolling(9, min_periods=1).min().to_numpy(dtype=np.float64))
+        arrays['recent_high'] = shifted(df['high'].rolling(9, min_periods=1).max().to_numpy(dtype=np.float64))
+        return arrays
+
+    @staticmethod
+    def _evaluate_signals(a, p, with_reasons=True):
+        """
+        Applique les 4 couches de filtres sur des tableaux NumPy.
+
+        `a` : tableaux de _closed_bar_arrays, `p` : StrategyParams.
+        Les seuils peuvent être des scalaires ou des colonnes (N, 1) :
+        le broadcasting donne alors une matrice (N, bougies).
+
+        Retourne (direction, reason_code, stop_loss, tp1, tp2) où
+        direction vaut 1 (BUY), -1 (SELL) ou 0 (NEUTRAL). reason_code vaut
+        None si with_reasons=False (optimisation : évite le np.select).
+        """
+        close = a['close']
+        atr = a['atr']
+        sma_200_1d = a['sma_200_1d']
+        rsi = a['rsi']
+        macd_hist = a['macd_hist']
+        volume_ratio = a['volume_ratio']
+
+        # Couche 1 : filtres macro (même ordre que generate_signal)
+        low_volume = volume_ratio < p.volume_ratio_min
+        choppy = a['chop'] > p.chop_no_trade_max
+        low_volatility = a['atr_pct'] < p.atr_pct_min
+        extreme_volatility = atr > p.atr_extreme_mult * a['atr_ma']
+
+        # Couche 2 : tendance
+        no_htf = np.isnan(sma_200_1d)
+        trend_bullish = (close > a['ema_200']) & (a['ema_200_slope'] > 0) & (no_htf | (close > sma_200_1d))
+        trend_bearish = (close < a['ema_200']) & (a['ema_200_slope'] < 0) & (no_htf | (close < sma_200_1d))
+
+        # Couche 3 : momentum
+        momentum_long = ((p.rsi_min < rsi) & (rsi < p.rsi_max)) | (macd_hist > 0)
+        momentum_short = ((100 - p.rsi_max < rsi) & (rsi < 100 - p.rsi_min)) | (macd_hist < 0)
+
+        # Couche 4 : confirmation
+        volume_confirm = volume_ratio > p.volume_spike_min
+        long_ok = trend_bullish & momentum_long & (close > a['ema_50']) & volume_confirm
+        short_ok = trend_bearish & momentum_short & (close < a['ema_50']) & volume_confirm
+
+        blocked = low_volume | choppy | low_volatility | extreme_volatility
+        is_long = long_ok & ~blocked
+        is_short = short_ok & ~blocked
+        direction = is_long.astype(np.int8) - is_short.astype(np.int8)
+
+        reason_code = None
+        if with_reasons:
+            reason_code = np.select(
+                [low_volume, choppy, low_volatility, extreme_volatility,
+                 ~(trend_bullish | trend_bearish), long_ok, short_ok],
+                [REASON_LOW_VOLUME, REASON_CHOPPY, REASON_LOW_VOLATILITY, REASON_EXTREME_VOLATILITY,
+                 REASON_NO_TREND, REASON_BUY, REASON_SELL],
+                default=REASON_NO_TRIGGER
+            ).astype(np.int8)
+
+        # Niveaux : reproduit min()/max() Python (le 1er argument gagne si NaN)
+        long_stop = close - p.atr_stop_mult * atr
+        long_stop = np.where(long_stop < a['recent_low'], long_stop, a['recent_low'])
+        short_stop = close + p.atr_stop_mult * atr
+        short_stop = np.where(short_stop > a['recent_high'], short_stop, a['recent_high'])
+
+        stop_loss = np.where(is_long, long_stop, np.where(is_short, short_stop, np.nan))
+        tp1 = np.where(is_long, close + p.tp1_mult * atr,
+                       np.where(is_short, close - p.tp1_mult * atr, np.nan))
+        tp2 = np.where(is_long, close + p.tp2_mult * atr,
+                       np.where(is_short, close - p.tp2_mult * atr, np.nan))
+
+        return direction, reason_code, stop_loss, tp1, tp2
+
+    @staticmethod
+    def generate_signals(df, params=None):
+        """
+        Génère les signaux de TOUTES les bougies en une seule passe NumPy.
+
+        La ligne i est identique à generate_signal(df.iloc[:i + 1]) : même
+        signal, mêmes stop/TP, même code de raison (REASON_*).
+
+        Retourne un DataFrame (même index que df) avec les colonnes
+        signal, direction, reason_code, stop_loss, take_profit_1, take_profit_2.
+        """
+        if params is None:
+            params = StrategyParams.from_env()
+
+        n = len(df)
+        arrays = ImprovedStrategy._closed_bar_arrays(df)
+        direction, reason_code, stop_loss, tp1, tp2 = ImprovedStrategy._evaluate_signals(arrays, params)
+
+        # Historique insuffisant : len(df.iloc[:i + 1]) < MIN_BARS
+        warmup = min(MIN_BARS - 1, n)
+        direction[:warmup] = 0
+        reason_code[:warmup] = REASON_INSUFFICIENT_DATA
+        stop_loss[:warmup] = np.nan
+        tp1[:warmup] = np.nan
+        tp2[:warmup] = np.nan
+
+        signal = np.array(['NEUTRAL', 'BUY', 'SELL'], dtype=object)[direction]
+
+        return pd.DataFrame({
+            'signal': signal,
+            'direction': direction,
+            'reason_code': reason_code,
+            'stop_loss': stop_loss,
+            'take_profit_1': tp1,
+            'take_profit_2': tp2,
+        }, index=df.index)
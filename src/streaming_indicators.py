@@ -0,0 +1,522 @@
+"""
+Indicateurs en flux : mise à jour en O(1) à chaque bougie clôturée,
+avec un état persistable (mêmes colonnes que TechnicalIndicators.add_all_indicators)
+"""
+import math
+import pickle
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+
+from src.htf_aggregator import HTFAggregator
+
+
+NAN = float('nan')
+
+STATE_VERSION = 2
+
+
+def _div(a, b):
+    """Division flottante IEEE (comme pandas/NumPy) : x/0 = ±inf, 0/0 = NaN."""
+    if b == 0:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class _Ewm:
+    """Récurrence de ewm(span, adjust=False).mean() (NaN compris, ignore_na=False)."""
+
+    __slots__ = ('alpha', 'value', 'old_wt')
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = NAN
+        self.old_wt = 1.0
+
+    def _next(self, x):
+        value, old_wt = self.value, self.old_wt
+        if value == value:
+            old_wt *= 1.0 - self.alpha
+            if x == x:
+                if value != x:
+                    value = (old_wt * value + self.alpha * x) / (old_wt + self.alpha)
+                old_wt = 1.0
+        elif x == x:
+            value = x
+        return value, old_wt
+
+    def update(self, x):
+        self.value, self.old_wt = self._next(x)
+        return self.value
+
+    def peek(self, x):
+        """Valeur qu'aurait la moyenne avec x, sans modifier l'état."""
+        return self._next(x)[0]
+
+
+class _RollingSum:
+    """
+    Somme/moyenne glissante sur `window` valeurs (min_periods = window),
+    sommes compensées (Kahan) comme les fenêtres glissantes de pandas.
+    """
+
+    __slots__ = ('window', 'values', 'total', 'comp_add', 'comp_remove', 'nobs', 'same_value', 'same_run')
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.nobs = 0
+        self.same_value = NAN
+        self.same_run = 0
+
+    def update(self, x):
+        self.values.append(x)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.comp_remove
+                t = self.total + y
+                self.comp_remove = t - self.total - y
+                self.total = t
+        if x == x:
+            self.nobs += 1
+            y = x - self.comp_add
+            t = self.total + y
+            self.comp_add = t - self.total - y
+            self.total = t
+            if x == self.same_value:
+                self.same_run += 1
+            else:
+                self.same_value = x
+                self.same_run = 1
+        else:
+            self.same_run = 0
+            self.same_value = NAN
+        if self.nobs == 0:
+            self.total = 0.0
+            self.comp_add = self.comp_remove = 0.0
+
+    @property
+    def ready(self):
+        return self.nobs >= self.window
+
+    def sum(self):
+        if not self.ready:
+            return NAN
+        if self.same_run >= self.nobs:
+            return self.same_value * self.nobs
+        return self.total
+
+    def mean(self):
+        if not self.ready:
+            return NAN
+        if self.same_run >= self.nobs:
+            return self.same_value
+        return self.total / self.nobs
+
+
+class _RollingVar:
+    """Écart-type glissant (ddof=1) par ajout/retrait de Welford."""
+
+    __slots__ = ('window', 'values', 'nobs', 'mean', 'ssqdm', 'same_value', 'same_run')
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.mean = 0.0
+        self.ssqdm = 0.0
+        self.same_value = NAN
+        self.same_run = 0
+
+    def update(self, x):
+        self.values.append(x)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                if self.nobs:
+                    delta = old - self.mean
+                    self.mean -= delta / self.nobs
+                    self.ssqdm -= ((self.nobs + 1) * delta * delta) / self.nobs
+                else:
+                    self.mean = self.ssqdm = 0.0
+        if x == x:
+            self.nobs += 1
+            delta = x - self.mean
+            self.mean += delta / self.nobs
+            self.ssqdm += ((self.nobs - 1) * delta * delta) / self.nobs
+            if x == self.same_value:
+                self.same_run += 1
+            else:
+                self.same_value = x
+                self.same_run = 1
+        else:
+            self.same_run = 0
+            self.same_value = NAN
+
+    def std(self):
+        if self.nobs < self.window or self.nobs < 2:
+            return NAN
+        if self.same_run >= self.nobs:
+            return 0.0
+        return math.sqrt(max(self.ssqdm / (self.nobs - 1), 0.0))
+
+
+class _RollingExtreme:
+    """Max (ou min) glissant par deque monotone : O(1) amorti par bougie."""
+
+    __slots__ = ('window', 'is_max', 'queue', 'count')
+
+    def __init__(self, window, is_max=True):
+        self.window = window
+        self.is_max = is_max
+        self.queue = deque()  # (indice, valeur), valeurs monotones
+        self.count = 0
+
+    def update(self, x):
+        i = self.count
+        self.count += 1
+        queue = self.queue
+        if self.is_max:
+            while queue and queue[-1][1] <= x:
+                queue.pop()
+        else:
+            while queue and queue[-1][1] >= x:
+                queue.pop()
+        queue.append((i, x))
+        while queue[0][0] <= i - self.window:
+            queue.popleft()
+
+    def value(self):
+        if self.count < self.window:
+            return NAN
+        return self.queue[0][1]
+
+
+class _Lag:
+    """Valeur d'il y a `lag` bougies (pour diff(lag) / shift(lag))."""
+
+    __slots__ = ('values',)
+
+    def __init__(self, lag):
+        self.values = deque([NAN] * lag, maxlen=lag + 1)
+
+    def update(self, x):
+        self.values.append(x)
+        return self.values[0]
+
+
+class StreamingIndicators:
+    """
+    Moteur d'indicateurs incrémental.
+
+    update() reçoit UNE bougie clôturée et met à jour chaque indicateur en
+    temps constant (récurrences EMA/MACD, sommes glissantes pour RSI/ATR/
+    volumes/Bollinger, deques monotones pour CHOP et support/résistance).
+
+    Les colonnes causales sont identiques (à la tolérance flottante près) à
+    add_all_indicators sur tout l'historique, EMA 4h / SMA 1j comprises (bougies
+    HTF terminées, construites par HTFAggregator et préchauffables avec
+    seed_htf()). La structure (rolling(center=True) en batch) prend la valeur
+    que donnerait add_all_indicators sur l'historique arrêté à cette bougie,
+    c'est-à-dire ce que voit le bot live.
+
+    timeframe : durée des bougies ('1h') ; un bloc HTF est terminé par la
+    bougie dont la clôture atteint sa fin.
+
+    L'état complet se sauvegarde avec save()/load() ; `history` lignes de
+    sortie sont gardées pour reconstruire un DataFrame (frame()).
+    """
+
+    COLUMNS = (
+        'open', 'high', 'low', 'close', 'volume', 'ema_20', 'ema_50', 'ema_200', 'ema_200_slope',
+        'ema_50_slope', 'ema_200_slope_10', 'ema_50_slope_10', 'rsi', 'rsi_delta', 'volume_sma_20',
+        'chop', 'atr', 'atr_ma', 'support', 'resistance', 'trend', 'macd', 'macd_signal', 'macd_hist',
+        'date', 'vwap', 'swing_high', 'swing_low', 'hh', 'hl', 'lh', 'll', 'structure', 'bb_mid',
+        'bb_std', 'bb_upper', 'bb_lower', 'bb_width', 'bb_width_ma', 'bb_squeeze', 'ema_gap',
+        'volume_ratio', 'atr_pct', 'atr_pct_sma_20', 'ema_200_4h', 'ema_200_4h_slope', 'sma_200_1d',
+    )
+
+    def __init__(self, chop_period=14, sr_lookback=50, atr_period=14, structure_lookback=20, history=300,
+                 timeframe=None):
+        self.chop_period = chop_period
+        self.count = 0
+        self.last_timestamp = None
+        self.rows = deque(maxlen=history)
+
+        self._ema_20 = _Ewm(20)
+        self._ema_50 = _Ewm(50)
+        self._ema_200 = _Ewm(200)
+        self._ema_12 = _Ewm(12)
+        self._ema_26 = _Ewm(26)
+        self._macd_signal = _Ewm(9)
+        self._ema_200_lag = _Lag(1)
+        self._ema_50_lag = _Lag(1)
+        self._ema_200_lag_10 = _Lag(10)
+        self._ema_50_lag_10 = _Lag(10)
+        self._rsi_lag = _Lag(1)
+        self._prev_close = NAN
+
+        self._gain = _RollingSum(14)
+        self._loss = _RollingSum(14)
+        self._volume = _RollingSum(20)
+        self._tr_chop = _RollingSum(chop_period)
+        self._tr_atr = _RollingSum(atr_period)
+        self._atr_ma = _RollingSum(20)
+        self._atr_pct = _RollingSum(20)
+        self._high_chop = _RollingExtreme(chop_period, is_max=True)
+        self._low_chop = _RollingExtreme(chop_period, is_max=False)
+        self._support = _RollingExtreme(sr_lookback, is_max=False)
+        self._resistance = _RollingExtreme(sr_lookback, is_max=True)
+
+        # VWAP journalier
+        self._vwap_date = None
+        self._cum_pv = 0.0
+        self._cum_vol = 0.0
+
+        # Structure (rolling centré : la ligne c est connue à la bougie c + lookback // 2 - 1)
+        self._swing_high = _RollingExtreme(structure_lookback, is_max=True)
+        self._swing_low = _RollingExtreme(structure_lookback, is_max=False)
+        self._swing_high_lag = _Lag(structure_lookback)
+        self._swing_low_lag = _Lag(structure_lookback)
+        self._structure = 'NEUTRAL'
+
+        # Bollinger
+        self._bb_mid = _RollingSum(20)
+        self._bb_std = _RollingVar(20)
+        self._bb_width_ma = _RollingSum(50)
+
+        # EMA 200 en 4h et SMA 200 journalière sur les bougies HTF terminées
+        self._h4 = HTFAggregator('4h', delta=timeframe)
+        self._h4_ema = _Ewm(200)
+        self._h4_prev = NAN
+        self._d1 = HTFAggregator('1d', delta=timeframe)
+        self._d1_sma = _RollingSum(200)
+
+    def seed_htf(self, htf_seed):
+        """Bougies natives {'4h': DataFrame, '1d': DataFrame} de préchauffage (avant la première bougie)."""
+        for period, aggregator in (('4h', self._h4), ('1d', self._d1)):
+            if htf_seed.get(period) is not None:
+                aggregator.seed(htf_seed[period])
+
+    # ------------------------------------------------------------------
+    # Mise à jour
+    # ------------------------------------------------------------------
+    def _update_htf(self, timestamp, open_, high, low, close, volume):
+        for h4_close in self._h4.update(timestamp, open_, high, low, close, volume):
+            self._h4_ema.update(h4_close)
+        for d1_close in self._d1.update(timestamp, open_, high, low, close, volume):
+            self._d1_sma.update(d1_close)
+        ema_200_4h = self._h4_ema.value
+        slope = ema_200_4h - self._h4_prev
+        self._h4_prev = ema_200_4h
+        return ema_200_4h, slope, self._d1_sma.mean()
+
+    def update(self, timestamp, open_, high, low, close, volume):
+        """Ajoute une bougie clôturée et retourne sa ligne d'indicateurs (dict)."""
+        timestamp = pd.Timestamp(timestamp)
+        open_, high, low, close, volume = float(open_), float(high), float(low), float(close), float(volume)
+
+        ema_20 = self._ema_20.update(close)
+        ema_50 = self._ema_50.update(close)
+        ema_200 = self._ema_200.update(close)
+
+        # RSI (moyennes simples sur 14, comme calculate_rsi)
+        delta = close - self._prev_close
+        self._gain.update(delta if delta > 0 else 0.0)
+        self._loss.update(-delta if delta < 0 else -0.0)
+        rs = _div(self._gain.mean(), self._loss.mean())
+        rsi = 100 - _div(100.0, 1 + rs) if rs == rs else NAN
+
+        # True range, CHOP, ATR
+        prev_close = self._prev_close
+        if prev_close == prev_close:
+            true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        else:
+            true_range = high - low
+        self._tr_chop.update(true_range)
+        self._tr_atr.update(true_range)
+        self._high_chop.update(high)
+        self._low_chop.update(low)
+        atr_sum = self._tr_chop.sum()
+        price_range = self._high_chop.value() - self._low_chop.value()
+        ratio = _div(atr_sum, price_range)
+        if ratio == ratio and 0 < ratio < math.inf:
+            chop = 100 * math.log10(ratio) / math.log10(self.chop_period)
+        else:
+            chop = NAN
+        atr = self._tr_atr.mean()
+        self._atr_ma.update(atr)
+
+        support = self._support.value()
+        resistance = self._resistance.value()
+        self._support.update(low)
+        self._resistance.update(high)
+
+        ema_12 = self._ema_12.update(close)
+        ema_26 = self._ema_26.update(close)
+        macd = ema_12 - ema_26
+        macd_signal = self._macd_signal.update(macd)
+
+        # VWAP remis à zéro chaque jour
+        date = timestamp.normalize()
+        if date != self._vwap_date:
+            self._vwap_date = date
+            self._cum_pv = 0.0
+            self._cum_vol = 0.0
+        self._cum_pv += close * volume
+        self._cum_vol += volume
+        vwap = _div(self._cum_pv, self._cum_vol)
+
+        # Structure : le swing centré de la ligne count - 9 devient connu
+        self._swing_high.update(high)
+        self._swing_low.update(low)
+        swing_high = self._swing_high.value()
+        swing_low = self._swing_low.value()
+        prev_swing_high = self._swing_high_lag.update(swing_high)
+        prev_swing_low = self._swing_low_lag.update(swing_low)
+        hh, hl = swing_high > prev_swing_high, swing_low > prev_swing_low
+        lh, ll = swing_high < prev_swing_high, swing_low < prev_swing_low
+        if hh and hl:
+            self._structure = 'BULLISH'
+        elif lh and ll:
+            self._structure = 'BEARISH'
+
+        # Bollinger
+        self._bb_mid.update(close)
+        self._bb_std.update(close)
+        bb_mid = self._bb_mid.mean()
+        bb_std = self._bb_std.std()
+        bb_upper = bb_mid + 2 * bb_std
+        bb_lower = bb_mid - 2 * bb_std
+        bb_width = _div(bb_upper - bb_lower, bb_mid)
+        self._bb_width_ma.update(bb_width)
+        bb_width_ma = self._bb_width_ma.mean()
+
+        self._volume.update(volume)
+        volume_sma_20 = self._volume.mean()
+        atr_pct = _div(atr, close)
+        self._atr_pct.update(atr_pct)
+
+        ema_200_4h, ema_200_4h_slope, sma_200_1d = self._update_htf(timestamp, open_, high, low, close, volume)
+
+        rsi_prev = self._rsi_lag.update(rsi)
+
+        row = {
+            'open': open_,
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': volume,
+            'ema_20': ema_20,
+            'ema_50': ema_50,
+            'ema_200': ema_200,
+            'ema_200_slope': ema_200 - self._ema_200_lag.update(ema_200),
+            'ema_50_slope': ema_50 - self._ema_50_lag.update(ema_50),
+            'ema_200_slope_10': ema_200 - self._ema_200_lag_10.update(ema_200),
+            'ema_50_slope_10': ema_50 - self._ema_50_lag_10.update(ema_50),
+            'rsi': rsi,
+            'rsi_delta': rsi - rsi_prev,
+            'volume_sma_20': volume_sma_20,
+            'chop': chop,
+            'atr': atr,
+            'atr_ma': self._atr_ma.mean(),
+            'support': support,
+            'resistance': resistance,
+            'trend': 'BULLISH' if ema_20 > ema_50 else 'BEARISH',
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'macd_hist': macd - macd_signal,
+            'date': date,
+            'vwap': vwap,
+            # Colonnes centrées : inconnues sur la dernière bougie
+            'swing_high': NAN,
+            'swing_low': NAN,
+            'hh': False,
+            'hl': False,
+            'lh': False,
+            'll': False,
+            'structure': self._structure,
+            'bb_mid': bb_mid,
+            'bb_std': bb_std,
+            'bb_upper': bb_upper,
+            'bb_lower': bb_lower,
+            'bb_width': bb_width,
+            'bb_width_ma': bb_width_ma,
+            'bb_squeeze': bb_width < bb_width_ma * 0.7,
+            'ema_gap': _div(abs(ema_20 - ema_50), close),
+            'volume_ratio': _div(volume, volume_sma_20),
+            'atr_pct': atr_pct,
+            'atr_pct_sma_20': self._atr_pct.mean(),
+            'ema_200_4h': ema_200_4h,
+            'ema_200_4h_slope': ema_200_4h_slope,
+            'sma_200_1d': sma_200_1d,
+        }
+
+        self._prev_close = close
+        self.count += 1
+        self.last_timestamp = timestamp
+        self.rows.append((timestamp, row))
+        return row
+
+    def update_frame(self, df):
+        """Ajoute toutes les bougies d'un DataFrame OHLCV ; retourne les lignes d'indicateurs."""
+        rows = [
+            self.update(ts, o, h, l, c, v)
+            for ts, o, h, l, c, v in zip(df.index, df['open'].to_numpy(), df['high'].to_numpy(),
+                                         df['low'].to_numpy(), df['close'].to_numpy(), df['volume'].to_numpy())
+        ]
+        return pd.DataFrame(rows, index=df.index, columns=list(self.COLUMNS))
+
+    def update_new(self, df):
+        """
+        Ajoute seulement les bougies de df postérieures à last_timestamp.
+        Retourne le nombre de bougies ajoutées.
+        """
+        if self.last_timestamp is not None:
+            df = df[df.index > self.last_timestamp]
+        for ts, o, h, l, c, v in zip(df.index, df['open'].to_numpy(), df['high'].to_numpy(),
+                                     df['low'].to_numpy(), df['close'].to_numpy(), df['volume'].to_numpy()):
+            self.update(ts, o, h, l, c, v)
+        return len(df)
+
+    def frame(self):
+        """DataFrame des dernières lignes conservées (même format que add_all_indicators)."""
+        if not self.rows:
+            return pd.DataFrame(columns=list(self.COLUMNS))
+        index = pd.DatetimeIndex([ts for ts, _ in self.rows], name='timestamp')
+        return pd.DataFrame([row for _, row in self.rows], index=index, columns=list(self.COLUMNS))
+
+    # ------------------------------------------------------------------
+    # Persistance
+    # ------------------------------------------------------------------
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version': STATE_VERSION, 'engine': self}, f)
+        tmp.replace(path)
+
+    @staticmethod
+    def load(path):
+        """Recharge un état sauvegardé, None si absent ou incompatible."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception:
+            return None
+        if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+            return None
+        return state['engine']
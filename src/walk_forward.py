@@ -0,0 +1,87 @@
+"""
+Walk-forward : découpage train/test, courbe d'equity hors échantillon
+et stabilité des paramètres d'un pli à l'autre
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Fold:
+    """Indices de bougies d'un pli (bornes de fin exclues)."""
+    index: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+
+def make_folds(n_bars: int, train_bars: int, test_bars: int, start: int = 0,
+               anchored: bool = False, step_bars: int | None = None):
+    """
+    Fenêtres glissantes (rolling) ou ancrées (anchored : le train part
+    toujours de `start`). Chaque fenêtre de test suit immédiatement son
+    train ; on avance de step_bars (par défaut test_bars) entre deux plis.
+    La dernière fenêtre de test peut être plus courte.
+    """
+    if train_bars <= 0 or test_bars <= 0:
+        raise ValueError("train_bars et test_bars doivent être > 0")
+    step_bars = step_bars or test_bars
+
+    folds = []
+    offset = start
+    while offset + train_bars < n_bars:
+        train_start = start if anchored else offset
+        train_end = offset + train_bars
+        test_end = min(train_end + test_bars, n_bars)
+        folds.append(Fold(len(folds), train_start, train_end, train_end, test_end))
+        offset += step_bars
+    return folds
+
+
+def fold_slice(df, start: int, end: int, context_bars: int):
+    """
+    Sous-DataFrame [start - context_bars, end) et warmup correspondant.
+
+    Les indicateurs sont calculés une fois sur tout l'historique : la
+    tranche garde simplement `context_bars` bougies avant `start` pour que
+    la stratégie ait son historique minimal.
+    """
+    lo = max(start - context_bars, 0)
+    return df.iloc[lo:end], start - lo
+
+
+def oos_equity_curve(trades_by_fold, initial_capital: float):
+    """
+    Concatène les trades hors échantillon de chaque pli (dict pli -> DataFrame
+    compute_trades) et calcule la courbe d'equity agrégée.
+    """
+    frames = [trades.assign(fold=fold) for fold, trades in trades_by_fold.items() if not trades.empty]
+    if not frames:
+        return pd.DataFrame(columns=['timestamp', 'fold', 'signal', 'exit_reason', 'return', 'equity'])
+
+    curve = pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable')
+    curve['equity'] = initial_capital * np.cumprod(1 + curve['return'].to_numpy(dtype=np.float64))
+    return curve[['timestamp', 'fold', 'signal', 'exit_reason', 'return', 'equity']].reset_index(drop=True)
+
+
+def stability_report(best_params):
+    """
+    Stabilité des meilleurs paramètres (DataFrame plis x paramètres) :
+    moyenne, écart-type, min/max, coefficient de variation et dispersion
+    (max - min) / |médiane|. Des valeurs élevées signalent un paramètre
+    qui dépend surtout de la période (surapprentissage probable).
+    """
+    values = best_params.apply(pd.to_numeric, errors='coerce')
+    report = pd.DataFrame({
+        'mean': values.mean(),
+        'std': values.std(ddof=0),
+        'min': values.min(),
+        'max': values.max(),
+    })
+    median = values.median().abs().replace(0, np.nan)
+    report['cv'] = report['std'] / report['mean'].abs().replace(0, np.nan)
+    report['spread'] = (report['max'] - report['min']) / median
+    return report.sort_values('cv', ascending=False)
@@ -0,0 +1,228 @@
+"""
+Envoi des webhooks Discord en arrière-plan : session HTTP persistante,
+une file bornée par webhook, reprises avec backoff et respect des limites
+de débit Discord (429 / Retry-After / X-RateLimit-*)
+"""
+import collections
+import queue
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Issues de WebhookSender.deliver_status
+SENT = 'sent'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+
+def parse_retry_after(response, default=1.0):
+    """Délai (s) demandé par Discord : retry_after du corps JSON, sinon en-tête Retry-After."""
+    try:
+        data = response.json()
+        if isinstance(data, dict) and 'retry_after' in data:
+            return float(data['retry_after'])
+    except ValueError:
+        pass
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return default
+
+
+class _RateLimitBucket:
+    """Fenêtre de débit d'un webhook, tenue à jour d'après les réponses Discord."""
+
+    def __init__(self):
+        self.blocked_until = 0.0
+
+    def wait_time(self, now):
+        return max(self.blocked_until - now, 0.0)
+
+    def block(self, seconds, now):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def update(self, response, now):
+        # Quota épuisé : on attend la fin de la fenêtre plutôt que de prendre un 429
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset_after = response.headers.get('X-RateLimit-Reset-After')
+        try:
+            if remaining is not None and reset_after is not None and int(remaining) <= 0:
+                self.block(float(reset_after), now)
+        except ValueError:
+            pass
+
+
+class WebhookSender:
+    """
+    submit(url, payload) ajoute le message à la file du webhook et rend la
+    main immédiatement ; un thread par webhook vide sa file via une
+    requests.Session partagée (connexions réutilisées).
+
+    - 2xx : envoyé ;
+    - 429 : attente de Retry-After (bucket du webhook, ou tous les webhooks
+      si X-RateLimit-Global) puis nouvel essai ;
+    - 5xx / erreur réseau / timeout : backoff exponentiel (avec jitter) ;
+    - autre 4xx : abandon (message invalide ou webhook supprimé).
+    Un message est abandonné après max_retries essais supplémentaires.
+    """
+
+    def __init__(self, session=None, timeout=10.0, max_retries=5, backoff=1.0, max_backoff=60.0,
+                 queue_size=1000, pool_size=10, sleep=time.sleep, clock=time.monotonic):
+        self.session = session or self._make_session(pool_size)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.queue_size = queue_size
+        self.sleep = sleep
+        self.clock = clock
+        self._queues = {}
+        self._buckets = {}
+        self._threads = {}
+        self._global_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = collections.Counter()
+        self.latencies = collections.deque(maxlen=10000)
+
+    @staticmethod
+    def _make_session(pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _bucket(self, url):
+        with self._lock:
+            return self._buckets.setdefault(url, _RateLimitBucket())
+
+    def _queue(self, url):
+        with self._lock:
+            if url not in self._queues:
+                self._queues[url] = queue.Queue(maxsize=self.queue_size)
+                thread = threading.Thread(target=self._worker, args=(url,), daemon=True, name='discord-webhook')
+                self._threads[url] = thread
+                thread.start()
+            return self._queues[url]
+
+    def submit(self, url, payload, label='Message Discord'):
+        """Met le message en file sans jamais bloquer ; False si la file du webhook est pleine."""
+        if not url:
+            print(f"❌ {label} : webhook non défini")
+            return False
+        try:
+            self._queue(url).put_nowait((payload, label, self.clock()))
+        except queue.Full:
+            self.stats['dropped'] += 1
+            print(f"⚠️ File Discord pleine - {label} abandonné")
+            return False
+        self.stats['queued'] += 1
+        return True
+
+    def _worker(self, url):
+        q = self._queues[url]
+        while True:
+            item = q.get()
+            try:
+                if item is None:
+                    return
+                self.deliver(url, *item)
+            except Exception as e:
+                print(f"❌ Erreur envoi Discord: {e}")
+            finally:
+                q.task_done()
+
+    def deliver(self, url, payload, label='Message Discord', queued_at=None):
+        """Envoi bloquant avec reprises ; retourne True si Discord a accepté le message."""
+        return self.deliver_status(url, payload, label, queued_at) == SENT
+
+    def deliver_status(self, url, payload, label='Message Discord', queued_at=None):
+        """
+        Comme deliver, mais distingue l'échec : SENT, REJECTED (4xx hors 429,
+        le message lui-même est refusé) ou FAILED (reprises épuisées).
+        """
+        bucket = self._bucket(url)
+        failures = 0
+        while True:
+            now = self.clock()
+            wait = max(bucket.wait_time(now), self._global_until - now)
+            if wait > 0:
+                self.sleep(wait)
+
+            error = None
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                response, error = None, e
+
+            now = self.clock()
+            if response is not None:
+                bucket.update(response, now)
+                if 200 <= response.status_code < 300:
+                    self.stats['sent'] += 1
+                    if queued_at is not None:
+                        self.latencies.append(now - queued_at)
+                    print(f"✅ {label} envoyé")
+                    return SENT
+                error = f"HTTP {response.status_code}"
+
+            failures += 1
+            rejected = response is not None and 400 <= response.status_code < 500 and response.status_code != 429
+            if failures > self.max_retries or rejected:
+                self.stats['failed'] += 1
+                print(f"❌ Erreur Discord ({label}): {error}")
+                return REJECTED if rejected else FAILED
+            self.stats['retries'] += 1
+
+            if response is not None and response.status_code == 429:
+                self.stats['rate_limited'] += 1
+                retry_after = parse_retry_after(response)
+                if response.headers.get('X-RateLimit-Global', '').lower() == 'true':
+                    self._global_until = max(self._global_until, now + retry_after)
+                else:
+                    bucket.block(retry_after, now)
+                continue
+
+            delay = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+            self.sleep(delay * random.uniform(0.5, 1.0))
+
+    def max_delivery_time(self):
+        """
+        Durée maximale (s) d'un deliver sans 429 : max_retries + 1 requêtes
+        jusqu'au timeout, séparées par le backoff plafonné.
+        """
+        backoffs = sum(min(self.backoff * 2 ** i, self.max_backoff) for i in range(self.max_retries))
+        return (self.max_retries + 1) * self.timeout + backoffs
+
+    def pending(self):
+        """Messages en file ou en cours d'envoi."""
+        return sum(q.unfinished_tasks for q in list(self._queues.values()))
+
+    def flush(self, timeout=None):
+        """Attend que toutes les files soient vides ; False si le timeout est atteint avant."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout=None):
+        """Vide les files (dans la limite du timeout) puis arrête les threads."""
+        flushed = self.flush(timeout)
+        remaining = self.pending()
+        if remaining:
+            print(f"⚠️ {remaining} message(s) Discord non envoyé(s)")
+        with self._lock:
+            queues = list(self._queues.values())
+            self._queues.clear()
+            self._threads.clear()
+        for q in queues:
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                pass
+        return flushed
@@ -3,265 +3,131 @@ Backtest 1h sur BTC/USDT (ou autre symbole) avec la stratégie actuelle.
 Récupère l'historique complet possible via une source dédiée et calcule des statistiques.
 """
 import os
-import time
+import sys
+from pathlib import Path
 from datetime import datetime, timedelta, timezone
 
 import ccxt
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from mplfinance.original_flavor import candlestick_ohlc
 
+from src.candle_store import CandleStore
+from src.chunked_indicators import IndicatorStore, compute_to_store
+from src.compact_frame import memory_report
 from src.indicators import TechnicalIndicators
+from src.params import StrategyParams
+from src.simulator import resolve_levels, simulate_trades, trades_to_frame
 from src.strategy import ImprovedStrategy
 
 load_dotenv()
 
 
-def _timeframe_to_ms(timeframe: str) -> int:
-    unit = timeframe[-1]
-    value = int(timeframe[:-1])
-    if unit == 'm':
-        return value * 60 * 1000
-    if unit == 'h':
-        return value * 60 * 60 * 1000
-    if unit == 'd':
-        return value * 24 * 60 * 60 * 1000
-    raise ValueError(f"Timeframe non supporté: {timeframe}")
-
-
-def fetch_all_ohlcv(exchange, symbol: str, timeframe: str = '1h', since_ms: int | None = None, limit: int = 720):
-    """Récupère toutes les bougies disponibles (pagination via since)."""
-    all_ohlcv = []
-    timeframe_ms = _timeframe_to_ms(timeframe)
-
-    last_seen_ts = None
-
-    while True:
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since_ms, limit=limit)
-        if not ohlcv:
-            break
+def build_dataframe(ohlcv):
+    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+    df.set_index('timestamp', inplace=True)
+    return df
 
-        all_ohlcv.extend(ohlcv)
-        last_ts = ohlcv[-1][0]
-        if last_seen_ts is not None and last_ts == last_seen_ts:
-            break
-        last_seen_ts = last_ts
-        next_since = last_ts + timeframe_ms
 
-        if since_ms is not None and next_since <= since_ms:
-            break
+def update_history(exchange, exchange_name: str, symbol: str, timeframe: str, since_ms: int | None, limit: int = 720):
+    """Complète le store local (data/candles) : seules les bougies absentes sont téléchargées."""
+    store = CandleStore()
 
-        since_ms = next_since
-        time.sleep(exchange.rateLimit / 1000)
+    # Migration de l'ancien cache CSV de test_grid_search
+    legacy = Path("data") / f"ohlcv_{exchange_name}_{symbol.replace('/', '-')}_{timeframe}.csv"
+    if legacy.exists() and store.last_timestamp(exchange_name, symbol, timeframe) is None:
+        print(f"📦 Import de l'ancien cache {legacy} dans le store")
+        csv = pd.read_csv(legacy, parse_dates=["timestamp"], index_col="timestamp")
+        store.write(exchange_name, symbol, timeframe, csv)
+        # Le cache CSV était téléchargé depuis START_DATE : même couverture qu'un update()
+        if not csv.empty:
+            first_ms = int(pd.Timestamp(csv.index[0]).timestamp() * 1000)
+            store.mark_covered(exchange_name, symbol, timeframe,
+                               first_ms if since_ms is None else min(since_ms, first_ms))
 
-        if len(ohlcv) < limit:
-            break
+    added = store.update(exchange, exchange_name, symbol, timeframe, since_ms=since_ms, limit=limit)
+    if added:
+        print(f"⬇️  {added} nouvelle(s) bougie(s) ajoutée(s) au store")
+    return store
 
-    # Déduplication par timestamp
-    unique = {}
-    for row in all_ohlcv:
-        unique[row[0]] = row
 
-    return [unique[k] for k in sorted(unique.keys())]
+def load_history(exchange, exchange_name: str, symbol: str, timeframe: str, since_ms: int | None, limit: int = 720):
+    """
+    Historique OHLCV via le store local (data/candles) : seules les bougies
+    absentes sont téléchargées, puis la période demandée est lue depuis le disque.
+    """
+    store = update_history(exchange, exchange_name, symbol, timeframe, since_ms, limit=limit)
+    start = pd.Timestamp(since_ms, unit='ms', tz=timezone.utc) if since_ms is not None else None
+    return store.read(exchange_name, symbol, timeframe, start=start)
 
 
-def build_dataframe(ohlcv):
-    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
-    df.set_index('timestamp', inplace=True)
-    return df
+def load_indicators_chunked(exchange, exchange_name: str, symbol: str, timeframe: str, since_ms: int | None,
+                            limit: int = 720):
+    """
+    Historique + indicateurs calculés bloc par bloc (INDICATORS_CHUNKED=true) :
+    tout l'historique n'est jamais en mémoire pendant le calcul, seules les
+    colonnes de la stratégie sont relues depuis data/indicators.
+    """
+    candles = update_history(exchange, exchange_name, symbol, timeframe, since_ms, limit=limit)
+    start = pd.Timestamp(since_ms, unit='ms', tz=timezone.utc) if since_ms is not None else None
+    indicators = IndicatorStore()
+    rows = compute_to_store(exchange_name, symbol, timeframe, candles=candles, indicators=indicators, start=start)
+    print(f"🧱 {rows} bougie(s) calculée(s) par blocs dans {indicators.root}")
+    columns = ('open', 'high', 'low', 'close', 'volume') + ImprovedStrategy.REQUIRED_COLUMNS
+    return indicators.read(exchange_name, symbol, timeframe, columns=columns)
 
 
-def compute_trades(df, warmup_bars=220):
+def compute_trades(df, warmup_bars=220, params=None):
     """
     Calcule les trades en simulant la stratégie à chaque bougie.
     Entrée à l'ouverture de la bougie suivante, sortie sur signal opposé
     ou SL/TP. Les frais sont appliqués sur entrée et sortie. Gestion partielle :
     50% à TP1, stop remonté à BE, reste sort à TP2 ou stop. Stop temps si aucune
     sortie après N bougies.
+
+    params : StrategyParams (lu depuis l'environnement si absent).
     """
-    results = []
-    signal_counts = {"BUY": 0, "SELL": 0, "NEUTRAL": 0}
-
-    fee_rate = float(os.getenv('FEE_RATE', '0.0004'))  # 0.04% par ordre
-    sl_pct = float(os.getenv('SL_PCT', '0.01'))  # 1%
-    tp_pct = float(os.getenv('TP_PCT', '0.02'))  # 2%
-    use_atr = os.getenv('USE_ATR_STOPS', 'true').lower() == 'true'
-    atr_mult_sl = float(os.getenv('ATR_MULT_SL', '1.5'))
-    atr_mult_tp = float(os.getenv('ATR_MULT_TP', '2.5'))
-    cooldown_bars = int(os.getenv('COOLDOWN_BARS', '3'))
-    cooldown_bars_sl = int(os.getenv('COOLDOWN_BARS_SL', str(cooldown_bars)))
-    long_only = os.getenv('LONG_ONLY', 'true').lower() == 'true'
-    slippage_bps = float(os.getenv('SLIPPAGE_BPS', '0.0002'))
-    time_stop_bars = int(os.getenv('TIME_STOP_BARS', '48'))
-
-    position = None  # "BUY" ou "SELL"
-    entry_price = None
-    entry_time = None
-    cooldown = 0
-    stop_price = None
-    take_price_1 = None
-    take_price_2 = None
-    took_tp1 = False
-    bars_in_position = 0
-
-    def apply_slippage(price, side, is_entry=True):
-        if side == "BUY":
-            return price * (1 + slippage_bps if is_entry else 1 - slippage_bps)
-        return price * (1 - slippage_bps if is_entry else 1 + slippage_bps)
-
-    warmup = warmup_bars
-    for i in range(warmup, len(df) - 1):
-        sub = df.iloc[:i + 1]
-        signal_obj = ImprovedStrategy.generate_signal(sub)
-        signal = signal_obj.signal
-        signal_counts[signal] = signal_counts.get(signal, 0) + 1
-
-        next_bar = df.iloc[i + 1]
-
-        # Gestion position existante
-        if position is not None:
-            direction = 1 if position == "BUY" else -1
-            bars_in_position += 1
-
-            # Détection SL/TP
-            hit_tp2 = next_bar['high'] >= take_price_2 if position == "BUY" else next_bar['low'] <= take_price_2
-            hit_tp1 = next_bar['high'] >= take_price_1 if position == "BUY" else next_bar['low'] <= take_price_1
-            hit_stop = next_bar['low'] <= stop_price if position == "BUY" else next_bar['high'] >= stop_price
-
-            exit_price = None
-            exit_reason = None
-            size = 1.0
-
-            if hit_tp2:
-                exit_price = take_price_2
-                exit_reason = "TP2" if took_tp1 else "TP2_full"
-                size = 0.5 if took_tp1 else 1.0
-
-            elif hit_tp1 and not took_tp1:
-                exit_price = take_price_1
-                exit_reason = "TP1"
-                size = 0.5
-                took_tp1 = True
-                stop_price = entry_price  # BE après TP1
-
-            elif hit_stop:
-                exit_price = stop_price
-                exit_reason = "SL"
-                size = 0.5 if took_tp1 else 1.0
-
-            elif bars_in_position >= time_stop_bars:
-                exit_price = next_bar['open']
-                exit_reason = "TIME"
-                size = 0.5 if took_tp1 else 1.0
-
-            elif (position == "BUY" and signal == "SELL") or (position == "SELL" and signal == "BUY"):
-                exit_price = next_bar['open']
-                exit_reason = "REV"
-                size = 0.5 if took_tp1 else 1.0
-
-            if exit_price is not None:
-                exit_price_slip = apply_slippage(exit_price, "SELL" if position == "BUY" else "BUY", is_entry=False)
-                ret = direction * (exit_price_slip - entry_price) / entry_price * size
-                # Fees: entry fee already paid once; exit fee proportional to size
-                ret -= fee_rate * (1 + size)
-
-                results.append({
-                    "timestamp": next_bar.name,
-                    "signal": position,
-                    "entry": entry_price,
-                    "exit": exit_price_slip,
-                    "return": ret,
-                    "prediction_correct": ret > 0,
-                    "exit_reason": exit_reason,
-                    "entry_time": entry_time,
-                    "stop": stop_price,
-                    "tp1": take_price_1,
-                    "tp2": take_price_2
-                })
-
-                if exit_reason == "TP1":
-                    # conserver la moitié restante
-                    continue
-
-                position = None
-                entry_price = None
-                entry_time = None
-                stop_price = None
-                take_price_1 = None
-                take_price_2 = None
-                took_tp1 = False
-                bars_in_position = 0
-                if exit_reason == "SL":
-                    cooldown = max(cooldown, cooldown_bars_sl)
-                else:
-                    cooldown = max(cooldown, cooldown_bars)
-
-        # Cooldown pour nouvelles entrées
-        if cooldown > 0:
-            cooldown -= 1
-            continue
-
-        # Nouvelle entrée
-        if position is None and signal in ("BUY", "SELL"):
-            if long_only and signal == "SELL":
-                continue
-
-            direction = 1 if signal == "BUY" else -1
-            raw_entry = next_bar['open']
-            entry_price = apply_slippage(raw_entry, signal, is_entry=True)
-            entry_time = next_bar.name
-
-            atr = df.iloc[i]['atr'] if 'atr' in df.columns else None
-
-            if signal_obj.stop_loss is not None:
-                stop_price = signal_obj.stop_loss
-            elif use_atr and atr is not None:
-                stop_price = entry_price - atr_mult_sl * atr if signal == "BUY" else entry_price + atr_mult_sl * atr
-            else:
-                stop_price = entry_price * (1 - sl_pct) if signal == "BUY" else entry_price * (1 + sl_pct)
-
-            if signal_obj.take_profit_1 is not None and signal_obj.take_profit_2 is not None:
-                take_price_1 = signal_obj.take_profit_1
-                take_price_2 = signal_obj.take_profit_2
-            else:
-                if use_atr and atr is not None:
-                    take_price_1 = entry_price + atr_mult_tp * atr if signal == "BUY" else entry_price - atr_mult_tp * atr
-                    take_price_2 = take_price_1
-                else:
-                    take_price_1 = entry_price * (1 + tp_pct) if signal == "BUY" else entry_price * (1 - tp_pct)
-                    take_price_2 = take_price_1
-
-            position = signal
-            took_tp1 = False
-            bars_in_position = 0
-
-    # Si une position reste ouverte à la fin, on la clôture au dernier close
-    if position is not None:
-        last_bar = df.iloc[-1]
-        exit_price_slip = apply_slippage(last_bar['close'], "SELL" if position == "BUY" else "BUY", is_entry=False)
-        direction = 1 if position == "BUY" else -1
-        size = 0.5 if took_tp1 else 1.0
-        ret = direction * (exit_price_slip - entry_price) / entry_price * size
-        ret -= fee_rate * (1 + size)
-
-        results.append({
-            "timestamp": last_bar.name,
-            "signal": position,
-            "entry": entry_price,
-            "exit": exit_price_slip,
-            "return": ret,
-            "prediction_correct": ret > 0,
-            "exit_reason": "EOD",
-            "entry_time": entry_time,
-            "stop": stop_price,
-            "tp1": take_price_1,
-            "tp2": take_price_2
-        })
-
-    return pd.DataFrame(results), signal_counts
+    if params is None:
+        params = StrategyParams.from_env()
+
+    # Signaux de toutes les bougies en une passe (identique à generate_signal(df.iloc[:i + 1]))
+    signals = ImprovedStrategy.generate_signals(df, params)
+    direction = signals['direction'].to_numpy()
+
+    evaluated = direction[warmup_bars:len(df) - 1]
+    signal_counts = {
+        "BUY": int(np.count_nonzero(evaluated == 1)),
+        "SELL": int(np.count_nonzero(evaluated == -1)),
+        "NEUTRAL": int(np.count_nonzero(evaluated == 0)),
+    }
+
+    open_ = df['open'].to_numpy(dtype=np.float64)
+    atr = df['atr'].to_numpy(dtype=np.float64) if 'atr' in df.columns else None
+    stop_loss, take_profit_1, take_profit_2 = resolve_levels(
+        direction, open_, atr,
+        signals['stop_loss'].to_numpy(),
+        signals['take_profit_1'].to_numpy(),
+        signals['take_profit_2'].to_numpy(),
+        params.slippage_bps, use_atr=params.use_atr_stops, atr_mult_sl=params.atr_mult_sl,
+        atr_mult_tp=params.atr_mult_tp, sl_pct=params.sl_pct, tp_pct=params.tp_pct
+    )
+
+    trades = simulate_trades(
+        open_,
+        df['high'].to_numpy(dtype=np.float64),
+        df['low'].to_numpy(dtype=np.float64),
+        df['close'].to_numpy(dtype=np.float64),
+        direction, stop_loss, take_profit_1, take_profit_2,
+        warmup=warmup_bars, fee_rate=params.fee_rate, slippage_bps=params.slippage_bps,
+        cooldown_bars=params.cooldown_bars, cooldown_bars_sl=params.cooldown_bars_sl,
+        time_stop_bars=params.time_stop_bars, long_only=params.long_only
+    )
+
+    return trades_to_frame(trades, df.index), signal_counts
 
 
 def compute_stats(trades: pd.DataFrame, label: str, initial_capital: float):
@@ -473,7 +339,10 @@ def plot_trades(df, trades, output_path="backtest_plot.png", max_bars=None, days
     print(f"📈 Graphique sauvegardé : {output_path}")
 
 
-def main():
+def main(params=None):
+    if params is None:
+        params = StrategyParams.from_env()
+
     symbol = os.getenv('SYMBOL', 'BTC/USDT')
     timeframe = os.getenv('TIMEFRAME', '1h')
     exchange_name = os.getenv('EXCHANGE', 'kraken')
@@ -490,17 +359,25 @@ def main():
         print("   En 1h, cela représente ~30 jours maximum via l'API.")
         since_ms = None
 
+    compact = os.getenv('INDICATORS_COMPACT', 'false').lower() == 'true'
     print(f"🚀 Récupération historique {symbol} en {timeframe} depuis {start_date} (source: {hist_exchange_name})...")
-    ohlcv = fetch_all_ohlcv(exchange, symbol, timeframe=timeframe, since_ms=since_ms, limit=limit)
+    if os.getenv('INDICATORS_CHUNKED', 'false').lower() == 'true':
+        df = load_indicators_chunked(exchange, hist_exchange_name, symbol, timeframe, since_ms, limit=limit)
+    else:
+        df = load_history(exchange, hist_exchange_name, symbol, timeframe, since_ms, limit=limit)
+        if not df.empty:
+            df = TechnicalIndicators.add_all_indicators(df, columns=ImprovedStrategy.REQUIRED_COLUMNS,
+                                                        compact=compact)
 
-    if not ohlcv:
+    if df.empty:
         print("❌ Aucune donnée récupérée.")
         return
 
-    df = build_dataframe(ohlcv)
-    df = TechnicalIndicators.add_all_indicators(df)
-
     print(f"✅ {len(df)} bougies récupérées.")
+    if compact:
+        report = memory_report(df)
+        print(f"🧮 Mémoire du DataFrame (mode compact) : {report['bytes'].sum() / 1e6:.1f} Mo")
+        print(report.to_string(formatters={'share': '{:.1%}'.format}))
 
     if not df.empty:
         first_ts = df.index[0]
@@ -513,7 +390,7 @@ def main():
             print("   Conseil: ajuste START_DATE ou utilise une source historique dédiée.")
 
     warmup_bars = int(os.getenv('WARMUP_BARS', '220'))
-    trades, signal_counts = compute_trades(df, warmup_bars=warmup_bars)
+    trades, signal_counts = compute_trades(df, warmup_bars=warmup_bars, params=params)
 
     print(f"📊 Signaux générés: BUY={signal_counts.get('BUY', 0)}, SELL={signal_counts.get('SELL', 0)}, NEUTRAL={signal_counts.get('NEUTRAL', 0)}")
 
@@ -547,4 +424,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(StrategyParams.from_cli(sys.argv[1:]))
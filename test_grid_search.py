@@ -1,4 +1,7 @@
+import multiprocessing
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import timezone
 
@@ -7,13 +10,20 @@ import optuna
 import pandas as pd
 from dotenv import load_dotenv
 
+from src.batch_backtest import backtest_chunks, batch_backtest
 from src.indicators import TechnicalIndicators
-from test_backtest import build_dataframe, compute_stats, compute_trades, fetch_all_ohlcv
+from src.params import StrategyParams
+from src.shared_arrays import SharedFrame
+from src.strategy import ImprovedStrategy
+from test_backtest import compute_stats, compute_trades, load_history
 
 load_dotenv()
 
 # Cache global pour éviter de recharger les données à chaque essai
 _df_cache = None
+_base_params = None
+_shared_frame = None
+_arrays_cache = None
 
 
 def load_dataset():
@@ -29,34 +39,26 @@ def load_dataset():
     exchange = getattr(ccxt, hist_exchange_name)({"enableRateLimit": True})
     since_ms = int(pd.Timestamp(start_date, tz=timezone.utc).timestamp() * 1000)
 
-    cache_dir = Path("data")
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    cache_file = cache_dir / f"ohlcv_{hist_exchange_name}_{symbol.replace('/', '-')}_{timeframe}.csv"
+    df = load_history(exchange, hist_exchange_name, symbol, timeframe, since_ms, limit=720)
 
-    if cache_file.exists():
-        df = pd.read_csv(cache_file, parse_dates=["timestamp"], index_col="timestamp")
-    else:
-        ohlcv = fetch_all_ohlcv(exchange, symbol, timeframe, since_ms, limit=720)
-        df = build_dataframe(ohlcv)
-        df.reset_index().to_csv(cache_file, index=False)
-        df.set_index("timestamp", inplace=True)
-
-    df = TechnicalIndicators.add_all_indicators(df)
+    compact = os.getenv("INDICATORS_COMPACT", "false").lower() == "true"
+    df = TechnicalIndicators.add_all_indicators(df, columns=ImprovedStrategy.REQUIRED_COLUMNS, compact=compact)
     _df_cache = df
     return df
 
 
-def apply_params_to_env(params: dict):
-    for key, value in params.items():
-        os.environ[key] = str(value)
+def load_base_params():
+    """Paramètres de départ (env/.env/CLI), construits une seule fois."""
+    global _base_params
+    if _base_params is None:
+        _base_params = StrategyParams.from_cli(sys.argv[1:])
+    return _base_params
 
 
 # Espace de recherche (bornes raisonnables autour des valeurs actuelles)
 
 
-def objective(trial):
-    df = load_dataset()
-
+def suggest_params(trial):
     params = {
         "VOLUME_RATIO_MIN": trial.suggest_float("VOLUME_RATIO_MIN", 0.50, 1.00),
         "VOLUME_SPIKE_MIN": trial.suggest_float("VOLUME_SPIKE_MIN", 1.05, 1.80),
@@ -79,12 +81,82 @@ def objective(trial):
     if params["COOLDOWN_BARS_SL"] < params["COOLDOWN_BARS"]:
         params["COOLDOWN_BARS_SL"] = params["COOLDOWN_BARS"] + 2
 
-    apply_params_to_env(params)
+    # Paramètres réellement évalués (après contraintes), relus par resolved_params
+    trial.set_user_attr("params", params)
+    return params
+
+
+def resolved_params(trial):
+    """Paramètres évalués par l'essai : trial.params ne tient pas compte des ajustements de suggest_params."""
+    return trial.user_attrs.get("params", trial.params)
+
+
+def load_signal_arrays():
+    """Colonnes de la stratégie décalées d'une bougie, calculées une fois par processus."""
+    global _arrays_cache
+    if _arrays_cache is None:
+        _arrays_cache = ImprovedStrategy._closed_bar_arrays(load_dataset())
+    return _arrays_cache
+
+
+def build_pruner():
+    """
+    Pruner Optuna (GRID_PRUNER) : median (défaut), percentile, hyperband ou none.
+    Utilisé seulement si GRID_PRUNE_CHUNKS > 0.
+    """
+    name = os.getenv("GRID_PRUNER", "median").strip().lower()
+    startup = int(os.getenv("GRID_PRUNE_STARTUP_TRIALS", "10"))
+    if name == "none" or int(os.getenv("GRID_PRUNE_CHUNKS", "0")) <= 0:
+        return optuna.pruners.NopPruner()
+    if name == "percentile":
+        return optuna.pruners.PercentilePruner(25.0, n_startup_trials=startup, n_warmup_steps=1)
+    if name == "hyperband":
+        return optuna.pruners.HyperbandPruner(min_resource=1)
+    return optuna.pruners.MedianPruner(n_startup_trials=startup, n_warmup_steps=1)
+
+
+def objective_chunked(trial, params, warmup_bars: int, initial_capital: float, n_chunks: int):
+    """
+    Backtest en tranches chronologiques : le capital courant est rapporté à
+    Optuna après chaque tranche (step = numéro de tranche) pour que le pruner
+    arrête tôt les configurations sans espoir. GRID_PRUNE_MAX_DRAWDOWN (ex. 0.5)
+    coupe directement un essai dont le drawdown dépasse ce seuil.
+    """
+    max_drawdown = float(os.getenv("GRID_PRUNE_MAX_DRAWDOWN", "0") or 0)
+    progress = None
+    for progress in backtest_chunks(load_dataset(), params, n_chunks=n_chunks, warmup_bars=warmup_bars,
+                                    initial_capital=initial_capital, arrays=load_signal_arrays()):
+        trial.report(progress["equity"], progress["step"])
+        trial.set_user_attr("trades", progress["trades"])
+        trial.set_user_attr("max_drawdown", progress["max_drawdown"])
+        trial.set_user_attr("progress", round(progress["progress"], 3))
+
+        if max_drawdown > 0 and progress["max_drawdown"] <= -max_drawdown:
+            raise optuna.TrialPruned()
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+
+    # Écarter les configurations trop peu actives
+    if progress is None or progress["trades"] < 6:
+        raise optuna.TrialPruned()
+
+    return progress["equity"]
+
+
+def objective(trial):
+    df = load_dataset()
+
+    # Copie figée par essai : pas de modification de os.environ (essais parallèles possibles)
+    params = load_base_params().with_overrides(suggest_params(trial))
 
     initial_capital = float(os.getenv("INITIAL_CAPITAL", "100"))
     warmup_bars = int(os.getenv("WARMUP_BARS", "220"))
 
-    trades, _ = compute_trades(df, warmup_bars=warmup_bars)
+    n_chunks = int(os.getenv("GRID_PRUNE_CHUNKS", "0"))
+    if n_chunks > 0:
+        return objective_chunked(trial, params, warmup_bars, initial_capital, n_chunks)
+
+    trades, _ = compute_trades(df, warmup_bars=warmup_bars, params=params)
     stats = compute_stats(trades, "trial", initial_capital)
 
     # Écarter les configurations trop peu actives
@@ -94,18 +166,188 @@ def objective(trial):
     return stats["final_capital"]
 
 
+def optimize_batched(study, n_trials: int, batch_size: int, df=None, warmup_bars=None, verbose=True):
+    """
+    Variante ask/tell : demande `batch_size` essais à Optuna, les évalue en une
+    passe avec batch_backtest, puis renvoie les scores. Même objectif que objective().
+
+    df/warmup_bars : sous-période à optimiser (walk-forward), sinon tout l'historique.
+    """
+    if df is None:
+        df = load_dataset()
+    initial_capital = float(os.getenv("INITIAL_CAPITAL", "100"))
+    if warmup_bars is None:
+        warmup_bars = int(os.getenv("WARMUP_BARS", "220"))
+
+    done = 0
+    while done < n_trials:
+        trials, rows = [], []
+        for _ in range(min(batch_size, n_trials - done)):
+            trial = study.ask()
+            try:
+                rows.append(suggest_params(trial))
+                trials.append(trial)
+            except optuna.TrialPruned:
+                study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+            done += 1
+
+        if not trials:
+            continue
+
+        table = batch_backtest(df, pd.DataFrame(rows), warmup_bars=warmup_bars,
+                               initial_capital=initial_capital, base_params=load_base_params())
+        for trial, (_, stats) in zip(trials, table.iterrows()):
+            if stats["trades"] < 6:
+                study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+            else:
+                study.tell(trial, float(stats["final_capital"]))
+
+        if verbose:
+            print(f"🔁 {done}/{n_trials} essais évalués (meilleur: {_best_value(study)})")
+
+
+def _best_value(study):
+    try:
+        return f"{study.best_value:.2f}"
+    except ValueError:
+        return "N/A"
+
+
+def resolve_storage(study_name: str, n_jobs: int):
+    """
+    Backend Optuna local (GRID_STORAGE) :
+    - "sqlite:///data/optuna.db" : base SQLite
+    - "journal:data/optuna.log" ou "*.log" : fichier journal (recommandé en parallèle)
+    - vide : en mémoire si 1 job, sinon journal data/optuna_<study>.log
+    """
+    storage = os.getenv("GRID_STORAGE", "").strip()
+    if not storage and n_jobs > 1:
+        storage = f"journal:data/optuna_{study_name}.log"
+    return storage or None
+
+
+def open_storage(storage):
+    """
+    Stockage Optuna. SQLite / RDB : heartbeat des essais (GRID_HEARTBEAT_INTERVAL s,
+    0 = désactivé) ; un essai sans signe de vie depuis GRID_HEARTBEAT_GRACE s
+    (worker tué, machine arrêtée) passe en FAIL et est relancé avec les mêmes
+    paramètres. Les essais des autres workers encore en vie ne sont pas touchés.
+    """
+    if storage is None:
+        return None
+    if "://" in storage:
+        interval = int(os.getenv("GRID_HEARTBEAT_INTERVAL", "60"))
+        if interval <= 0:
+            return storage
+        grace = int(os.getenv("GRID_HEARTBEAT_GRACE", str(4 * interval)))
+        if hasattr(optuna.storages, "RetryHeartbeatStaleTrialCallback"):
+            callback = {"heartbeat_stale_trial_callback": optuna.storages.RetryHeartbeatStaleTrialCallback(max_retry=3)}
+        else:  # Optuna < 4.9
+            callback = {"failed_trial_callback": optuna.storages.RetryFailedTrialCallback(max_retry=3)}
+        return optuna.storages.RDBStorage(storage, heartbeat_interval=interval, grace_period=grace, **callback)
+
+    path = storage[len("journal:"):] if storage.startswith("journal:") else storage
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    try:
+        from optuna.storages.journal import JournalFileBackend
+        backend = JournalFileBackend(path)
+    except ImportError:  # Optuna 3.x
+        backend = optuna.storages.JournalFileStorage(path)
+    return optuna.storages.JournalStorage(backend)
+
+
+def _fail_interrupted_trials(study):
+    """
+    --resume : les essais restés RUNNING sont marqués FAIL. À n'utiliser que si
+    aucun autre worker ne travaille sur l'étude (stockage journal, mode par lots :
+    pas de heartbeat).
+    """
+    running = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.RUNNING,))
+    for trial in running:
+        study.tell(trial.number, state=optuna.trial.TrialState.FAIL)
+    if running:
+        print(f"♻️  {len(running)} essai(s) interrompu(s) marqué(s) en échec")
+
+
+def _worker_init(frame_spec, base_params):
+    """Worker : s'attache aux indicateurs en mémoire partagée (ni recalcul ni pickling)."""
+    global _df_cache, _base_params, _shared_frame
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    _shared_frame = SharedFrame.attach(frame_spec)
+    _df_cache = _shared_frame.to_frame()
+    _base_params = base_params
+
+
+def _worker_optimize(study_name: str, storage: str, n_trials: int, batch_size: int):
+    study = optuna.load_study(study_name=study_name, storage=open_storage(storage), pruner=build_pruner())
+    if batch_size > 0:
+        optimize_batched(study, n_trials, batch_size)
+    else:
+        study.optimize(objective, n_trials=n_trials)
+    return n_trials
+
+
+def optimize_parallel(study_name: str, storage: str, n_trials: int, n_jobs: int, batch_size: int):
+    """
+    Répartit les essais sur n_jobs processus. Les indicateurs sont calculés une
+    fois puis placés en mémoire partagée ; les workers se coordonnent via le
+    stockage Optuna local.
+    """
+    df = load_dataset()
+    shared = SharedFrame.from_frame(df)
+    print(f"🧠 Indicateurs en mémoire partagée : {shared.shared.nbytes / 1e6:.1f} Mo, {n_jobs} workers")
+
+    shares = [n_trials // n_jobs + (1 if k < n_trials % n_jobs else 0) for k in range(n_jobs)]
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=ctx, initializer=_worker_init,
+                                 initargs=(shared.spec, load_base_params())) as pool:
+            futures = [pool.submit(_worker_optimize, study_name, storage, k, batch_size) for k in shares if k > 0]
+            for future in as_completed(futures):
+                future.result()
+    finally:
+        shared.close()
+
+
 def main():
     n_trials = int(os.getenv("GRID_TRIALS", "20"))
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=n_trials, n_jobs=1, show_progress_bar=True)
-
-    best_params = study.best_params
-    apply_params_to_env(best_params)
+    batch_size = int(os.getenv("GRID_BATCH_SIZE", "0"))
+    n_jobs = int(os.getenv("GRID_JOBS", "1"))
+    if n_jobs <= 0:
+        n_jobs = os.cpu_count() or 1
+    study_name = os.getenv("GRID_STUDY_NAME", "grid_search")
+
+    storage = resolve_storage(study_name, n_jobs)
+    study = optuna.create_study(
+        study_name=study_name,
+        storage=open_storage(storage),
+        direction="maximize",
+        pruner=build_pruner(),
+        load_if_exists=True
+    )
+    if storage is not None:
+        previous = len(study.trials)
+        print(f"💾 Étude '{study_name}' ({storage}) : {previous} essai(s) existant(s)")
+        if "--resume" in sys.argv[1:]:
+            _fail_interrupted_trials(study)
+
+    try:
+        if n_jobs > 1:
+            optimize_parallel(study_name, storage, n_trials, n_jobs, batch_size)
+        elif batch_size > 0:
+            optimize_batched(study, n_trials, batch_size)
+        else:
+            study.optimize(objective, n_trials=n_trials, n_jobs=1, show_progress_bar=True)
+    except KeyboardInterrupt:
+        print("\n🛑 Optimisation interrompue" + (" - relancer pour reprendre l'étude" if storage else ""))
+
+    best_params = resolved_params(study.best_trial)
+    params = load_base_params().with_overrides(best_params)
 
     df = load_dataset()
     initial_capital = float(os.getenv("INITIAL_CAPITAL", "100"))
     warmup_bars = int(os.getenv("WARMUP_BARS", "220"))
-    trades, _ = compute_trades(df, warmup_bars=warmup_bars)
+    trades, _ = compute_trades(df, warmup_bars=warmup_bars, params=params)
     stats = compute_stats(trades, "best", initial_capital)
 
     print("\nMeilleure configuration :")
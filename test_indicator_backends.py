@@ -0,0 +1,175 @@
+"""
+Parité et vitesse des backends d'indicateurs (pandas / numpy / talib) :
+chaque backend disponible est comparé aux sorties actuelles de
+calculate_ema, calculate_rsi, calculate_atr, calculate_macd et des bandes de
+Bollinger (backend pandas = référence), puis chronométré indicateur par indicateur.
+🧪 Données synthétiques, aucun accès à l'exchange
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.indicator_backends import available_backends
+from src.indicators import TechnicalIndicators
+
+# numpy : même calcul que pandas, au bit près. talib : sommes et récurrences
+# faites dans un autre ordre par la bibliothèque C, écart relatif ~1e-10
+TOLERANCES = {'pandas': 0.0, 'numpy': 0.0, 'talib': 1e-9}
+
+# Fenêtre de prix constante : le rolling std de pandas garde un résidu
+# d'arrondi (~1e-8 x prix) là où TA-Lib renvoie 0. Écart absolu admis en plus
+# de la tolérance relative, pour les colonnes dérivées de l'écart-type
+FLAT_WINDOW_NOISE = 1e-7
+NOISE = {
+    'bb_std': lambda df: FLAT_WINDOW_NOISE * df['close'],
+    'bb_upper': lambda df: 2 * FLAT_WINDOW_NOISE * df['close'],
+    'bb_lower': lambda df: 2 * FLAT_WINDOW_NOISE * df['close'],
+    'bb_width_ma': lambda df: 4 * FLAT_WINDOW_NOISE,
+}
+
+
+def synthetic_ohlcv(n, seed=42, price=20000.0):
+    """Marche aléatoire OHLCV déterministe (bougies 1h)."""
+    rng = np.random.default_rng(seed)
+    close = price * np.exp(np.cumsum(rng.normal(0, 0.008, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n)))
+    index = pd.date_range('2022-01-01', periods=n, freq='h', name='timestamp')
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close,
+                         'volume': rng.lognormal(3, 0.6, n)}, index=index)
+
+
+def datasets():
+    """Cas de parité : marché normal, petit prix, palier de prix constant, série plus courte que les fenêtres."""
+    flat = synthetic_ohlcv(5000, seed=7)
+    flat.iloc[1000:1100, :4] = flat['close'].iloc[999]
+    return {
+        'marche aléatoire': synthetic_ohlcv(5000),
+        'prix 1e-4': synthetic_ohlcv(5000, seed=3, price=1e-4),
+        'palier constant': flat,
+        'série courte': synthetic_ohlcv(30, seed=11),
+    }
+
+
+# Indicateur -> fonction (df, backend) retournant {colonne: Series}
+INDICATORS = {
+    'ema': lambda df, backend: {f'ema_{p}': TechnicalIndicators.calculate_ema(df, p, backend=backend)
+                                for p in (20, 50, 200)},
+    'rsi': lambda df, backend: {'rsi': TechnicalIndicators.calculate_rsi(df, 14, backend=backend)},
+    'atr': lambda df, backend: {'atr': TechnicalIndicators.calculate_atr(df, 14, backend=backend)},
+    'macd': lambda df, backend: {
+        name: column for name, column in
+        TechnicalIndicators.calculate_macd(df.copy(), backend=backend)[['macd', 'macd_signal', 'macd_hist']].items()
+    },
+    'bollinger': lambda df, backend: {
+        name: column for name, column in
+        TechnicalIndicators.calculate_bollinger_squeeze(df, backend=backend)[
+            ['bb_mid', 'bb_std', 'bb_upper', 'bb_lower', 'bb_width_ma']
+        ].items()
+    },
+}
+
+
+def mismatch(values, expected, tolerance, noise=0.0):
+    """
+    Écart relatif maximal (à l'échelle de la colonne), une fois retiré le
+    bruit admis `noise` ; inf si les NaN ne tombent pas aux mêmes lignes.
+    """
+    values = values.to_numpy(dtype=np.float64)
+    expected = expected.to_numpy(dtype=np.float64)
+    noise = np.broadcast_to(np.asarray(noise, dtype=np.float64), expected.shape)
+    if not np.array_equal(np.isnan(values), np.isnan(expected)):
+        return np.inf
+    if tolerance == 0.0:
+        return 0.0 if np.array_equal(values, expected, equal_nan=True) else np.inf
+    valid = ~np.isnan(expected)
+    if not valid.any():
+        return 0.0
+    scale = max(np.abs(expected[valid]).max(), np.finfo(np.float64).tiny)
+    error = np.maximum(np.abs(values[valid] - expected[valid]) - noise[valid], 0.0)
+    return float(error.max() / scale)
+
+
+def check_parity(backends):
+    failures = 0
+    for case, df in datasets().items():
+        print(f"\n📐 {case} ({len(df)} bougies)")
+        for indicator, compute in INDICATORS.items():
+            expected = compute(df, 'pandas')
+            for backend in backends:
+                if backend == 'pandas':
+                    continue
+                tolerance = TOLERANCES[backend]
+                errors = {name: mismatch(column, expected[name], tolerance,
+                                         NOISE[name](df) if tolerance and name in NOISE else 0.0)
+                          for name, column in compute(df, backend).items()}
+                worst = max(errors.values())
+                if worst <= tolerance:
+                    detail = "identique" if worst == 0 else f"écart relatif max {worst:.1e}"
+                    print(f"   ✅ {indicator:<10} {backend:<7} {detail}")
+                else:
+                    failures += 1
+                    bad = ', '.join(name for name, error in errors.items() if error > tolerance)
+                    print(f"   ❌ {indicator:<10} {backend:<7} hors tolérance ({tolerance:g}) : {bad}")
+    return failures
+
+
+def benchmark(backends, rows, repeat):
+    """Meilleur temps (ms) sur `repeat` exécutions, par indicateur et par backend."""
+    df = synthetic_ohlcv(rows)
+    timings = {}
+    for indicator, compute in INDICATORS.items():
+        for backend in backends:
+            compute(df.iloc[:1000], backend)  # compilation numba / chargement hors mesure
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                compute(df, backend)
+                best = min(best, time.perf_counter() - started)
+            timings[indicator, backend] = best * 1000
+    return timings
+
+
+def main():
+    rows = int(os.getenv('BACKEND_BENCH_ROWS', '200000'))
+    repeat = int(os.getenv('BACKEND_BENCH_REPEAT', '5'))
+    backends = available_backends()
+
+    print("=" * 70)
+    print(f"🧪 PARITÉ DES BACKENDS D'INDICATEURS - {', '.join(backends)} (référence : pandas)")
+    if 'talib' not in backends:
+        print("   ⚠️ TA-Lib non installé : backend talib ignoré")
+    print("=" * 70)
+    failures = check_parity(backends)
+
+    print("\n" + "=" * 70)
+    print(f"⏱️  BENCHMARK - {rows} bougies, meilleur de {repeat} (ms)")
+    print("=" * 70)
+    timings = benchmark(backends, rows, repeat)
+    print(f"{'indicateur':<12}" + ''.join(f"{backend:>16}" for backend in backends))
+    for indicator in INDICATORS:
+        reference = timings[indicator, 'pandas']
+        cells = ''.join(
+            f"{timings[indicator, backend]:>9.1f} (x{reference / timings[indicator, backend]:.1f})"
+            for backend in backends
+        )
+        print(f"{indicator:<12}{cells}")
+
+    print("\n" + "=" * 70)
+    print("📊 RÉSULTATS")
+    print("=" * 70)
+    if failures:
+        print(f"❌ {failures} comparaison(s) hors tolérance")
+        sys.exit(1)
+    print("✅ Tous les backends reproduisent les sorties actuelles des indicateurs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Test de charge du notifier Discord contre le faux webhook local :
+envoie des signaux à débit fixe et mesure le débit réel, la profondeur de
+la file et la latence de livraison (mise en file -> réception par le webhook).
+🧪 Aucun message ne part sur Discord
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.discord_standin import DiscordStandIn
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else float('nan')
+
+
+def run_load(standin, rate, duration, use_outbox):
+    # ⚠️ Le notifier lit sa configuration à la création : tout pointe sur le faux webhook
+    os.environ['TEST_MODE'] = 'true'
+    os.environ['NOTIFY_ASYNC'] = 'true'
+    os.environ['DISCORD_TEST_WEBHOOK_URL'] = standin.webhook_url()
+    workdir = tempfile.mkdtemp(prefix='notifier_load_')
+    os.environ['NOTIFY_OUTBOX_PATH'] = os.path.join(workdir, 'outbox.db') if use_outbox else ''
+    from src.notifier import DiscordNotifier
+
+    notifier = DiscordNotifier()
+    queue_depth = notifier.outbox.pending_count if notifier.outbox is not None else notifier.sender.pending
+
+    depths = []
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(0.1):
+            depths.append(queue_depth())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+
+    submitted = {}
+    accepted = 0
+    n_signals = int(rate * duration)
+    started = time.time()
+    for i in range(n_signals):
+        delay = started + i / rate - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        submitted[i] = time.time()
+        accepted += bool(notifier.send_buy_signal(
+            symbol=f"LOAD-{i}", price=45000.0 + i,
+            indicators={'rsi': '45.00', 'trend': 'Haussière'}, dedup_key=f"load:{started}:{i}"
+        ))
+    submit_elapsed = time.time() - started
+
+    flushed = notifier.flush(timeout=max(60.0, duration * 3))
+    elapsed = time.time() - started
+    stop.set()
+    sampler.join()
+    notifier.close()
+
+    latencies, messages = [], 0
+    for received_at, _, embeds in list(standin.received):
+        messages += 1
+        for embed in embeds:
+            match = re.search(r'LOAD-(\d+)', embed.get('title', ''))
+            if match and int(match.group(1)) in submitted:
+                latencies.append((received_at - submitted[int(match.group(1))]) * 1000)
+
+    return {
+        'signals': n_signals,
+        'accepted': accepted,
+        'delivered': len(latencies),
+        'messages': messages,
+        'flushed': flushed,
+        'submit_rate': n_signals / submit_elapsed if submit_elapsed else float('nan'),
+        'throughput': len(latencies) / elapsed if elapsed else float('nan'),
+        'elapsed': elapsed,
+        'depth_max': max(depths, default=0),
+        'depth_mean': sum(depths) / len(depths) if depths else 0.0,
+        'latencies': latencies,
+        'sender_stats': dict(notifier.sender.stats),
+    }
+
+
+def main():
+    rate = float(os.getenv('LOAD_RATE', '20'))
+    duration = float(os.getenv('LOAD_DURATION', '10'))
+    use_outbox = os.getenv('LOAD_OUTBOX', 'true').lower() == 'true'
+    low, _, high = os.getenv('LOAD_LATENCY_MS', '20-150').partition('-')
+    latency = (float(low), float(high or low))
+    error_rate = float(os.getenv('LOAD_ERROR_RATE', '0.02'))
+    rate_limit = int(os.getenv('LOAD_RATE_LIMIT', '5'))
+    rate_window = float(os.getenv('LOAD_RATE_WINDOW', '2'))
+
+    mode = "boîte d'envoi SQLite" if use_outbox else "file en mémoire"
+    print("=" * 70)
+    print(f"🧪 TEST DE CHARGE DU NOTIFIER - {rate:g} signaux/s pendant {duration:g}s ({mode})")
+    print(f"   Faux webhook : latence {latency[0]:g}-{latency[1]:g} ms, {error_rate:.0%} de 5xx, "
+          f"{rate_limit} requêtes / {rate_window:g}s")
+    print("=" * 70)
+
+    with DiscordStandIn(rate_limit=rate_limit, rate_window=rate_window,
+                        latency_ms=latency, error_rate=error_rate) as standin:
+        report = run_load(standin, rate, duration, use_outbox)
+        counts = dict(standin.counts)
+
+    latencies = report['latencies']
+    print("\n" + "=" * 70)
+    print("📊 RÉSULTATS")
+    print("=" * 70)
+    print(f"📤 Signaux émis      : {report['signals']} ({report['submit_rate']:.1f}/s), "
+          f"{report['accepted']} acceptés par le notifier")
+    print(f"📬 Embeds livrés     : {report['delivered']} en {report['messages']} message(s) "
+          f"- {report['throughput']:.1f} embeds/s sur {report['elapsed']:.1f}s")
+    print(f"📥 Profondeur de file: max {report['depth_max']}, moyenne {report['depth_mean']:.1f}")
+    print(f"🌐 Réponses webhook  : {counts}")
+    print(f"🔁 Envoi             : {report['sender_stats']}")
+    if latencies:
+        print(f"⏱️  Latence de livraison : p50 {percentile(latencies, 0.5):.0f} ms, "
+              f"p95 {percentile(latencies, 0.95):.0f} ms, p99 {percentile(latencies, 0.99):.0f} ms, "
+              f"max {max(latencies):.0f} ms")
+    if report['delivered'] < report['accepted'] or not report['flushed']:
+        print(f"⚠️  {report['accepted'] - report['delivered']} signal(aux) non livré(s)")
+    else:
+        print("✅ Tous les signaux acceptés ont été livrés")
+
+
+if __name__ == "__main__":
+    main()
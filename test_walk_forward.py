@@ -0,0 +1,139 @@
+"""
+Optimisation walk-forward : optimisation Optuna sur chaque fenêtre d'entraînement,
+puis évaluation hors échantillon des meilleurs paramètres sur la fenêtre suivante.
+Les plis tournent en parallèle et partagent un seul calcul d'indicateurs.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import optuna
+import pandas as pd
+from dotenv import load_dotenv
+
+import test_grid_search as grid
+from src.shared_arrays import SharedFrame
+from src.strategy import MIN_BARS
+from src.walk_forward import fold_slice, make_folds, oos_equity_curve, stability_report
+from test_backtest import compute_stats, compute_trades, print_stats
+
+load_dotenv()
+
+
+def run_fold(fold, n_trials: int, batch_size: int, seed: int, context_bars: int):
+    """Optimise sur le train du pli puis teste les meilleurs paramètres sur sa fenêtre de test."""
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    df = grid.load_dataset()
+
+    train_df, train_warmup = fold_slice(df, fold.train_start, fold.train_end, context_bars)
+    study = optuna.create_study(direction="maximize", sampler=optuna.samplers.TPESampler(seed=seed))
+    grid.optimize_batched(study, n_trials, max(batch_size, 1), df=train_df,
+                          warmup_bars=train_warmup, verbose=False)
+
+    try:
+        best = study.best_trial
+    except ValueError:
+        return {"fold": fold, "params": None, "train_value": None, "trades": pd.DataFrame()}
+
+    best_params = grid.resolved_params(best)
+    params = grid.load_base_params().with_overrides(best_params)
+    test_df, test_warmup = fold_slice(df, fold.test_start, fold.test_end, context_bars)
+    trades, _ = compute_trades(test_df, warmup_bars=test_warmup, params=params)
+    return {"fold": fold, "params": best_params, "train_value": best.value, "trades": trades}
+
+
+def run_folds(folds, n_trials: int, batch_size: int, n_jobs: int, context_bars: int):
+    """Exécute les plis (processus séparés si n_jobs > 1, indicateurs en mémoire partagée)."""
+    if n_jobs <= 1:
+        return [run_fold(fold, n_trials, batch_size, fold.index, context_bars) for fold in folds]
+
+    shared = SharedFrame.from_frame(grid.load_dataset())
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=ctx, initializer=grid._worker_init,
+                                 initargs=(shared.spec, grid.load_base_params())) as pool:
+            futures = [pool.submit(run_fold, fold, n_trials, batch_size, fold.index, context_bars)
+                       for fold in folds]
+            for future in as_completed(futures):
+                result = future.result()
+                print(f"✅ Pli {result['fold'].index + 1}/{len(folds)} terminé")
+                results.append(result)
+    finally:
+        shared.close()
+    return sorted(results, key=lambda r: r["fold"].index)
+
+
+def main():
+    df = grid.load_dataset()
+    initial_capital = float(os.getenv("INITIAL_CAPITAL", "100"))
+    warmup_bars = int(os.getenv("WARMUP_BARS", "220"))
+    train_bars = int(os.getenv("WF_TRAIN_BARS", str(24 * 365)))
+    test_bars = int(os.getenv("WF_TEST_BARS", str(24 * 90)))
+    anchored = os.getenv("WF_MODE", "rolling").strip().lower() == "anchored"
+    n_trials = int(os.getenv("WF_TRIALS", os.getenv("GRID_TRIALS", "200")))
+    batch_size = int(os.getenv("WF_BATCH_SIZE", "64"))
+    n_jobs = int(os.getenv("WF_JOBS", "0"))
+    output_dir = Path(os.getenv("WF_OUTPUT_DIR", "data"))
+
+    folds = make_folds(len(df), train_bars, test_bars, start=warmup_bars, anchored=anchored)
+    if not folds:
+        print(f"❌ Historique trop court ({len(df)} bougies) pour WF_TRAIN_BARS={train_bars}")
+        return
+    if n_jobs <= 0:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(folds))
+
+    print(f"🧪 Walk-forward {'ancré' if anchored else 'glissant'} : {len(folds)} plis, "
+          f"train {train_bars} / test {test_bars} bougies, {n_trials} essais par pli, {n_jobs} processus")
+
+    results = run_folds(folds, n_trials, batch_size, n_jobs, max(warmup_bars, MIN_BARS))
+
+    rows = []
+    for result in results:
+        fold = result["fold"]
+        stats = compute_stats(result["trades"], f"fold_{fold.index}", initial_capital)
+        rows.append({
+            "fold": fold.index,
+            "train_from": df.index[fold.train_start],
+            "test_from": df.index[fold.test_start],
+            "test_to": df.index[fold.test_end - 1],
+            "train_capital": result["train_value"],
+            "oos_trades": stats["trades"],
+            "oos_return": stats["total_return"],
+            "oos_max_drawdown": stats["max_drawdown"],
+            **(result["params"] or {}),
+        })
+    report = pd.DataFrame(rows)
+
+    curve = oos_equity_curve({r["fold"].index: r["trades"] for r in results}, initial_capital)
+    best_params = pd.DataFrame([r["params"] for r in results if r["params"]])
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report.to_csv(output_dir / "walk_forward_folds.csv", index=False)
+    curve.to_csv(output_dir / "walk_forward_equity.csv", index=False)
+
+    print("\nRésultats par pli (hors échantillon) :")
+    print(report[["fold", "test_from", "test_to", "oos_trades", "oos_return", "oos_max_drawdown"]]
+          .to_string(index=False))
+
+    if not best_params.empty:
+        print("\nStabilité des paramètres (cv élevé = paramètre instable) :")
+        print(stability_report(best_params).to_string(float_format=lambda v: f"{v:.3f}"))
+
+    oos_trades = [r["trades"] for r in results if not r["trades"].empty]
+    all_trades = pd.concat(oos_trades, ignore_index=True) if oos_trades else pd.DataFrame()
+    print_stats(compute_stats(all_trades, "Hors échantillon agrégé (walk-forward)", initial_capital), initial_capital)
+
+    last = next((r for r in reversed(results) if r["params"]), None)
+    if last is not None:
+        print("\nParamètres du dernier pli (candidats au déploiement) :")
+        for k, v in last["params"].items():
+            print(f"- {k} = {v}")
+
+    print(f"\n💾 {output_dir / 'walk_forward_folds.csv'}, {output_dir / 'walk_forward_equity.csv'}")
+
+
+if __name__ == "__main__":
+    main()
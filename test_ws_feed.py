@@ -0,0 +1,65 @@
+"""
+Test hors ligne du flux WebSocket : rejoue les bougies enregistrées via le
+serveur local, fait tourner le bot à chaque clôture et mesure la latence de
+bout en bout (émission de la clôture -> fin de l'analyse).
+🧪 MODE TEST : les messages Discord vont sur DISCORD_TEST_WEBHOOK_URL
+"""
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ⚠️ FORCER LE MODE TEST POUR CE SCRIPT
+os.environ['TEST_MODE'] = 'true'
+
+from main import BotSession, build_ws_feed
+from src.candle_feed import ReplayExchange
+from src.replay_server import ReplayServer, load_recorded_candles
+
+
+async def run_replay(candles, n_candles, interval, drop_every):
+    symbol = os.getenv('SYMBOL', 'BTC/USDT')
+    timeframe = os.getenv('TIMEFRAME', '1h')
+    exchange_name = os.getenv('EXCHANGE', 'kraken')
+
+    start = max(len(candles) - n_candles, 1)
+    server = await ReplayServer(candles, symbol, timeframe, candle_interval=interval,
+                                start=start, drop_every=drop_every).start()
+    exchange = ReplayExchange(server.url)
+    feed = build_ws_feed(exchange, BotSession(exchange_name, symbol, timeframe))
+    try:
+        await feed.run()
+    finally:
+        await exchange.close()
+        await server.stop()
+    return feed
+
+
+def main():
+    symbol = os.getenv('SYMBOL', 'BTC/USDT')
+    timeframe = os.getenv('TIMEFRAME', '1h')
+    exchange_name = os.getenv('HIST_EXCHANGE', 'binance')
+    n_candles = int(os.getenv('REPLAY_CANDLES', '50'))
+    interval = float(os.getenv('REPLAY_INTERVAL', '0.5'))
+    drop_every = int(os.getenv('REPLAY_DROP_EVERY', '20'))
+
+    candles = load_recorded_candles(exchange_name, symbol, timeframe)
+    if len(candles) < n_candles + 260:
+        print(f"❌ Pas assez de bougies enregistrées ({len(candles)}) - lancer d'abord test_backtest.py")
+        return
+
+    print(f"📡 Rejeu de {n_candles} bougies {symbol} {timeframe} ({interval}s par bougie, "
+          f"coupure toutes les {drop_every or '∞'} bougies)")
+    feed = asyncio.run(run_replay(candles, n_candles, interval, drop_every))
+
+    summary = feed.latency_summary()
+    print(f"\n✅ {feed.closes} clôture(s) traitée(s), {feed.reconnects} reconnexion(s)")
+    if summary:
+        print(f"⏱️  Latence clôture -> signal : médiane {summary['p50_ms']:.1f} ms, "
+              f"p95 {summary['p95_ms']:.1f} ms, max {summary['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()